@@ -2,22 +2,33 @@ import streamlit as st
 import requests
 import json
 import os
-from dotenv import load_dotenv
-from pathlib import Path
 
-env_path = Path('.') / '.env'
-load_dotenv(dotenv_path=env_path)
+from config import load_env
+
+# Before vapi_client reads its settings; once per process, not on every rerun
+load_env()
+
+from campaign import CampaignDialer, Lead, LeadsFileError, load_leads_csv, render_call_payload
+from vapi_client import VapiClient
 
 vapi_api_key = os.getenv("VAPI_API_KEY")
 assistant_id = os.getenv("ASSISTANT_ID")
 phone_number_id = os.getenv("PHONE_NUMBER_ID")
 
 CUSTOM_VOICE_URL = "https://transsonic-katheleen-undeputed.ngrok-free.dev/to-speech"
+PRERENDER_URL = CUSTOM_VOICE_URL.rsplit("/to-speech", 1)[0] + "/prerender"
+bridge_admin_token = os.getenv("ADMIN_TOKEN")
+# The format Vapi asks /to-speech for, so prerenders land under the same cache key.
+# Unset: the bridge uses the format of the last /to-speech request it served.
+PRERENDER_FORMAT = {k: v for k, v in {"sampleRate": os.getenv("VOICE_SAMPLE_RATE"),
+                                      "encoding": os.getenv("VOICE_ENCODING")}.items() if v}
 
-headers = {
-    "Authorization": f"Bearer {vapi_api_key}",
-    "Content-Type": "application/json"
-}
+@st.cache_resource
+def get_vapi_client():
+    """One client (keep-alive session + assistant cache) shared by every rerun and every operator."""
+    return VapiClient(vapi_api_key)
+
+vapi = get_vapi_client()
 
 # Page Setup & CSS Styling 
 st.set_page_config(page_title="Alta AI Admin", page_icon="small_logo.jpeg", layout="wide")
@@ -65,9 +76,8 @@ current_first_msg = ""
 current_model = "gpt-4o"
 
 try:
-    response = requests.get(f"https://api.vapi.ai/assistant/{assistant_id}", headers=headers)
-    if response.status_code == 200:
-        data = response.json()
+    data = vapi.get_assistant(assistant_id)
+    if data:
         model_config = data.get('model', {})
         current_model = model_config.get('model', 'gpt-4o')
         current_prompt = model_config.get('systemPrompt')
@@ -107,9 +117,13 @@ with st.form("agent_settings"):
             }
         }
         with st.spinner("Updating Vapi to use Deepdub Bridge..."):
-            requests.patch(f"https://api.vapi.ai/assistant/{assistant_id}", headers=headers, json=payload)
-            st.success("✅ Agent updated! Using Deepdub via your Bridge.")
-            st.rerun()
+            try:
+                vapi.update_assistant(assistant_id, payload)
+            except requests.RequestException as e:
+                st.error(f"Update failed: {e}")
+            else:
+                st.success("✅ Agent updated! Using Deepdub via your Bridge.")
+                st.rerun()
 
 st.write(""); st.divider()
 
@@ -129,71 +143,23 @@ with col_btn:
         if not customer_phone or len(customer_phone) < 10:
              st.warning("⚠️ Please enter a valid phone number.")
         else:
-            # --- Logic to inject variables ---
-            prompt_for_call = new_prompt
+            lead = Lead(customer_name, customer_phone, customer_email, customer_gender)
+            call_payload, first_msg_for_call = render_call_payload(
+                lead, new_prompt, new_first_msg, selected_model, assistant_id, phone_number_id, CUSTOM_VOICE_URL
+            )
             
-            # Inject Email
-            if customer_email:
-                prompt_for_call = prompt_for_call.replace("{lead_email}", customer_email)
-            else:
-                prompt_for_call = prompt_for_call.replace("{lead_email}", "המייל שלך")
-
-            # Inject Gender Instruction
-            if customer_gender == "Male":
-                gender_instruction = "אתה מדבר עם גבר. פנה אליו בלשון זכר."
-            else:
-                gender_instruction = "אתה מדבר עם אישה. פנה אליה בלשון נקבה."
-            prompt_for_call = prompt_for_call.replace("{gender_instruction}", gender_instruction)
-
-            # Inject Name
-            first_msg_for_call = new_first_msg
-            if customer_name:
-                prompt_for_call = prompt_for_call.replace("{customer_name}", customer_name)
-                first_msg_for_call = first_msg_for_call.replace("{customer_name}", customer_name)
-            else:
-                prompt_for_call = prompt_for_call.replace("{customer_name}", "לקוח יקר")
-                first_msg_for_call = first_msg_for_call.replace("{customer_name}", "")         
-
-            call_payload = {
-                "assistantId": assistant_id,
-                "phoneNumberId": phone_number_id,
-                "customer": {
-                    "number": customer_phone,
-                    "name": customer_name,
-                    "email": customer_email
-                },
-                "assistantOverrides": {
-                    "firstMessage": first_msg_for_call,
-                    "firstMessageMode": "assistant-speaks-first",
-                    "numWordsToInterruptAssistant": 2,
-                    
-                    "voice": {
-                        "provider": "custom-voice",
-                        "server": {
-                            "url": CUSTOM_VOICE_URL, 
-                            "timeoutSeconds": 20
-                        }
-                    },
-                    "model": {
-                        "provider": "openai", 
-                        "model": selected_model,
-                        "systemPrompt": prompt_for_call,
-                    },
-                    "transcriber": {
-                        "provider": "openai",
-                        "model": "gpt-4o-mini-transcribe",
-                        "language": "he"
-                    },
-                    "variableValues": {
-                        "customer_name": customer_name,
-                        "customer_email": customer_email,
-                        "customer_gender": customer_gender,
-                        "lead_email": customer_email 
-                    }
-                }
-            }
-            
-            call_resp = requests.post("https://api.vapi.ai/call/phone", headers=headers, json=call_payload)
+            # Let the bridge start rendering the first message now, so the callee doesn't hear dead air on pickup
+            try:
+                requests.post(
+                    PRERENDER_URL,
+                    json={"texts": [first_msg_for_call], **PRERENDER_FORMAT},
+                    headers={"x-admin-token": bridge_admin_token} if bridge_admin_token else {},
+                    timeout=2,
+                )
+            except requests.RequestException as e:
+                print(f"[Prerender] Skipped: {e}")
+
+            call_resp = vapi.create_call(call_payload)
             
             if call_resp.status_code == 201:
                 st.toast(f"Calling {customer_name} via Unified Server...", icon="📞")
@@ -201,3 +167,69 @@ with col_btn:
             else:
                 st.error(f"Failed: {call_resp.text}")
 
+st.write(""); st.divider()
+
+# --- Section 3: Campaign Dialer ---
+st.markdown("<h2 style='text-align: center;'>📣 Campaign Dialer</h2>", unsafe_allow_html=True)
+st.caption("CSV with a header row: name, phone, email, gender. Each lead gets the prompt and first message above, personalised like a Test Lab call.")
+
+leads_file = st.file_uploader("Leads CSV", type=["csv"])
+col_conc, col_rate = st.columns(2)
+with col_conc: campaign_concurrency = st.slider("Calls in flight", 1, 20, 5)
+with col_rate: campaign_rate = st.number_input("Calls per minute", min_value=1, max_value=600, value=30)
+
+if leads_file is not None:
+    try:
+        leads, invalid_rows = load_leads_csv(leads_file.getvalue())
+    except LeadsFileError as e:
+        st.error(f"❌ Can't read the leads file: {e}")
+        st.stop()
+    st.info(f"{len(leads)} leads ready" + (f", {len(invalid_rows)} rows skipped (invalid phone)" if invalid_rows else ""))
+
+    col_start, col_stop = st.columns(2)
+    with col_start: start_campaign = st.button("📞 Start Campaign", use_container_width=True, disabled=not leads)
+    with col_stop: stop_campaign = st.button("⏹ Stop Campaign", use_container_width=True)
+
+    # Clicking Stop reruns the script; the running campaign's dialer is kept in the session to cancel it
+    if stop_campaign and st.session_state.get("campaign_dialer") is not None:
+        st.session_state["campaign_dialer"].cancel()
+        st.session_state["campaign_dialer"] = None
+        st.warning("⏹ Campaign stopped: calls already placed continue, no further leads are dialled.")
+
+    if start_campaign:
+        dialer = CampaignDialer(
+            vapi_api_key,
+            concurrency=campaign_concurrency,
+            calls_per_minute=campaign_rate,
+            prerender_url=PRERENDER_URL,
+            prerender_format=PRERENDER_FORMAT,
+            admin_token=bridge_admin_token,
+        )
+        st.session_state["campaign_dialer"] = dialer
+        render = lambda lead: render_call_payload(
+            lead, new_prompt, new_first_msg, selected_model, assistant_id, phone_number_id, CUSTOM_VOICE_URL
+        )
+        progress = st.progress(0.0, text="Dialling...")
+        table = st.empty()
+        rows = [
+            {"row": r.lead.row, "name": r.lead.name, "phone": r.lead.phone, "status": r.status, "detail": r.detail}
+            for r in invalid_rows
+        ]
+        done = 0
+        results = dialer.run(leads, render)
+        try:
+            for result in results:
+                done += 1
+                rows.append({
+                    "row": result.lead.row, "name": result.lead.name, "phone": result.lead.phone,
+                    "status": result.status, "detail": result.call_id or result.detail,
+                })
+                progress.progress(done / len(leads), text=f"{done}/{len(leads)} leads dialled")
+                table.dataframe(rows, use_container_width=True)
+        finally:
+            # Also reached when a Stop click interrupts this run: closing the generator cancels the rest
+            results.close()
+            dialer.close()
+            st.session_state["campaign_dialer"] = None
+        called = sum(1 for r in rows if r["status"] == "called")
+        st.success(f"✅ Campaign finished: {called} calls placed, {len(rows) - called} failed or skipped.")
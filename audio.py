@@ -0,0 +1,294 @@
+"""
+In-process audio decoding for the Deepdub bridge.
+
+Deepdub streams each chunk as a small standalone WAV file. Instead of spawning
+ffmpeg per chunk, we parse the RIFF header ourselves, view the sample data in
+place with NumPy, downmix / convert to float and resample to the output
+format the caller asked for (16 kHz s16le unless told otherwise; 8 kHz
+G.711 mu-law for phone lines). The resampler keeps its filter history
+between chunks so chunk boundaries don't click. When a chunk already has
+the output rate, no resampling happens at all. ffmpeg is only used for
+formats we can't handle here.
+"""
+import struct
+import subprocess
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Optional
+
+import numpy as np
+
+TARGET_RATE = 16000
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_MULAW = 0x0007
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+LINEAR16 = "linear16"
+MULAW = "mulaw"
+ENCODING_ALIASES = {
+    "linear16": LINEAR16, "pcm": LINEAR16, "pcm_s16le": LINEAR16, "s16le": LINEAR16,
+    "mulaw": MULAW, "mu-law": MULAW, "ulaw": MULAW, "pcm_mulaw": MULAW, "g711_ulaw": MULAW,
+}
+
+
+@dataclass(frozen=True)
+class OutputFormat:
+    """What /to-speech streams back: mono samples at `sample_rate`, s16le or 8-bit mu-law."""
+    sample_rate: int = TARGET_RATE
+    encoding: str = LINEAR16
+
+    @property
+    def bytes_per_second(self) -> int:
+        return self.sample_rate * (2 if self.encoding == LINEAR16 else 1)
+
+    def __str__(self) -> str:
+        return f"{self.encoding}@{self.sample_rate}"
+
+
+def _mulaw_tables() -> tuple[np.ndarray, np.ndarray]:
+    """G.711 mu-law: encode table indexed by the raw 16-bit sample, decode table indexed by the code."""
+    x = np.arange(65536, dtype=np.uint32).astype(np.uint16).view(np.int16).astype(np.int32)
+    sign = np.where(x < 0, 0x80, 0)
+    mag = np.minimum(np.abs(x), 32635) + 0x84
+    exponent = np.clip(np.floor(np.log2(mag)).astype(np.int32) - 7, 0, 7)
+    mantissa = (mag >> (exponent + 3)) & 0x0F
+    encode = (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent, mantissa = (u >> 4) & 0x07, u & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    decode = np.where(u & 0x80, -magnitude, magnitude).astype("<i2")
+    return encode, decode
+
+
+MULAW_ENCODE, MULAW_DECODE = _mulaw_tables()
+
+
+def mulaw_encode(pcm: bytes) -> bytes:
+    """s16le -> mu-law, one table lookup per sample."""
+    return MULAW_ENCODE[np.frombuffer(pcm, dtype="<u2")].tobytes()
+
+
+def mulaw_decode(data: bytes) -> bytes:
+    """mu-law -> s16le."""
+    return MULAW_DECODE[np.frombuffer(data, dtype=np.uint8)].tobytes()
+
+
+class UnsupportedAudioFormat(ValueError):
+    """Raised when a chunk can't be decoded in-process (caller should fall back to ffmpeg)."""
+
+
+@dataclass(frozen=True)
+class WavInfo:
+    format_tag: int
+    channels: int
+    sample_rate: int
+    bits_per_sample: int
+    data_offset: int
+    data_size: int
+
+    @property
+    def frame_size(self) -> int:
+        return self.channels * (self.bits_per_sample // 8)
+
+
+def looks_like_wav(b: bytes) -> bool:
+    return len(b) >= 12 and b[0:4] == b"RIFF" and b[8:12] == b"WAVE"
+
+
+def parse_wav_header(blob: bytes) -> WavInfo:
+    """Walks the RIFF chunks and returns the format plus the location of the sample data."""
+    if not looks_like_wav(blob):
+        raise UnsupportedAudioFormat("not a RIFF/WAVE blob")
+
+    fmt = None
+    pos = 12
+    end = len(blob)
+    while pos + 8 <= end:
+        chunk_id = blob[pos:pos + 4]
+        (chunk_size,) = struct.unpack_from("<I", blob, pos + 4)
+        body = pos + 8
+
+        if chunk_id == b"fmt ":
+            if chunk_size < 16:
+                raise UnsupportedAudioFormat("fmt chunk too short")
+            format_tag, channels, sample_rate, _byte_rate, _align, bits = struct.unpack_from("<HHIIHH", blob, body)
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                # The real format lives in the first two bytes of the SubFormat GUID
+                (format_tag,) = struct.unpack_from("<H", blob, body + 24)
+            fmt = (format_tag, channels, sample_rate, bits)
+
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise UnsupportedAudioFormat("data chunk before fmt chunk")
+            # Streaming encoders often write 0 / 0xFFFFFFFF as a placeholder size
+            available = end - body
+            data_size = chunk_size if 0 < chunk_size <= available else available
+            return WavInfo(*fmt, data_offset=body, data_size=data_size)
+
+        # Chunks are word-aligned
+        pos = body + chunk_size + (chunk_size & 1)
+
+    raise UnsupportedAudioFormat("no data chunk found")
+
+
+def _samples_to_float(info: WavInfo, blob: bytes) -> np.ndarray:
+    """Returns a (frames, channels) float32 array; integer PCM is viewed in place before conversion."""
+    frames = info.data_size // info.frame_size if info.frame_size else 0
+    nbytes = frames * info.frame_size
+    view = memoryview(blob)[info.data_offset:info.data_offset + nbytes]
+    bits = info.bits_per_sample
+
+    if info.format_tag == WAVE_FORMAT_PCM and bits == 16:
+        x = np.frombuffer(view, dtype="<i2").astype(np.float32) * (1.0 / 32768.0)
+    elif info.format_tag == WAVE_FORMAT_PCM and bits == 8:
+        x = (np.frombuffer(view, dtype=np.uint8).astype(np.float32) - 128.0) * (1.0 / 128.0)
+    elif info.format_tag == WAVE_FORMAT_PCM and bits == 24:
+        raw = np.frombuffer(view, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        x = ints.astype(np.float32) * (1.0 / 8388608.0)
+    elif info.format_tag == WAVE_FORMAT_PCM and bits == 32:
+        x = np.frombuffer(view, dtype="<i4").astype(np.float32) * (1.0 / 2147483648.0)
+    elif info.format_tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        x = np.frombuffer(view, dtype="<f4")
+    elif info.format_tag == WAVE_FORMAT_IEEE_FLOAT and bits == 64:
+        x = np.frombuffer(view, dtype="<f8").astype(np.float32)
+    elif info.format_tag == WAVE_FORMAT_MULAW and bits == 8:
+        x = MULAW_DECODE[np.frombuffer(view, dtype=np.uint8)].astype(np.float32) * (1.0 / 32768.0)
+    else:
+        raise UnsupportedAudioFormat(f"format_tag={info.format_tag} bits={bits}")
+
+    return x.reshape(-1, info.channels)
+
+
+def _float_to_s16le(x: np.ndarray) -> bytes:
+    return (np.clip(x, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+
+class StreamingResampler:
+    """
+    Polyphase windowed-sinc resampler that can be fed arbitrary-sized blocks.
+    The tail of each block is kept as history, so consecutive blocks resample
+    exactly as if they were one continuous signal.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int = TARGET_RATE, half_taps: int = 16):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.half = half_taps
+        ratio = Fraction(src_rate, dst_rate)
+        # Output positions advance by num/den input samples; positions are tracked in 1/den units
+        self._num, self._den = ratio.numerator, ratio.denominator
+        cutoff = min(1.0, dst_rate / src_rate)
+        self._offsets = np.arange(-half_taps + 1, half_taps + 1)
+        d = (np.arange(self._den) / self._den)[:, None] - self._offsets[None, :]
+        w = np.sinc(cutoff * d) * (0.5 + 0.5 * np.cos(np.pi * d / half_taps))
+        self._weights = (w / w.sum(axis=1, keepdims=True)).astype(np.float32)
+        self._buf = np.zeros(half_taps, dtype=np.float32)
+        self._pos = half_taps * self._den
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        if self.src_rate == self.dst_rate:
+            return x
+
+        buf = np.concatenate([self._buf, x.astype(np.float32, copy=False)])
+        last = (len(buf) - 1 - self.half) * self._den
+        if last < self._pos:
+            self._buf = buf
+            return np.zeros(0, dtype=np.float32)
+
+        n = (last - self._pos) // self._num + 1
+        t = self._pos + np.arange(n, dtype=np.int64) * self._num
+        base, phase = np.divmod(t, self._den)
+        y = np.einsum("ij,ij->i", buf[base[:, None] + self._offsets[None, :]], self._weights[phase])
+
+        next_pos = self._pos + n * self._num
+        keep_from = next_pos // self._den - self.half
+        self._buf = buf[keep_from:]
+        self._pos = next_pos - keep_from * self._den
+        return y
+
+    def flush(self) -> np.ndarray:
+        """Pads with silence to emit the samples still waiting on look-ahead."""
+        if self.src_rate == self.dst_rate:
+            return np.zeros(0, dtype=np.float32)
+        return self.process(np.zeros(self.half, dtype=np.float32))
+
+
+class PcmDecoder:
+    """
+    Per-stream decoder: WAV chunks in, mono audio in `fmt` out (16 kHz s16le by default).
+    Keep one instance per TTS stream so the resampler state carries across chunks.
+    """
+
+    def __init__(self, fmt: OutputFormat = OutputFormat()):
+        self.fmt = fmt
+        self.target_rate = fmt.sample_rate
+        self._resampler: Optional[StreamingResampler] = None
+
+    def _encode(self, y: np.ndarray) -> bytes:
+        pcm = _float_to_s16le(y)
+        return mulaw_encode(pcm) if self.fmt.encoding == MULAW else pcm
+
+    def decode(self, blob: bytes) -> bytes:
+        info = parse_wav_header(blob)
+
+        # Fast paths: already mono at the output rate, so just slice out (and maybe companding-encode) the samples
+        if info.channels == 1 and info.sample_rate == self.target_rate:
+            if info.format_tag == WAVE_FORMAT_PCM and info.bits_per_sample == 16:
+                nbytes = info.data_size - (info.data_size % 2)
+                pcm = blob[info.data_offset:info.data_offset + nbytes]
+                return mulaw_encode(pcm) if self.fmt.encoding == MULAW else pcm
+            if info.format_tag == WAVE_FORMAT_MULAW and self.fmt.encoding == MULAW:
+                return blob[info.data_offset:info.data_offset + info.data_size]
+
+        x = _samples_to_float(info, blob)
+        mono = x[:, 0] if info.channels == 1 else x.mean(axis=1)
+
+        if self._resampler is None or self._resampler.src_rate != info.sample_rate:
+            self._resampler = StreamingResampler(info.sample_rate, self.target_rate)
+        return self._encode(self._resampler.process(mono))
+
+    def flush(self) -> bytes:
+        if self._resampler is None:
+            return b""
+        tail = self._resampler.flush()
+        self._resampler = None
+        return self._encode(tail) if len(tail) else b""
+
+
+def _silent_wav(rate: int, frames: int) -> bytes:
+    data = bytes(frames * 2)
+    fmt_chunk = struct.pack("<IHHIIHH", 16, WAVE_FORMAT_PCM, 1, rate, rate * 2, 2, 16)
+    return b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVEfmt " + fmt_chunk + b"data" + struct.pack("<I", len(data)) + data
+
+
+def warm_up(fmt: OutputFormat, source_rate: int = 48000) -> None:
+    """Decodes a silent chunk through the fast and the resampling path, so the first live chunk skips numpy's first-call costs."""
+    for rate in {fmt.sample_rate, source_rate}:
+        decoder = PcmDecoder(fmt)
+        decoder.decode(_silent_wav(rate, rate // 50))
+        decoder.flush()
+
+
+def ffmpeg_decode(blob: bytes, fmt: OutputFormat = OutputFormat()) -> bytes:
+    codec = ("mulaw", "pcm_mulaw") if fmt.encoding == MULAW else ("s16le", "pcm_s16le")
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", codec[0],
+        "-acodec", codec[1],
+        "-ac", "1",
+        "-ar", str(fmt.sample_rate),
+        "pipe:1",
+    ]
+    p = subprocess.run(cmd, input=blob, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if p.returncode != 0 or not p.stdout:
+        err = p.stderr.decode("utf-8", errors="ignore")
+        raise RuntimeError(f"ffmpeg failed: {err[:400]}")
+    return p.stdout
@@ -0,0 +1,379 @@
+"""
+Free/busy availability engine behind tools.get_available_slots.
+
+Busy intervals are fetched with one batched free/busy query per date range and
+kept in memory as a per-day sorted interval index, so repeated availability
+checks during a call are answered without touching the calendar API. The index
+is kept fresh incrementally: every `refresh_interval` seconds the backend is
+asked which days changed since the last sync token, and only those days are
+dropped and re-fetched.
+
+The calendar itself sits behind the small CalendarBackend protocol;
+GoogleCalendarBackend talks to Google Calendar, FakeCalendarBackend keeps
+events in memory for benchmarks and local runs.
+"""
+import bisect
+import datetime
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional, Protocol
+from zoneinfo import ZoneInfo
+
+log = logging.getLogger("bridge")
+
+CALENDAR_TIMEZONE = os.getenv("CALENDAR_TIMEZONE", "Asia/Jerusalem")
+WORK_TZ = ZoneInfo(CALENDAR_TIMEZONE)
+WORKDAY_START = os.getenv("WORKDAY_START", "09:00")
+WORKDAY_END = os.getenv("WORKDAY_END", "18:00")
+# Python weekday numbers; the Israeli work week is Sunday to Thursday
+WORK_DAYS = frozenset(int(d) for d in os.getenv("WORK_DAYS", "6,0,1,2,3").split(","))
+SLOT_MINUTES = 45
+SLOT_STEP_MINUTES = int(os.getenv("SLOT_STEP_MINUTES", "30"))
+
+Interval = tuple[datetime.datetime, datetime.datetime]
+
+
+def _parse_hhmm(value: str) -> datetime.time:
+    return datetime.datetime.strptime(value, "%H:%M").time()
+
+
+def day_bounds(day: datetime.date) -> Interval:
+    """Local midnight to midnight; a DST day is 23 or 25 hours long."""
+    start = datetime.datetime.combine(day, datetime.time(), WORK_TZ)
+    end = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time(), WORK_TZ)
+    return start, end
+
+
+def days_touched(start: datetime.datetime, end: datetime.datetime) -> set[datetime.date]:
+    """Local dates an interval overlaps (an interval ending at midnight doesn't touch the next day)."""
+    first = start.astimezone(WORK_TZ).date()
+    last = (end - datetime.timedelta(microseconds=1)).astimezone(WORK_TZ).date() if end > start else first
+    return {first + datetime.timedelta(days=i) for i in range((last - first).days + 1)}
+
+
+class CalendarBackend(Protocol):
+    def freebusy(self, start: datetime.datetime, end: datetime.datetime) -> list[Interval]:
+        """All busy intervals overlapping [start, end), as timezone-aware datetimes."""
+        ...
+
+    def changes(self, sync_token: Optional[str]) -> tuple[Optional[set[datetime.date]], Optional[str]]:
+        """
+        Local dates whose events changed since `sync_token`, and the next token.
+
+        `sync_token=None` establishes a baseline and returns no dates. A `None`
+        date set means the token is no longer valid and everything must be
+        re-fetched.
+        """
+        ...
+
+
+class FakeCalendarBackend:
+    """In-memory calendar for benchmarks and offline runs."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.events: dict[str, Interval] = {}
+        self._log: list[set[datetime.date]] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.calls = {"freebusy": 0, "changes": 0}
+
+    def add_event(self, start: datetime.datetime, end: datetime.datetime) -> str:
+        with self._lock:
+            event_id = f"evt{next(self._ids)}"
+            self.events[event_id] = (start, end)
+            self._log.append(days_touched(start, end))
+            return event_id
+
+    def remove_event(self, event_id: str) -> None:
+        with self._lock:
+            start, end = self.events.pop(event_id)
+            self._log.append(days_touched(start, end))
+
+    def freebusy(self, start: datetime.datetime, end: datetime.datetime) -> list[Interval]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls["freebusy"] += 1
+            return sorted((s, e) for s, e in self.events.values() if s < end and e > start)
+
+    def changes(self, sync_token: Optional[str]) -> tuple[Optional[set[datetime.date]], Optional[str]]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls["changes"] += 1
+            if sync_token is None:
+                return set(), str(len(self._log))
+            changed: set[datetime.date] = set()
+            for days in self._log[int(sync_token):]:
+                changed |= days
+            return changed, str(len(self._log))
+
+
+def _parse_rfc3339(value: str) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class GoogleCalendarBackend:
+    """
+    Google Calendar via freebusy.query and events.list sync tokens.
+
+    events.list only returns ids for deleted events, so the times of every
+    event seen while syncing are remembered to know which days a deletion frees.
+    """
+
+    def __init__(self, service_provider: Callable[[], object], calendar_id: str = "primary"):
+        self.service_provider = service_provider
+        self.calendar_id = calendar_id
+        self._known: dict[str, set[datetime.date]] = {}
+
+    def freebusy(self, start: datetime.datetime, end: datetime.datetime) -> list[Interval]:
+        body = {
+            "timeMin": start.isoformat(),
+            "timeMax": end.isoformat(),
+            "timeZone": CALENDAR_TIMEZONE,
+            "items": [{"id": self.calendar_id}],
+        }
+        resp = self.service_provider().freebusy().query(body=body).execute()
+        busy = resp.get("calendars", {}).get(self.calendar_id, {}).get("busy", [])
+        return sorted((_parse_rfc3339(b["start"]), _parse_rfc3339(b["end"])) for b in busy)
+
+    @staticmethod
+    def _event_days(event: dict) -> Optional[set[datetime.date]]:
+        start, end = event.get("start") or {}, event.get("end") or {}
+        if "dateTime" in start and "dateTime" in end:
+            return days_touched(_parse_rfc3339(start["dateTime"]), _parse_rfc3339(end["dateTime"]))
+        if "date" in start and "date" in end:
+            first = datetime.date.fromisoformat(start["date"])
+            last = datetime.date.fromisoformat(end["date"])
+            return {first + datetime.timedelta(days=i) for i in range(max(1, (last - first).days))}
+        return None
+
+    def changes(self, sync_token: Optional[str]) -> tuple[Optional[set[datetime.date]], Optional[str]]:
+        from googleapiclient.errors import HttpError
+
+        events = self.service_provider().events()
+        params = {"calendarId": self.calendar_id, "singleEvents": True, "showDeleted": sync_token is not None}
+        if sync_token:
+            params["syncToken"] = sync_token
+        else:
+            self._known.clear()
+
+        changed: set[datetime.date] = set()
+        full_resync = False
+        page_token = None
+        while True:
+            try:
+                resp = events.list(pageToken=page_token, **params).execute()
+            except HttpError as e:
+                if e.resp.status == 410:
+                    # Sync token expired: start over from a fresh baseline
+                    log.warning("⚠️ calendar sync token expired; re-listing")
+                    _, token = self.changes(None)
+                    return None, token
+                raise
+            for event in resp.get("items", []):
+                old = self._known.pop(event["id"], None)
+                if old:
+                    changed |= old
+                if event.get("status") == "cancelled":
+                    if old is None and sync_token:
+                        full_resync = True
+                    continue
+                days = self._event_days(event)
+                if days:
+                    self._known[event["id"]] = days
+                    changed |= days
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                break
+
+        if sync_token is None:
+            return set(), resp.get("nextSyncToken")
+        return (None if full_resync else changed), resp.get("nextSyncToken")
+
+
+class AvailabilityEngine:
+    """
+    Thread-safe: tool calls run on worker threads. Reads of the index only take
+    a short state lock; calendar I/O happens under a separate fetch lock so a
+    slow fetch never blocks checks for days that are already indexed.
+    """
+
+    def __init__(self, backend: CalendarBackend, prefetch_days: int = 14, refresh_interval: float = 30.0):
+        self.backend = backend
+        self.prefetch_days = prefetch_days
+        self.refresh_interval = refresh_interval
+        self.work_start = _parse_hhmm(WORKDAY_START)
+        self.work_end = _parse_hhmm(WORKDAY_END)
+
+        # day -> sorted, merged busy intervals clipped to that day
+        self._days: dict[datetime.date, list[Interval]] = {}
+        self._slots: dict[datetime.date, list[datetime.datetime]] = {}
+        self._sync_token: Optional[str] = None
+        self._last_sync = 0.0
+        self._state_lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+        self.stats = {"hits": 0, "misses": 0, "freebusy_queries": 0, "syncs": 0, "dirty_days": 0, "full_resyncs": 0}
+
+    # --- Index maintenance ---
+
+    @staticmethod
+    def _merge(intervals: list[Interval]) -> list[Interval]:
+        merged: list[Interval] = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+
+    def _install(self, first: datetime.date, last: datetime.date, busy: list[Interval]) -> None:
+        per_day: dict[datetime.date, list[Interval]] = {
+            first + datetime.timedelta(days=i): [] for i in range((last - first).days + 1)
+        }
+        for start, end in busy:
+            for day in days_touched(start, end):
+                if day in per_day:
+                    lo, hi = day_bounds(day)
+                    per_day[day].append((max(start, lo), min(end, hi)))
+        with self._state_lock:
+            for day, intervals in per_day.items():
+                self._days[day] = self._merge(intervals)
+                self._slots.pop(day, None)
+
+    def _fetch(self, first: datetime.date, last: datetime.date) -> None:
+        """One free/busy query for the whole [first, last] range."""
+        start, _ = day_bounds(first)
+        _, end = day_bounds(last)
+        busy = self.backend.freebusy(start, end)
+        self.stats["freebusy_queries"] += 1
+        self._install(first, last, busy)
+
+    def _sync(self) -> None:
+        if self._sync_token is None:
+            # Baseline before the first fetch so nothing changing in between is missed
+            _, self._sync_token = self.backend.changes(None)
+            self._last_sync = time.monotonic()
+            return
+        changed, self._sync_token = self.backend.changes(self._sync_token)
+        self._last_sync = time.monotonic()
+        self.stats["syncs"] += 1
+        with self._state_lock:
+            if changed is None:
+                self.stats["full_resyncs"] += 1
+                self._days.clear()
+                self._slots.clear()
+                return
+            for day in changed:
+                if self._days.pop(day, None) is not None:
+                    self.stats["dirty_days"] += 1
+                self._slots.pop(day, None)
+
+    def _refresh_if_due(self) -> None:
+        if self._sync_token is not None and time.monotonic() - self._last_sync < self.refresh_interval:
+            return
+        # Whoever gets the fetch lock syncs; everyone else keeps serving the current index
+        if not self._fetch_lock.acquire(blocking=False):
+            return
+        try:
+            self._sync()
+        finally:
+            self._fetch_lock.release()
+
+    def _ensure(self, day: datetime.date) -> list[Interval]:
+        with self._state_lock:
+            busy = self._days.get(day)
+        if busy is not None:
+            self.stats["hits"] += 1
+            return busy
+        with self._fetch_lock:
+            with self._state_lock:
+                busy = self._days.get(day)
+            if busy is not None:
+                self.stats["hits"] += 1
+                return busy
+            self.stats["misses"] += 1
+            if self._sync_token is None:
+                self._sync()
+            # Fetch the requested day plus the following ones that aren't indexed yet, in one query
+            last = day
+            while (last - day).days + 1 < self.prefetch_days and (last + datetime.timedelta(days=1)) not in self._days:
+                last += datetime.timedelta(days=1)
+            self._fetch(day, last)
+            with self._state_lock:
+                return self._days[day]
+
+    def prefetch(self, days) -> None:
+        """Indexes every day in `days` that isn't yet, with one free/busy query over their span (a batch of checks)."""
+        self._refresh_if_due()
+        with self._fetch_lock:
+            with self._state_lock:
+                missing = sorted({d for d in days if d not in self._days})
+            if not missing:
+                return
+            self.stats["misses"] += len(missing)
+            if self._sync_token is None:
+                self._sync()
+            first, last = missing[0], missing[-1]
+            while (last - first).days + 1 < self.prefetch_days and (last + datetime.timedelta(days=1)) not in self._days:
+                last += datetime.timedelta(days=1)
+            self._fetch(first, last)
+
+    # --- Queries ---
+
+    def _compute_slots(self, day: datetime.date, busy: list[Interval]) -> list[datetime.datetime]:
+        if day.weekday() not in WORK_DAYS:
+            return []
+        slot = datetime.timedelta(minutes=SLOT_MINUTES)
+        step = datetime.timedelta(minutes=SLOT_STEP_MINUTES)
+        cursor = datetime.datetime.combine(day, self.work_start, WORK_TZ)
+        close = datetime.datetime.combine(day, self.work_end, WORK_TZ)
+        starts = [s for s, _ in busy]
+        slots = []
+        while cursor + slot <= close:
+            end = cursor + slot
+            # The only busy interval that can overlap is the last one starting before `end`
+            i = bisect.bisect_left(starts, end) - 1
+            if i < 0 or busy[i][1] <= cursor:
+                slots.append(cursor)
+            cursor += step
+        return slots
+
+    def free_slots(self, day: datetime.date, now: Optional[datetime.datetime] = None) -> list[datetime.datetime]:
+        """Start times of free 45-minute slots within working hours on `day`."""
+        self._refresh_if_due()
+        with self._state_lock:
+            slots = self._slots.get(day)
+        if slots is None:
+            busy = self._ensure(day)
+            slots = self._compute_slots(day, busy)
+            with self._state_lock:
+                if self._days.get(day) is busy:
+                    self._slots[day] = slots
+        else:
+            self.stats["hits"] += 1
+        now = now or datetime.datetime.now(WORK_TZ)
+        return [s for s in slots if s > now]
+
+    def mark_busy(self, start: datetime.datetime, end: datetime.datetime) -> None:
+        """Records a meeting we just booked, without waiting for the next sync."""
+        with self._state_lock:
+            for day in days_touched(start, end):
+                if day in self._days:
+                    lo, hi = day_bounds(day)
+                    self._days[day] = self._merge(self._days[day] + [(max(start, lo), min(end, hi))])
+                    self._slots.pop(day, None)
+
+    def invalidate(self) -> None:
+        with self._state_lock:
+            self._days.clear()
+            self._slots.clear()
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "indexed_days": len(self._days)}
@@ -0,0 +1,52 @@
+"""
+Availability checks: cold (one batched free/busy query) vs. served from the
+in-memory index, and the cost of an incremental sync after a calendar change.
+
+    python -m benchmarks.bench_availability
+"""
+import datetime
+import statistics
+import time
+
+from availability import WORK_TZ, AvailabilityEngine, FakeCalendarBackend
+
+
+def populate(backend: FakeCalendarBackend, first: datetime.date, days: int) -> None:
+    for d in range(days):
+        day = first + datetime.timedelta(days=d)
+        for hour in (10, 13, 15):
+            start = datetime.datetime.combine(day, datetime.time(hour), WORK_TZ)
+            backend.add_event(start, start + datetime.timedelta(minutes=45))
+
+
+def timed(fn, n: int = 1) -> float:
+    samples = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    latency = 0.12  # a typical Google Calendar round trip
+    backend = FakeCalendarBackend(latency=latency)
+    today = datetime.date.today()
+    populate(backend, today, 30)
+    engine = AvailabilityEngine(backend, refresh_interval=3600)
+    morning = datetime.datetime.combine(today, datetime.time(0), WORK_TZ)
+
+    cold = timed(lambda: engine.free_slots(today, now=morning))
+    warm = timed(lambda: engine.free_slots(today + datetime.timedelta(days=3), now=morning), 2000)
+    print(f"cold check (sync baseline + free/busy): {cold * 1000:8.1f} ms")
+    print(f"indexed check:                         {warm * 1e6:8.1f} µs")
+
+    backend.add_event(*[datetime.datetime.combine(today + datetime.timedelta(days=2), datetime.time(h), WORK_TZ) for h in (16, 17)])
+    engine.refresh_interval = 0
+    resync = timed(lambda: engine.free_slots(today + datetime.timedelta(days=2), now=morning))
+    print(f"check after a change (sync + 1 day):   {resync * 1000:8.1f} ms")
+    print(f"backend calls: {backend.calls} | engine: {engine.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
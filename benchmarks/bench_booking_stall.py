@@ -0,0 +1,71 @@
+"""
+Checks that a slow booking doesn't freeze audio streaming.
+
+Starts the mock Deepdub server (sending chunks in real time) and the bridge with a
+stubbed calendar that takes `--booking-latency` seconds per insert, opens a
+/to-speech stream, fires a few /book-meeting calls mid-stream, and measures the
+largest gap between audio chunks while the bookings are in flight. Exits non-zero
+if that gap exceeds `--max-gap`.
+
+    python -m benchmarks.bench_booking_stall --booking-latency 2
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from benchmarks.loadtest import bench_day, http_post, start_processes, tool_payload
+
+TEXT = "מעולה, שמחה לשמוע. הסוכנים שלנו מנהלים שיחות טלפון מלאות עם לקוחות"
+
+
+async def run(args) -> int:
+    proc_args = argparse.Namespace(
+        first_chunk_delay=0.1, chunk_interval=0.1, handshake_delay=0.0, booking_latency=args.booking_latency,
+    )
+    mock, bridge, port = start_processes(proc_args)
+    try:
+        arrivals: list[float] = []
+        stream = asyncio.create_task(http_post(
+            port, "/to-speech", {"message": {"text": TEXT}}, on_data=lambda n: arrivals.append(time.perf_counter()),
+        ))
+        await asyncio.sleep(1.0)
+
+        t_book = time.perf_counter()
+        bookings = await asyncio.gather(*[
+            http_post(port, "/book-meeting", tool_payload("book_meeting", {
+                "date": str(bench_day()), "time": f"{10 + i}:00", "email": f"lead{i}@example.com", "name": "Stall Test"},
+                f"stall-{i}"))
+            for i in range(args.bookings)
+        ])
+        t_booked = time.perf_counter()
+        await stream
+    finally:
+        bridge.terminate()
+        mock.terminate()
+        bridge.wait()
+        mock.wait()
+
+    gaps = [b - a for a, b in zip(arrivals, arrivals[1:])]
+    during = [b - a for a, b in zip(arrivals, arrivals[1:]) if b > t_book and a < t_booked]
+    worst = max(during, default=0.0)
+    print(f"{args.bookings} bookings took {max(r['total'] for r in bookings):.2f}s (stubbed insert {args.booking_latency}s)")
+    print(f"audio chunks={len(arrivals)} max gap overall={max(gaps, default=0) * 1000:.0f}ms "
+          f"during bookings={worst * 1000:.0f}ms (chunks every ~100ms)")
+    if worst > args.max_gap:
+        print(f"FAIL: streaming stalled for {worst:.2f}s while bookings were running")
+        return 1
+    print("OK: streaming kept flowing during the bookings")
+    return 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--booking-latency", type=float, default=2.0)
+    ap.add_argument("--bookings", type=int, default=3)
+    ap.add_argument("--max-gap", type=float, default=0.5)
+    sys.exit(asyncio.run(run(ap.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Per-booking calendar latency: rebuilding the service for every booking (the old
+get_calendar_service) vs. the shared CalendarClient, against a stubbed HTTP layer.
+
+The stub charges `--connect-ms` the first time a transport is used (TCP + TLS
+to googleapis.com) and `--rtt-ms` for every request.
+
+    python -m benchmarks.bench_calendar --bookings 50 --threads 8
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpMock
+
+from calendar_client import CalendarClient
+
+SCOPES = ["https://www.googleapis.com/auth/calendar"]
+EVENT = {
+    "summary": "bench",
+    "start": {"dateTime": "2026-10-20T10:00:00", "timeZone": "Asia/Jerusalem"},
+    "end": {"dateTime": "2026-10-20T10:45:00", "timeZone": "Asia/Jerusalem"},
+}
+
+
+class SlowHttpMock(HttpMock):
+    connect_s = 0.0
+    rtt_s = 0.0
+
+    def __init__(self):
+        super().__init__(headers={"status": "200"})
+        self.data = json.dumps({"id": "evt1", "htmlLink": "https://calendar.example/evt1"}).encode()
+        self._connected = False
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=1, connection_type=None):
+        time.sleep(self.rtt_s + (0 if self._connected else self.connect_s))
+        self._connected = True
+        return super().request(uri, method, body, headers, redirections, connection_type)
+
+
+def write_token(path: str) -> None:
+    creds = Credentials(
+        token="bench-token",
+        refresh_token="bench-refresh",
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id="bench",
+        client_secret="bench",
+        scopes=SCOPES,
+        expiry=datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+    )
+    with open(path, "w") as f:
+        f.write(creds.to_json())
+
+
+def book_rebuilding(token_path: str) -> None:
+    creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+    service = build("calendar", "v3", http=AuthorizedHttp(creds, http=SlowHttpMock()), cache_discovery=False)
+    service.events().insert(calendarId="primary", body=EVENT).execute()
+
+
+def run(label: str, fn, bookings: int, threads: int) -> None:
+    samples = []
+    lock = threading.Lock()
+
+    def one(_):
+        t = time.perf_counter()
+        fn()
+        with lock:
+            samples.append(time.perf_counter() - t)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(one, range(bookings)))
+    wall = time.perf_counter() - t0
+    s = sorted(samples)
+    print(
+        f"{label:<22} p50={statistics.median(s) * 1000:7.1f}ms p99={s[int(len(s) * 0.99) - 1] * 1000:7.1f}ms "
+        f"throughput={bookings / wall:6.1f}/s"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bookings", type=int, default=50)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--connect-ms", type=float, default=60)
+    ap.add_argument("--rtt-ms", type=float, default=40)
+    args = ap.parse_args()
+    SlowHttpMock.connect_s = args.connect_ms / 1000
+    SlowHttpMock.rtt_s = args.rtt_ms / 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        token_path = os.path.join(tmp, "token.json")
+        write_token(token_path)
+        print(f"{args.bookings} bookings on {args.threads} threads, connect={args.connect_ms}ms rtt={args.rtt_ms}ms")
+        run("rebuild per booking", lambda: book_rebuilding(token_path), args.bookings, args.threads)
+
+        client = CalendarClient(Credentials.from_authorized_user_file(token_path, SCOPES), http_factory=SlowHttpMock)
+        run("shared CalendarClient", lambda: client.service.events().insert(calendarId="primary", body=EVENT).execute(),
+            args.bookings, args.threads)
+        print(f"transports opened by the shared client: {client.stats['transports']}")
+
+
+if __name__ == "__main__":
+    main()
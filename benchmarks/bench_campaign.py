@@ -0,0 +1,64 @@
+"""
+Campaign dialing against the local mock Vapi API: the old one-call-at-a-time
+path (a new connection per requests.post) vs. CampaignDialer's pooled session
+with a concurrency cap.
+
+    python -m benchmarks.bench_campaign --leads 100 --latency 0.2 --concurrency 10
+"""
+import argparse
+import time
+
+import requests
+
+from benchmarks.mock_vapi import MockVapiState, serve
+from campaign import CampaignDialer, load_leads_csv, render_call_payload
+
+PROMPT = "{gender_instruction} הלקוח הוא {customer_name}, המייל שלו {lead_email}."
+FIRST = "היי {customer_name}, כאן קטי מחברת אלטא. יש לך דקה?"
+
+
+def make_csv(n: int) -> str:
+    rows = ["name,phone,email,gender"]
+    rows += [f"Lead {i},+97250{i:07d},lead{i}@example.com,{'Female' if i % 2 else 'Male'}" for i in range(n)]
+    return "\n".join(rows)
+
+
+def render(lead):
+    return render_call_payload(lead, PROMPT, FIRST, "gpt-4o", "asst", "phone", "http://bridge.invalid/to-speech")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--leads", type=int, default=100)
+    ap.add_argument("--latency", type=float, default=0.2, help="mock Vapi response time (s)")
+    ap.add_argument("--concurrency", type=int, default=10)
+    ap.add_argument("--rate", type=float, default=0, help="calls per minute (0 = unlimited)")
+    args = ap.parse_args()
+
+    state = MockVapiState(args.latency)
+    server = serve(state)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    leads, invalid = load_leads_csv(make_csv(args.leads))
+    print(f"{len(leads)} leads ({len(invalid)} invalid), mock latency {args.latency * 1000:.0f}ms")
+
+    t = time.perf_counter()
+    for lead in leads:
+        payload, _ = render(lead)
+        requests.post(f"{base}/call/phone", headers={"Authorization": "Bearer x"}, json=payload)
+    dt = time.perf_counter() - t
+    print(f"one at a time:       {dt:6.2f}s  {len(leads) / dt:6.1f} calls/s  connections={state.connections}")
+
+    before = state.connections
+    dialer = CampaignDialer("x", concurrency=args.concurrency, calls_per_minute=args.rate, base_url=base)
+    t = time.perf_counter()
+    results = list(dialer.run(leads, render))
+    dt = time.perf_counter() - t
+    dialer.close()
+    called = sum(r.status == "called" for r in results)
+    print(f"campaign dialer x{args.concurrency}: {dt:6.2f}s  {len(leads) / dt:6.1f} calls/s  "
+          f"connections={state.connections - before} called={called}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Cold start of a bridge instance: what importing server.py costs (from
+`python -X importtime`), how long until the process answers HTTP, until
+/ready says it's warm, and the first /to-speech after that.
+
+The bridge runs as `python server.py` against the mock Deepdub server, as a
+freshly scaled-out instance would. A tree without /ready counts as ready once it
+answers at all.
+
+    python -m benchmarks.bench_cold_start --runs 5
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.loadtest import ROOT, free_port, http_post
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def import_profile() -> tuple[float, list[tuple[str, float]]]:
+    """Seconds to import server, and server's direct imports by cumulative seconds."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server"], cwd=ROOT,
+                         capture_output=True, text=True, env={**os.environ, "LOG_LEVEL": "WARNING"}).stderr
+    total, children = 0.0, []
+    for m in _IMPORT_LINE.finditer(out):
+        _, cumulative, indent, name = m.groups()
+        if name == "server":
+            total = int(cumulative) / 1e6
+        elif len(indent) == 2:
+            children.append((name, int(cumulative) / 1e6))
+    return total, sorted(children, key=lambda c: -c[1])
+
+
+async def http_get_status(port: int, path: str) -> int:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    writer.close()
+    return status
+
+
+async def start_once(mock_port: int) -> dict:
+    port = free_port()
+    env = {**os.environ, "PORT": str(port), "DEEPDUB_WS_URL": f"ws://127.0.0.1:{mock_port}", "DEEPDUB_API_KEY": "bench",
+           "TTS_CACHE_DIR": "", "OUTBOX_DB": ":memory:", "LOG_LEVEL": "WARNING"}
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "server.py"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    listening = ready = None
+    try:
+        while ready is None:
+            if proc.poll() is not None:
+                raise RuntimeError("bridge exited during start-up")
+            try:
+                status = await http_get_status(port, "/ready")
+            except (OSError, IndexError, ValueError):
+                await asyncio.sleep(0.005)
+                continue
+            now = time.perf_counter() - t0
+            listening = listening or now
+            if status != 503:
+                ready = now
+            else:
+                await asyncio.sleep(0.005)
+        first = await http_post(port, "/to-speech", {"message": {"text": "שלום, מדברת קטי מאלטה."}})
+        return {"listening": listening, "ready": ready, "first_ttfb": first["ttfb"]}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+async def main(args) -> None:
+    total, children = import_profile()
+    total = statistics.median([total] + [import_profile()[0] for _ in range(args.runs - 1)])
+    print(f"import server: {total * 1000:.0f} ms (median of {args.runs})")
+    for name, seconds in children[:args.top]:
+        print(f"  {name:28} {seconds * 1000:7.1f} ms")
+
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_deepdub", "--port", str(mock_port := free_port()),
+         "--first-chunk-delay", str(args.first_chunk_delay), "--handshake-delay", str(args.handshake_delay)],
+        cwd=ROOT, stdout=subprocess.PIPE, text=True,
+    )
+    mock.stdout.readline()
+    try:
+        runs = [await start_once(mock_port) for _ in range(args.runs)]
+    finally:
+        mock.terminate()
+        mock.wait()
+    for key, label in (("listening", "answers HTTP"), ("ready", "/ready"), ("first_ttfb", "first /to-speech TTFB")):
+        print(f"{label:22} median={statistics.median(r[key] for r in runs) * 1000:7.1f} ms "
+              f"max={max(r[key] for r in runs) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=8, help="direct imports of server.py to list")
+    ap.add_argument("--first-chunk-delay", type=float, default=0.15)
+    ap.add_argument("--handshake-delay", type=float, default=0.1, help="mock TCP + TLS + upgrade time (s)")
+    asyncio.run(main(ap.parse_args()))
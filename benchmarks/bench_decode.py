@@ -0,0 +1,94 @@
+"""
+Micro-benchmark: in-process WAV decode/resample vs. the per-chunk ffmpeg subprocess.
+
+    python -m benchmarks.bench_decode --rate 24000 --chunk-ms 100 --chunks 200
+"""
+import argparse
+import io
+import shutil
+import time
+import wave
+
+import numpy as np
+
+from audio import PcmDecoder, ffmpeg_decode
+
+
+def make_wav_chunks(rate: int, chunk_ms: int, count: int, channels: int = 1) -> list[bytes]:
+    """A continuous 440 Hz tone cut into standalone WAV files, like Deepdub's stream."""
+    per_chunk = rate * chunk_ms // 1000
+    t = np.arange(per_chunk * count) / rate
+    tone = (0.5 * np.sin(2 * np.pi * 440 * t) * 32767).astype("<i2")
+    chunks = []
+    for i in range(count):
+        frames = tone[i * per_chunk:(i + 1) * per_chunk]
+        if channels > 1:
+            frames = np.repeat(frames[:, None], channels, axis=1)
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(channels)
+            w.setsampwidth(2)
+            w.setframerate(rate)
+            w.writeframes(frames.tobytes())
+        chunks.append(buf.getvalue())
+    return chunks
+
+
+def bench(name: str, fn, chunks: list[bytes]) -> None:
+    times = []
+    out = 0
+    for c in chunks:
+        s = time.perf_counter()
+        out += len(fn(c))
+        times.append((time.perf_counter() - s) * 1000)
+    times.sort()
+    p50 = times[len(times) // 2]
+    p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+    print(f"{name:<10} chunks={len(chunks)} total={sum(times):8.1f}ms p50={p50:.3f}ms p99={p99:.3f}ms pcm_out={out}")
+
+
+def boundary_error(chunks: list[bytes]) -> float:
+    """Max sample difference between chunked decoding and decoding everything in one go."""
+    chunked = PcmDecoder()
+    a = b"".join(chunked.decode(c) for c in chunks) + chunked.flush()
+
+    frames = b"".join(c[44:] for c in chunks)
+    with wave.open(io.BytesIO(chunks[0])) as w:
+        rate, channels = w.getframerate(), w.getnchannels()
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(frames)
+    whole = PcmDecoder()
+    b = whole.decode(buf.getvalue()) + whole.flush()
+
+    n = min(len(a), len(b)) // 2
+    diff = np.abs(np.frombuffer(a[:n * 2], "<i2").astype(int) - np.frombuffer(b[:n * 2], "<i2").astype(int))
+    return float(diff.max()) if n else 0.0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rate", type=int, default=24000)
+    ap.add_argument("--channels", type=int, default=1)
+    ap.add_argument("--chunk-ms", type=int, default=100)
+    ap.add_argument("--chunks", type=int, default=200)
+    args = ap.parse_args()
+
+    chunks = make_wav_chunks(args.rate, args.chunk_ms, args.chunks, args.channels)
+    print(f"input: {args.rate} Hz x{args.channels}, {args.chunk_ms} ms chunks")
+
+    decoder = PcmDecoder()
+    bench("in-process", decoder.decode, chunks)
+    print(f"chunk-boundary max abs error vs one-shot decode: {boundary_error(chunks):.0f} LSB")
+
+    if shutil.which("ffmpeg"):
+        bench("ffmpeg", ffmpeg_decode, chunks)
+    else:
+        print("ffmpeg       not found on PATH, skipping subprocess baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+FAQ index: build time, lookup latency, and which canonical question a set of
+paraphrased caller questions (and a few non-FAQ ones) resolve to.
+
+    python -m benchmarks.bench_faq
+"""
+import statistics
+import time
+
+from faq import FaqIndex
+
+# (what the caller said, the FAQ question it should resolve to, or None)
+CASES = [
+    ("זה רובוט?", "זה רובוט?"),
+    ("אני מדבר עם רובוט?", "זה רובוט?"),
+    ("את בינה מלאכותית?", "זה רובוט?"),
+    ("ראבוט?", "זה רובוט?"),
+    ("כמה זה עולה", "כמה זה עולה?"),
+    ("מה המחיר?", "כמה זה עולה?"),
+    ("כמה עולה השירות שלכם", "כמה זה עולה?"),
+    ("איך זה מתחבר למערכות שלי?", "איך זה מתחבר למערכות שלי?"),
+    ("זה מתחבר למערכת שלנו?", "איך זה מתחבר למערכות שלי?"),
+    ("מה השעה?", None),
+    ("מתי אתם פנויים מחר?", None),
+    ("אפשר לקבוע פגישה?", None),
+    ("מה שלומך", None),
+]
+
+
+def main(path: str = "Alta_product_info.txt") -> None:
+    index = FaqIndex(path, check_interval=3600)
+    t = time.perf_counter()
+    index.reload_if_changed()
+    print(f"build: {(time.perf_counter() - t) * 1000:.2f} ms | {index.snapshot()['entries']} entries, "
+          f"{index.snapshot()['features']} features\n")
+
+    correct = 0
+    for question, expected in CASES:
+        match = index.lookup(question)
+        got = match.entry.question if match else None
+        correct += got == expected
+        score = f"{match.score:.2f}" if match else "  - "
+        print(f"{'ok ' if got == expected else 'BAD'} {score}  {question!r:32} -> {got!r}")
+    print(f"\n{correct}/{len(CASES)} resolved as expected (min_score={index.min_score})")
+
+    samples = []
+    for _ in range(200):
+        for question, _ in CASES:
+            t = time.perf_counter()
+            index.lookup(question)
+            samples.append(time.perf_counter() - t)
+    samples.sort()
+    print(f"lookup: p50={statistics.median(samples) * 1e6:.1f} µs p99={samples[int(len(samples) * 0.99)] * 1e6:.1f} µs "
+          f"max={samples[-1] * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Per-output-format decode cost: CPU per second of audio and bytes sent per
+second, for the old path (Deepdub's default 24 kHz, always converted to
+16 kHz s16le) vs. asking Deepdub for the nearest native rate and streaming
+the requested format directly.
+
+    python -m benchmarks.bench_formats --seconds 60 --default-rate 24000
+"""
+import argparse
+import time
+
+from audio import OutputFormat, PcmDecoder
+from benchmarks.bench_decode import make_wav_chunks
+from tts import native_rate
+
+FORMATS = [
+    OutputFormat(8000, "mulaw"),
+    OutputFormat(8000, "linear16"),
+    OutputFormat(11025, "linear16"),  # not native: rendered at the next rate up and resampled
+    OutputFormat(16000, "linear16"),
+    OutputFormat(22050, "linear16"),
+    OutputFormat(24000, "linear16"),
+]
+
+
+def measure(src_rate: int, fmt: OutputFormat, seconds: int, chunk_ms: int, repeat: int) -> tuple[float, float]:
+    """CPU ms per second of audio (best of `repeat`) and output bytes per second of audio."""
+    chunks = make_wav_chunks(src_rate, chunk_ms, seconds * 1000 // chunk_ms)
+    best = float("inf")
+    out = 0
+    for _ in range(repeat):
+        decoder = PcmDecoder(fmt)
+        t = time.process_time()
+        out = sum(len(decoder.decode(c)) for c in chunks) + len(decoder.flush())
+        best = min(best, time.process_time() - t)
+    return best * 1000 / seconds, out / seconds
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=int, default=60, help="audio per run")
+    ap.add_argument("--chunk-ms", type=int, default=100)
+    ap.add_argument("--default-rate", type=int, default=24000, help="what Deepdub sends when no rate is requested")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    old_fmt = OutputFormat()
+    old_cpu, old_bytes = measure(args.default_rate, old_fmt, args.seconds, args.chunk_ms, args.repeat)
+    print(f"{'requested':<16} {'path':<30} {'cpu ms/s audio':>15} {'bytes/s sent':>13} {'cpu vs old':>11} {'bytes vs old':>13}")
+    print(f"{'(any, old)':<16} {f'{args.default_rate} -> {old_fmt}':<30} {old_cpu:15.3f} {old_bytes:13.0f}")
+    for fmt in FORMATS:
+        src = native_rate(fmt.sample_rate) or args.default_rate
+        cpu, sent = measure(src, fmt, args.seconds, args.chunk_ms, args.repeat)
+        print(f"{str(fmt):<16} {f'{src} -> {fmt}':<30} {cpu:15.3f} {sent:13.0f} "
+              f"{cpu / old_cpu:10.2f}x {sent / old_bytes:12.2f}x")
+
+
+if __name__ == "__main__":
+    main()
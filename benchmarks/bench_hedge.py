@@ -0,0 +1,79 @@
+"""
+TTFA tail with and without hedged Deepdub requests, against the mock Deepdub
+with an occasional slow generation.
+
+    python -m benchmarks.bench_hedge --requests 400 --slow-ratio 0.03 --slow-delay 1.5 --hedge-delay-ms 300
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from benchmarks.mock_deepdub import MockDeepdub, add_config_args, config_from_args, server_url
+from deepdub_pool import DeepdubPool
+from hedge import Hedger
+from tts import build_tts_request, synthesize
+
+TEXT = "שלום, כאן קטי מחברת אלטא. יש לך דקה?"
+
+
+def pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def run(pool: DeepdubPool, hedger, requests: int, concurrency: int) -> list[float]:
+    sem = asyncio.Semaphore(concurrency)
+    ttfas = []
+
+    async def one() -> None:
+        async with sem:
+            req = build_tts_request(TEXT)
+            t0 = time.perf_counter()
+            start = lambda: synthesize(pool, req, t0)
+            stream = hedger.stream(start) if hedger else start()
+            first = None
+            async for _ in stream:
+                if first is None:
+                    first = time.perf_counter() - t0
+            ttfas.append(first * 1000)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return ttfas
+
+
+async def main(args) -> None:
+    mock = MockDeepdub(config_from_args(args))
+    server = await mock.serve()
+    pool = DeepdubPool(server_url(server), "bench", size=args.concurrency * 2)
+    print(f"{args.requests} requests, {args.concurrency} concurrent, "
+          f"{args.slow_ratio:.0%} of generations {args.slow_delay * 1000:.0f}ms slow")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        await pool.start()
+    for label, hedger in (
+        ("no hedging", None),
+        (f"hedge @{args.hedge_delay_ms}ms", Hedger(args.hedge_delay_ms / 1000, args.budget, holdout=0.0)),
+    ):
+        before = mock.requests
+        ttfas = await run(pool, hedger, args.requests, args.concurrency)
+        line = (f"{label:<16} ttfa p50={pct(ttfas, 0.5):7.1f}ms p95={pct(ttfas, 0.95):7.1f}ms "
+                f"p99={pct(ttfas, 0.99):7.1f}ms max={max(ttfas):7.1f}ms deepdub_requests={mock.requests - before}")
+        if hedger:
+            snap = hedger.snapshot()
+            line += f" hedge_rate={snap['hedge_rate']:.1%} win_rate={snap['win_rate']:.0%} over_budget={snap['over_budget']}"
+        print(line)
+    await pool.close()
+    server.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--hedge-delay-ms", type=int, default=300)
+    ap.add_argument("--budget", type=int, default=1000, help="hedges per minute")
+    add_config_args(ap)
+    ap.set_defaults(first_chunk_delay=0.12, slow_ratio=0.03, slow_delay=1.5, audio_ms_per_char=20)
+    asyncio.run(main(ap.parse_args()))
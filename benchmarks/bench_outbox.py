@@ -0,0 +1,91 @@
+"""
+Confirmation-email throughput: one SMTP session per message (the old
+send_confirmation_email) vs. the pooled, batching outbox, against the local
+mock SMTP server with a per-connection handshake delay.
+
+    python -m benchmarks.bench_outbox --messages 100 --connect-delay 0.3
+"""
+import argparse
+import asyncio
+import os
+import smtplib
+import tempfile
+import threading
+import time
+
+from benchmarks.mock_smtp import MockSmtp
+from outbox import Outbox, SmtpPool, render_confirmation
+
+
+def start_mock(connect_delay: float) -> tuple[MockSmtp, int]:
+    mock = MockSmtp(connect_delay)
+    ready = threading.Event()
+    port = []
+
+    def run():
+        async def main():
+            server = await mock.serve()
+            port.append(server.sockets[0].getsockname()[1])
+            ready.set()
+            await server.serve_forever()
+        asyncio.run(main())
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return mock, port[0]
+
+
+def send_per_message(port: int, n: int) -> None:
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    for i in range(n):
+        subject, body = render_confirmation(f"Lead {i}", "2026-10-20 at 10:00", "https://calendar.example/evt")
+        msg = MIMEMultipart()
+        msg['From'] = "bot@example.com"
+        msg['To'] = f"lead{i}@example.com"
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'html'))
+        server = smtplib.SMTP("127.0.0.1", port)
+        server.sendmail("bot@example.com", f"lead{i}@example.com", msg.as_string())
+        server.quit()
+
+
+def send_outbox(port: int, n: int, workers: int) -> Outbox:
+    db = os.path.join(tempfile.mkdtemp(), "outbox.sqlite3")
+    pool = SmtpPool("127.0.0.1", port, starttls=False, username=None, password=None, size=workers)
+    outbox = Outbox(db, pool, "bot@example.com", workers=workers, poll_interval=0.05)
+    outbox.start()
+    for i in range(n):
+        outbox.enqueue_confirmation(f"lead{i}@example.com", f"Lead {i}", "2026-10-20 at 10:00", "https://calendar.example/evt")
+    while outbox.stats["sent"] < n:
+        time.sleep(0.01)
+    return outbox
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=100)
+    ap.add_argument("--connect-delay", type=float, default=0.3, help="seconds per new SMTP session")
+    ap.add_argument("--workers", type=int, default=2)
+    args = ap.parse_args()
+
+    mock, port = start_mock(args.connect_delay)
+    print(f"{args.messages} messages, {args.connect_delay * 1000:.0f}ms per SMTP handshake")
+
+    t = time.perf_counter()
+    send_per_message(port, args.messages)
+    dt = time.perf_counter() - t
+    print(f"session per message: {dt:6.2f}s  {args.messages / dt:7.1f} msg/s  connections={mock.connections}")
+
+    before = mock.connections
+    t = time.perf_counter()
+    outbox = send_outbox(port, args.messages, args.workers)
+    dt = time.perf_counter() - t
+    print(f"pooled outbox:       {dt:6.2f}s  {args.messages / dt:7.1f} msg/s  connections={mock.connections - before}")
+    print(f"outbox: {outbox.snapshot()}")
+    outbox.close()
+
+
+if __name__ == "__main__":
+    main()
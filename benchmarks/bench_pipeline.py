@@ -0,0 +1,66 @@
+"""
+First-audio latency of whole-text vs. sentence-pipelined synthesis against the mock Deepdub,
+with synthesis time proportional to text length.
+
+    python -m benchmarks.bench_pipeline --synth-ms-per-char 6 --parallelism 3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from benchmarks.mock_deepdub import MockDeepdub, add_config_args, config_from_args, server_url
+from deepdub_pool import DeepdubPool
+from segmenter import split_sentences, synthesize_segments
+from tts import build_tts_request, synthesize
+
+REPLY = (
+    "מעולה, שמחה לשמוע שזה מעניין אותך. "
+    "הסוכנים שלנו מנהלים שיחות טלפון מלאות עם לקוחות, בדיוק כמו נציג אנושי, ועובדים בכל שעות היממה. "
+    "העלות היא בערך עשרה אחוזים מעלות של עובד במוקד, והמערכת מתממשקת ל-Salesforce, HubSpot ו-Monday. "
+    "יש לי פנוי מחר ב-10:00 או ב-14:30, מה מתאים לך יותר?"
+)
+
+
+async def measure(source) -> tuple[float, float]:
+    t0 = time.perf_counter()
+    ttfa = None
+    async for _ in source:
+        if ttfa is None:
+            ttfa = time.perf_counter() - t0
+    return ttfa * 1000, (time.perf_counter() - t0) * 1000
+
+
+async def main(args) -> None:
+    mock = MockDeepdub(config_from_args(args))
+    server = await mock.serve()
+    pool = DeepdubPool(server_url(server), "bench", size=args.parallelism + 1)
+    segments = split_sentences(REPLY)
+    print(f"reply: {len(REPLY)} chars, {len(segments)} segments: {[len(s) for s in segments]}")
+
+    results = {"whole": [], "pipelined": []}
+    with contextlib.redirect_stdout(io.StringIO()):
+        await pool.start()
+        for _ in range(args.runs):
+            req = build_tts_request(REPLY)
+            results["whole"].append(await measure(synthesize(pool, req)))
+            reqs = [build_tts_request(s) for s in segments]
+            render = lambda r: synthesize(pool, r)
+            results["pipelined"].append(await measure(synthesize_segments(render, reqs, args.parallelism)))
+        await pool.close()
+    server.close()
+
+    for name, runs in results.items():
+        ttfa = sorted(r[0] for r in runs)[len(runs) // 2]
+        total = sorted(r[1] for r in runs)[len(runs) // 2]
+        print(f"{name:<10} median ttfa={ttfa:7.1f}ms total={total:7.1f}ms")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--parallelism", type=int, default=3)
+    add_config_args(ap)
+    ap.set_defaults(synth_ms_per_char=6.0, first_chunk_delay=0.1)
+    asyncio.run(main(ap.parse_args()))
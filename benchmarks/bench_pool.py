@@ -0,0 +1,73 @@
+"""
+TTFA with and without the pre-warmed Deepdub connection pool, against the local mock.
+
+    python -m benchmarks.bench_pool --handshake-delay 0.08 --requests 50 --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.mock_deepdub import MockDeepdub, add_config_args, config_from_args, server_url
+from deepdub_pool import DeepdubPool
+
+
+async def synthesize_once(pool: DeepdubPool, text: str) -> float:
+    """Returns time to first audio chunk in ms, draining the rest of the generation."""
+    t0 = time.perf_counter()
+    ttfa = None
+    async with pool.connection() as conn:
+        await conn.ws.send(json.dumps({"action": "text-to-speech", "targetText": text}))
+        while True:
+            msg = json.loads(await conn.ws.recv())
+            if ttfa is None and msg.get("data"):
+                ttfa = (time.perf_counter() - t0) * 1000
+            if msg.get("isFinished"):
+                conn.clean = True
+                break
+    return ttfa or 0.0
+
+
+async def run(url: str, pool_size: int, requests: int, concurrency: int) -> list[float]:
+    pool = DeepdubPool(url, "bench", size=pool_size)
+    await pool.start()
+    sem = asyncio.Semaphore(concurrency)
+    text = "שלום, כאן קטי מחברת אלטא. יש לך דקה?"
+
+    async def one():
+        async with sem:
+            return await synthesize_once(pool, text)
+
+    try:
+        return await asyncio.gather(*(one() for _ in range(requests)))
+    finally:
+        await pool.close()
+
+
+def report(name: str, ttfas: list[float]) -> None:
+    s = sorted(ttfas)
+    pct = lambda p: s[min(len(s) - 1, int(len(s) * p))]
+    print(f"{name:<14} n={len(s)} ttfa p50={pct(0.5):6.1f}ms p90={pct(0.9):6.1f}ms p99={pct(0.99):6.1f}ms")
+
+
+async def main(args) -> None:
+    mock = MockDeepdub(config_from_args(args))
+    server = await mock.serve()
+    url = server_url(server)
+    try:
+        report("no pool", await run(url, 0, args.requests, args.concurrency))
+        conns_before = mock.connections
+        report(f"pool size={args.pool_size}", await run(url, args.pool_size, args.requests, args.concurrency))
+        print(f"connections opened with pool: {mock.connections - conns_before}")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=50)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--pool-size", type=int, default=4)
+    add_config_args(ap)
+    ap.set_defaults(handshake_delay=0.08, first_chunk_delay=0.05)
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,115 @@
+"""
+Live-stream framing: the old queue of variable-size bytes vs. the fixed-frame
+ring buffer, fed by a producer with Deepdub-like uneven chunk timing.
+
+For each variant it reports the HTTP chunk sizes the client would see, the
+time to first byte, and how often a real-time player at the far end would
+run dry (and for how long), plus the stream's own ring stats.
+
+    python -m benchmarks.bench_ring --streams 20 --seconds 5 --jitter-ms 0,60,120 --ring-seconds 1
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import tracemalloc
+
+from pcm_ring import PcmRing
+
+RATE_BYTES = 32000  # 16 kHz s16le
+
+
+async def produce(write, close, seconds: float, chunk_ms: int, spread: float, rng: random.Random) -> None:
+    """Decoded chunks of roughly `chunk_ms`, arriving every `chunk_ms` +/- `spread` (x chunk_ms), like realTime Deepdub."""
+    await asyncio.sleep(0.05)
+    sent = 0
+    total = int(RATE_BYTES * seconds)
+    while sent < total:
+        n = min(total - sent, int(RATE_BYTES * chunk_ms / 1000 * rng.uniform(0.6, 1.4)) & ~1)
+        await write(bytes(n))
+        sent += n
+        await asyncio.sleep(chunk_ms / 1000 * rng.uniform(1 - spread, 1 + spread) * n / (RATE_BYTES * chunk_ms / 1000))
+    close()
+
+
+def playback(arrivals: list[tuple[float, int]]) -> tuple[int, float]:
+    """Underruns and total stall seconds of a player that starts at the first byte and plays in real time."""
+    if not arrivals:
+        return 0, 0.0
+    playhead = arrivals[0][0]  # time the buffered audio runs out
+    stalls, stalled = 0, 0.0
+    for t, n in arrivals:
+        if t > playhead:
+            stalls += 1
+            stalled += t - playhead
+            playhead = t
+        playhead += n / RATE_BYTES
+    return stalls, stalled
+
+
+async def run_queue(args, rng) -> dict:
+    q: asyncio.Queue = asyncio.Queue(maxsize=400)
+    t0 = time.perf_counter()
+    task = asyncio.create_task(produce(q.put, lambda: q.put_nowait(None), args.seconds, args.chunk_ms, args.spread, rng))
+    arrivals = []
+    while (chunk := await q.get()) is not None:
+        arrivals.append((time.perf_counter(), len(chunk)))
+    await task
+    return {"t0": t0, "arrivals": arrivals, "stats": None}
+
+
+async def run_ring(args, rng, jitter_ms: int) -> dict:
+    frame = RATE_BYTES * args.frame_ms // 1000
+    ring = PcmRing(frame, args.frame_ms / 1000, capacity_frames=int(args.ring_seconds * 1000 / args.frame_ms), guard_frames=-(-65536 // frame) + 10,
+                   jitter_frames=-(-jitter_ms // args.frame_ms), max_frames_per_read=10)
+    t0 = time.perf_counter()
+    task = asyncio.create_task(produce(ring.write, ring.close, args.seconds, args.chunk_ms, args.spread, rng))
+    arrivals = []
+    while (chunk := await ring.read()) is not None:
+        arrivals.append((time.perf_counter(), len(chunk)))
+    await task
+    return {"t0": t0, "arrivals": arrivals, "stats": ring.stats}
+
+
+async def variant(label: str, args, make) -> None:
+    tracemalloc.start()
+    results = await asyncio.gather(*(make(random.Random(i)) for i in range(args.streams)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sizes = [n for r in results for _, n in r["arrivals"]]
+    ttfb = statistics.median((r["arrivals"][0][0] - r["t0"]) * 1000 for r in results)
+    plays = [playback(r["arrivals"]) for r in results]
+    line = (f"{label:<14} chunks/stream={len(sizes) / len(results):6.1f} size min/med/max="
+            f"{min(sizes)}/{int(statistics.median(sizes))}/{max(sizes)} ttfb p50={ttfb:6.1f}ms "
+            f"player underruns/stream={sum(p[0] for p in plays) / len(plays):5.2f} "
+            f"stalled={sum(p[1] for p in plays) * 1000 / len(plays):6.1f}ms traced_peak={peak / 1024:7.0f}KiB")
+    stats = [r["stats"] for r in results if r["stats"]]
+    if stats:
+        line += (f" | ring underruns={sum(s['underruns'] for s in stats) / len(stats):.2f}"
+                 f" stalled={sum(s['stalled_seconds'] for s in stats) * 1000 / len(stats):.1f}ms"
+                 f" peak={max(s['peak_bytes'] for s in stats) * 1000 / RATE_BYTES:.0f}ms"
+                 f" allocated={stats[0]['allocated_bytes'] / 1024:.0f}KiB/stream")
+    print(line)
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--streams", type=int, default=20)
+    ap.add_argument("--seconds", type=float, default=5.0, help="audio per stream")
+    ap.add_argument("--chunk-ms", type=int, default=100, help="mean decoded chunk duration")
+    ap.add_argument("--spread", type=float, default=0.5, help="arrival jitter as a fraction of the chunk interval")
+    ap.add_argument("--frame-ms", type=int, default=20)
+    ap.add_argument("--jitter-ms", default="0,60,120,200", help="ring jitter targets to compare")
+    ap.add_argument("--ring-seconds", type=float, default=1.0, help="ring capacity (TTS_RING_SECONDS)")
+    args = ap.parse_args()
+
+    print(f"{args.streams} streams x {args.seconds}s, ~{args.chunk_ms}ms chunks +/-{args.spread:.0%}, {args.frame_ms}ms frames")
+    await variant("queue", args, lambda rng: run_queue(args, rng))
+    for jitter in (int(j) for j in args.jitter_ms.split(",")):
+        await variant(f"ring j={jitter}ms", args, lambda rng, j=jitter: run_ring(args, rng, j))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Slot-hold contention: hundreds of simulated callers checking availability and
+booking at once. Verifies that no slot is committed twice and compares
+per-day locking with one global lock.
+
+Each caller is offered up to 3 slots (held for it), thinks for a moment, then
+commits one of them; on a conflict it asks again.
+
+    python -m benchmarks.bench_slot_holds --callers 300 --days 5
+"""
+import argparse
+import datetime
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from availability import WORK_TZ
+from slot_holds import SlotHolds, _DayBook
+
+DURATION = datetime.timedelta(minutes=45)
+
+
+class GlobalLockHolds(SlotHolds):
+    """Same structure behind a single lock, for comparison."""
+
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        self._global = threading.Lock()
+
+    def _book(self, day: datetime.date) -> _DayBook:
+        book = super()._book(day)
+        book.lock = self._global
+        return book
+
+
+def grid(day: datetime.date) -> list[datetime.datetime]:
+    start = datetime.datetime.combine(day, datetime.time(9), WORK_TZ)
+    return [start + datetime.timedelta(minutes=30 * i) for i in range(17)]
+
+
+def caller(holds: SlotHolds, owner: str, days: list[datetime.date], think: float, latencies: list) -> bool:
+    rng = random.Random(owner)
+    day = rng.choice(days)
+    for _ in range(5):
+        t = time.perf_counter()
+        offered = holds.offer(owner, grid(day), DURATION, select=lambda free: free[:3])
+        latencies.append(time.perf_counter() - t)
+        if not offered:
+            day = rng.choice(days)
+            continue
+        time.sleep(think * rng.random())
+        slot = rng.choice(offered)
+        t = time.perf_counter()
+        ok = holds.commit(owner, slot, slot + DURATION)
+        latencies.append(time.perf_counter() - t)
+        if ok:
+            return True
+    holds.release(owner)
+    return False
+
+
+def run(label: str, holds: SlotHolds, args, days: list[datetime.date]) -> None:
+    latencies: list[float] = []
+    t = time.perf_counter()
+    with ThreadPoolExecutor(args.callers) as pool:
+        booked = sum(pool.map(lambda i: caller(holds, f"call{i}", days, args.think, latencies), range(args.callers)))
+    wall = time.perf_counter() - t
+
+    # Every day's committed slots must be disjoint
+    double = 0
+    for book in holds._days.values():
+        for (s1, e1), (s2, e2) in zip(book.committed, book.committed[1:]):
+            if s2 < e1:
+                double += 1
+    s = sorted(latencies)
+    print(
+        f"{label:<16} booked={booked:<4} conflicts={holds.stats['conflicts']:<5} double-booked={double} "
+        f"op p50={statistics.median(s) * 1e6:6.1f}µs p99={s[int(len(s) * 0.99)] * 1e6:7.1f}µs wall={wall:.2f}s"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--callers", type=int, default=300)
+    ap.add_argument("--days", type=int, default=5)
+    ap.add_argument("--think", type=float, default=0.05, help="max seconds between offer and commit")
+    args = ap.parse_args()
+
+    first = datetime.date.today() + datetime.timedelta(days=1)
+    days = [first + datetime.timedelta(days=i) for i in range(args.days)]
+    print(f"{args.callers} concurrent callers, {args.days} days x 17 candidate slots")
+    run("per-day locks", SlotHolds(ttl=120), args, days)
+    run("global lock", GlobalLockHolds(ttl=120), args, days)
+
+
+if __name__ == "__main__":
+    main()
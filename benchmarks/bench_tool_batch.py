@@ -0,0 +1,101 @@
+"""
+Tool calls from one model turn: several calls in one Vapi message (handled
+concurrently, same-date checks sharing one lookup) vs. the same calls sent one
+message at a time, as when only the first call of a message was answered.
+
+Runs the bridge with the stubbed calendar (benchmarks/serve_stub.py, each
+free/busy query STUB_CALENDAR_LATENCY, each calendar insert --booking-latency).
+Every round asks about days nobody has asked about yet, so the calendar is cold.
+
+    python -m benchmarks.bench_tool_batch --rounds 5
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import statistics
+import time
+import urllib.request
+
+from benchmarks.loadtest import start_processes
+
+
+def post(port: int, path: str, payload: dict) -> dict:
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=json.dumps(payload).encode(),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+def message(name: str, calls: list[dict], call_id: str) -> dict:
+    return {"message": {"call": {"id": call_id}, "toolCalls": [
+        {"id": f"tc{i}", "type": "function", "function": {"name": name, "arguments": args}} for i, args in enumerate(calls)
+    ]}}
+
+
+async def sequential(port: int, path: str, name: str, calls: list[dict], call_id: str) -> tuple[float, int]:
+    t = time.perf_counter()
+    results = 0
+    for args in calls:
+        results += len((await asyncio.to_thread(post, port, path, message(name, [args], call_id)))["results"])
+    return time.perf_counter() - t, results
+
+
+async def batched(port: int, path: str, name: str, calls: list[dict], call_id: str) -> tuple[float, int]:
+    t = time.perf_counter()
+    body = await asyncio.to_thread(post, port, path, message(name, calls, call_id))
+    assert [r["toolCallId"] for r in body["results"]] == [f"tc{i}" for i in range(len(calls))], body
+    return time.perf_counter() - t, len(body["results"])
+
+
+def availability_calls(first: datetime.date) -> list[dict]:
+    # Three days two weeks apart (three cold lookups one at a time) plus a repeat of the first
+    days = [first + datetime.timedelta(days=15 * i) for i in range(3)]
+    return [{"date": d.isoformat()} for d in days + days[:1]]
+
+
+def booking_calls(day: datetime.date) -> list[dict]:
+    return [{"date": day.isoformat(), "time": t, "email": f"lead{i}@example.com", "name": "Bench"}
+            for i, t in enumerate(("10:00", "12:00", "14:00"))]
+
+
+async def main(args) -> None:
+    mock, bridge, port = start_processes(args)
+    try:
+        base = datetime.date.today() + datetime.timedelta(days=30)
+        rows = {}
+        for r in range(args.rounds):
+            for mode, fn in (("sequential", sequential), ("batched", batched)):
+                # Fresh days for every round and mode, so each run starts from a cold calendar
+                offset = datetime.timedelta(days=100 * (2 * r + (mode == "batched")))
+                for tool, path, calls in (
+                    ("check_availability", "/check-availability", availability_calls(base + offset)),
+                    ("book_meeting", "/book-meeting", booking_calls(base + offset)),
+                ):
+                    seconds, results = await fn(port, path, tool, calls, f"bench-{mode}-{r}")
+                    assert results == len(calls)
+                    rows.setdefault((tool, len(calls)), {}).setdefault(mode, []).append(seconds)
+
+        print(f"{args.rounds} rounds, calendar query {args.calendar_latency * 1000:.0f} ms, "
+              f"calendar insert {args.booking_latency * 1000:.0f} ms")
+        for (tool, n), modes in rows.items():
+            seq, bat = statistics.median(modes["sequential"]), statistics.median(modes["batched"])
+            print(f"{tool:20} {n} calls  sequential={seq * 1000:7.1f} ms  batched={bat * 1000:7.1f} ms  "
+                  f"({seq / bat:.1f}x)")
+    finally:
+        bridge.terminate()
+        mock.terminate()
+        bridge.wait()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--calendar-latency", type=float, default=0.15, help="stubbed free/busy query time (s)")
+    ap.add_argument("--booking-latency", type=float, default=0.3, help="stubbed calendar insert / SMTP time (s)")
+    args = ap.parse_args()
+    args.first_chunk_delay = args.chunk_interval = args.handshake_delay = 0.0
+    os.environ["STUB_CALENDAR_LATENCY"] = str(args.calendar_latency)
+    asyncio.run(main(args))
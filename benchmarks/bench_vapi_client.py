@@ -0,0 +1,59 @@
+"""
+Dashboard page renders against the local mock Vapi API: the old path (a fresh
+connection and a full GET /assistant on every Streamlit rerun) vs. the shared
+VapiClient (keep-alive session, TTL cache, background 304 revalidation).
+
+    python -m benchmarks.bench_vapi_client --renders 50 --latency 0.15 --ttl 0.5
+"""
+import argparse
+import time
+
+import requests
+
+from benchmarks.mock_vapi import MockVapiState, serve
+from vapi_client import VapiClient
+
+
+def render_old(base: str, assistant_id: str) -> dict:
+    resp = requests.get(f"{base}/assistant/{assistant_id}", headers={"Authorization": "Bearer test"})
+    return resp.json()
+
+
+def timed(label: str, state: MockVapiState, renders: int, interval: float, fn) -> None:
+    before = dict(state.requests)
+    latencies = []
+    for _ in range(renders):
+        t = time.perf_counter()
+        data = fn()
+        latencies.append((time.perf_counter() - t) * 1000)
+        assert data.get("id"), data
+        time.sleep(interval)
+    latencies.sort()
+    gets = state.requests["GET"] - before["GET"]
+    not_modified = state.requests["not_modified"] - before["not_modified"]
+    print(f"{label:<14} p50={latencies[len(latencies) // 2]:7.1f}ms  max={latencies[-1]:7.1f}ms  "
+          f"GETs={gets:3d} (304s={not_modified})")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--renders", type=int, default=50)
+    ap.add_argument("--latency", type=float, default=0.15, help="mock Vapi response time (s)")
+    ap.add_argument("--interval", type=float, default=0.05, help="pause between reruns (s)")
+    ap.add_argument("--ttl", type=float, default=0.5)
+    args = ap.parse_args()
+
+    state = MockVapiState(args.latency)
+    server = serve(state)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    timed("requests.get", state, args.renders, args.interval, lambda: render_old(base, "asst"))
+    client = VapiClient("test", base_url=base, ttl=args.ttl)
+    timed("VapiClient", state, args.renders, args.interval, lambda: client.get_assistant("asst"))
+    print("client stats:", client.stats)
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""
+Load-testing harness for the bridge, fully offline.
+
+Starts the mock Deepdub WebSocket server and the bridge (with stubbed calendar / email,
+see serve_stub.py) as subprocesses, then drives /to-speech, /check-availability and
+/book-meeting from N concurrent simulated Vapi clients. Reports TTFA / total-latency
+percentiles, throughput, and the bridge's CPU and RSS, and writes everything as JSON
+so runs can be compared between commits.
+
+    python -m benchmarks.loadtest --clients 50 --duration 30 --out results.json
+    python -m benchmarks.loadtest --clients 200 --workers 1,2,4   # throughput scaling across worker counts
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+TEXTS = [
+    # Repeated utterances (greeting / confirmation) exercise the PCM cache
+    "היי, כאן קטי מחברת אלטא. יש לך דקה?",
+    "הפגישה נקבעה בהצלחה ביומן, ושלחתי לך מייל אישור עם הפרטים.",
+    "מעולה, שמחה לשמוע. הסוכנים שלנו מנהלים שיחות טלפון מלאות עם לקוחות, בדיוק כמו נציג אנושי.",
+    "המודל הוא לפי דקות שיחה, אבל כדי לתת הצעת מחיר מדויקת צריך להבין את הנפחים שלכם.",
+]
+
+
+def bench_day(weeks_ahead: int = 1) -> datetime.date:
+    """
+    A Monday at least `weeks_ahead` weeks out: always in the future and a work day (Sunday-Thursday
+    or Monday-Friday weeks alike), so runs on different dates exercise the same availability path.
+    """
+    today = datetime.date.today()
+    return today + datetime.timedelta(days=7 * weeks_ahead + (7 - today.weekday()) % 7)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def tool_payload(name: str, args: dict, call_id: str = "loadtest") -> dict:
+    return {"message": {
+        "call": {"id": call_id},
+        "toolCalls": [{"id": f"call_{random.getrandbits(32):x}", "function": {"name": name, "arguments": args}}],
+    }}
+
+
+async def http_post(port: int, path: str, payload: dict, on_data=None) -> dict:
+    """
+    Tiny HTTP/1.1 client: returns status, time to first body byte, total time and body size.
+    `on_data(n)` is called as each piece of the body arrives.
+    """
+    body = json.dumps(payload).encode()
+    t0 = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+    first, nbytes = None, 0
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            break
+        if first is None:
+            first = time.perf_counter()
+        nbytes += len(data)
+        if on_data:
+            on_data(len(data))
+    writer.close()
+    end = time.perf_counter()
+    return {"status": status, "ttfb": (first or end) - t0, "total": end - t0, "bytes": nbytes}
+
+
+class ProcSampler:
+    """Samples CPU time and RSS of a process from /proc."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak_rss = 0
+        self._cpu0 = self._cpu()
+        self._t0 = time.monotonic()
+
+    def _cpu(self) -> float:
+        fields = Path(f"/proc/{self.pid}/stat").read_text().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def sample(self) -> None:
+        for line in Path(f"/proc/{self.pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                self.peak_rss = max(self.peak_rss, int(line.split()[1]) * 1024)
+
+    def result(self) -> dict:
+        wall = time.monotonic() - self._t0
+        cpu = self._cpu() - self._cpu0
+        return {"cpu_seconds": cpu, "cpu_utilization": cpu / wall if wall else 0.0, "peak_rss_bytes": self.peak_rss}
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    s = sorted(values)
+    pick = lambda p: s[min(len(s) - 1, int(len(s) * p))] * 1000
+    return {"p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99), "max_ms": s[-1] * 1000, "n": len(s)}
+
+
+def process_tree(pid: int) -> list[int]:
+    """The bridge process plus any worker children (multi-worker mode)."""
+    pids = [pid]
+    for child in Path("/proc").glob("[0-9]*"):
+        try:
+            if int(child.joinpath("stat").read_text().rsplit(")", 1)[1].split()[1]) == pid:
+                pids.append(int(child.name))
+        except (OSError, ValueError, IndexError):
+            continue
+    return pids
+
+
+async def client(port: int, deadline: float, args, samples: dict) -> None:
+    rng = random.Random()
+    call_id = f"lt-{rng.getrandbits(32):x}"
+    while time.monotonic() < deadline:
+        r = rng.random()
+        try:
+            if r < args.book_ratio:
+                endpoint = "/book-meeting"
+                # Random slots, so some bookings collide like simultaneous calls would
+                res = await http_post(port, endpoint, tool_payload("book_meeting", {
+                    "date": str(bench_day(rng.randint(2, 5)) + datetime.timedelta(days=rng.randint(0, 3))),
+                    "time": f"{rng.randint(9, 16)}:{rng.choice(('00', '30'))}",
+                    "email": "lead@example.com", "name": "Load Test"}, call_id))
+            elif r < args.book_ratio + args.availability_ratio:
+                endpoint = "/check-availability"
+                res = await http_post(port, endpoint, tool_payload("check_availability", {"date": str(bench_day())}, call_id))
+            else:
+                endpoint = "/to-speech"
+                text = rng.choice(TEXTS) if rng.random() < args.repeat_ratio else f"{rng.choice(TEXTS)} {rng.randint(0, 10**6)}"
+                res = await http_post(port, endpoint, {"message": {"type": "voice-request", "text": text}})
+        except (OSError, asyncio.IncompleteReadError, IndexError, ValueError) as e:
+            samples.setdefault("errors", []).append(str(e))
+            continue
+        samples.setdefault(endpoint, []).append(res)
+        if args.think:
+            await asyncio.sleep(args.think)
+
+
+def wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on port {port}")
+
+
+def start_processes(args) -> tuple[subprocess.Popen, subprocess.Popen, int]:
+    mock_port, bridge_port = free_port(), free_port()
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_deepdub", "--port", str(mock_port),
+         "--first-chunk-delay", str(args.first_chunk_delay), "--chunk-interval", str(args.chunk_interval),
+         "--handshake-delay", str(args.handshake_delay),
+         "--slow-ratio", str(getattr(args, "slow_ratio", 0.0)), "--slow-delay", str(getattr(args, "slow_delay", 1.0))],
+        cwd=ROOT, stdout=subprocess.PIPE, text=True,
+    )
+    # The mock prints one line once it listens; probing a WebSocket port with a bare connect makes it log noise
+    mock.stdout.readline()
+    env = {
+        **os.environ,
+        "PORT": str(bridge_port),
+        "DEEPDUB_WS_URL": f"ws://127.0.0.1:{mock_port}",
+        "DEEPDUB_API_KEY": "loadtest",
+        "TTS_CACHE_DIR": "",
+        "OUTBOX_DB": ":memory:",
+        "LOG_LEVEL": "WARNING",
+        "STUB_BOOKING_LATENCY": str(args.booking_latency),
+        "WEB_CONCURRENCY": str(getattr(args, "workers", 1)),
+    }
+    bridge = subprocess.Popen([sys.executable, "-m", "benchmarks.serve_stub"], cwd=ROOT, env=env)
+    wait_for_port(bridge_port)
+    return mock, bridge, bridge_port
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args) -> dict:
+    mock, bridge, port = start_processes(args)
+    try:
+        # Warm-up request so process start-up isn't counted
+        await http_post(port, "/to-speech", {"message": {"text": TEXTS[0]}})
+        samplers = [ProcSampler(pid) for pid in process_tree(bridge.pid)]
+        # The stand-ins and this client share the box; if they saturate, the bridge numbers say nothing
+        mock_sampler = ProcSampler(mock.pid)
+        client_cpu0 = sum(os.times()[:2])
+        samples: dict = {}
+        t_start = time.monotonic()
+        deadline = t_start + args.duration
+        clients = [asyncio.create_task(client(port, deadline, args, samples)) for _ in range(args.clients)]
+        while time.monotonic() < deadline:
+            for s in samplers:
+                s.sample()
+            await asyncio.sleep(0.5)
+        await asyncio.gather(*clients)
+        wall = time.monotonic() - t_start
+        procs = [s.result() for s in samplers]
+        mock_cpu = mock_sampler.result()["cpu_utilization"]
+        client_cpu = (sum(os.times()[:2]) - client_cpu0) / wall
+    finally:
+        bridge.terminate()
+        mock.terminate()
+        bridge.wait()
+        mock.wait()
+
+    endpoints = {}
+    for endpoint, results in samples.items():
+        if endpoint == "errors":
+            continue
+        ok = [r for r in results if r["status"] == 200]
+        endpoints[endpoint] = {
+            "requests": len(results),
+            "non_200": len(results) - len(ok),
+            "throughput_rps": len(results) / wall,
+            "ttfb": percentiles([r["ttfb"] for r in ok]),
+            "total": percentiles([r["total"] for r in ok]),
+            "bytes": sum(r["bytes"] for r in ok),
+        }
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "wall_seconds": wall,
+        "errors": len(samples.get("errors", [])),
+        "endpoints": endpoints,
+        "bridge": {
+            "cpu_seconds": sum(p["cpu_seconds"] for p in procs),
+            "cpu_utilization": sum(p["cpu_utilization"] for p in procs),
+            "peak_rss_bytes": sum(p["peak_rss_bytes"] for p in procs),
+        },
+        "harness": {"cpu_count": os.cpu_count(), "mock_deepdub_cpu_utilization": mock_cpu, "client_cpu_utilization": client_cpu},
+    }
+
+
+def print_report(result: dict) -> None:
+    print(f"commit={result['commit']} wall={result['wall_seconds']:.1f}s errors={result['errors']}")
+    for endpoint, r in result["endpoints"].items():
+        ttfb, total = r["ttfb"], r["total"]
+        print(
+            f"{endpoint:<20} n={r['requests']:<6} rps={r['throughput_rps']:7.1f} non200={r['non_200']:<4} "
+            f"ttfb p50/p99={ttfb.get('p50_ms', 0):7.1f}/{ttfb.get('p99_ms', 0):7.1f}ms "
+            f"total p50/p99={total.get('p50_ms', 0):7.1f}/{total.get('p99_ms', 0):7.1f}ms"
+        )
+    b = result["bridge"]
+    h = result["harness"]
+    print(f"bridge cpu={b['cpu_utilization'] * 100:.0f}% rss_peak={b['peak_rss_bytes'] / 2**20:.0f}MiB | "
+          f"mock cpu={h['mock_deepdub_cpu_utilization'] * 100:.0f}% client cpu={h['client_cpu_utilization'] * 100:.0f}% "
+          f"cores={h['cpu_count']}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=20)
+    ap.add_argument("--duration", type=float, default=20)
+    ap.add_argument("--think", type=float, default=0.0, help="pause between a client's requests (s)")
+    ap.add_argument("--availability-ratio", type=float, default=0.05)
+    ap.add_argument("--book-ratio", type=float, default=0.02)
+    ap.add_argument("--repeat-ratio", type=float, default=0.3, help="share of /to-speech texts that repeat exactly")
+    ap.add_argument("--booking-latency", type=float, default=0.3, help="stubbed calendar insert time (s)")
+    ap.add_argument("--first-chunk-delay", type=float, default=0.15)
+    ap.add_argument("--chunk-interval", type=float, default=0.0)
+    ap.add_argument("--handshake-delay", type=float, default=0.05)
+    ap.add_argument("--slow-ratio", type=float, default=0.0, help="share of mock generations that start late")
+    ap.add_argument("--slow-delay", type=float, default=1.0)
+    ap.add_argument("--workers", default="1", help="bridge worker processes; a comma list runs a sweep, e.g. 1,2,4")
+    ap.add_argument("--out", help="write the JSON result here")
+    return ap
+
+
+def print_scaling(results: list[dict]) -> None:
+    base = results[0]["endpoints"].get("/to-speech", {}).get("throughput_rps") or 0
+    print("\nworkers  /to-speech rps  speedup  ttfb p99   bridge cpu")
+    for r in results:
+        tts = r["endpoints"].get("/to-speech", {})
+        rps = tts.get("throughput_rps", 0)
+        print(
+            f"{r['config']['workers']:>7}  {rps:>14.1f}  {rps / base if base else 0:>6.2f}x  "
+            f"{tts.get('ttfb', {}).get('p99_ms', 0):>6.0f}ms  {r['bridge']['cpu_utilization'] * 100:>9.0f}%"
+        )
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    sweep = [int(w) for w in str(args.workers).split(",")]
+    results = []
+    for workers in sweep:
+        run_args = argparse.Namespace(**{**vars(args), "workers": workers})
+        results.append(asyncio.run(run(run_args)))
+        print(f"--- workers={workers}")
+        print_report(results[-1])
+    if len(results) > 1:
+        print_scaling(results)
+        if os.cpu_count() and os.cpu_count() < max(sweep) + 2:
+            print(f"note: only {os.cpu_count()} cores; the mock server and client compete with the workers")
+    result = results[0] if len(results) == 1 else {"commit": results[0]["commit"], "sweep": results}
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2))
+        print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
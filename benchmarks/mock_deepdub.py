@@ -0,0 +1,155 @@
+"""
+Local stand-in for the Deepdub streaming WebSocket API.
+
+Speaks the same protocol as wss://wsapi.deepdub.ai/open: the client sends a
+`text-to-speech` JSON request and receives base64 WAV chunks (at the request's
+`sampleRate`, else --rate) followed by a message with `isFinished: true`.
+Several requests may be sent sequentially on one connection, as the bridge's
+connection pool does.
+
+    python -m benchmarks.mock_deepdub --port 8765 --handshake-delay 0.08
+    DEEPDUB_WS_URL=ws://127.0.0.1:8765 python server.py
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import logging
+import random
+import uuid
+import wave
+from dataclasses import dataclass
+
+import numpy as np
+import websockets
+
+
+@dataclass
+class MockConfig:
+    rate: int = 24000
+    chunk_ms: int = 100
+    # Audio produced per input character (Hebrew speech is roughly 12-15 chars/sec)
+    audio_ms_per_char: float = 70.0
+    first_chunk_delay: float = 0.15
+    # Extra time before the first chunk per input character (longer texts take longer to start)
+    synth_ms_per_char: float = 0.0
+    # Gap between chunks; 0 sends as fast as possible, chunk_ms / 1000 emulates realTime
+    chunk_interval: float = 0.0
+    # Extra latency added to every WebSocket upgrade, standing in for TCP + TLS + upgrade RTTs
+    handshake_delay: float = 0.0
+    # Share of generations that start `slow_delay` seconds late (the occasional slow generation)
+    slow_ratio: float = 0.0
+    slow_delay: float = 1.0
+
+
+def wav_chunk(rate: int, frames: int, phase: int = 0) -> bytes:
+    t = (np.arange(frames) + phase) / rate
+    tone = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(tone.tobytes())
+    return buf.getvalue()
+
+
+class MockDeepdub:
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.connections = 0
+        self.requests = 0
+
+    async def _process_request(self, connection, request):
+        if self.config.handshake_delay:
+            await asyncio.sleep(self.config.handshake_delay)
+        return None
+
+    async def _synthesize(self, ws, req: dict) -> None:
+        cfg = self.config
+        text = req.get("targetText") or ""
+        gid = str(uuid.uuid4())
+        # Like Deepdub, render at the requested native rate
+        rate = int(req.get("sampleRate") or cfg.rate)
+        total_frames = int(rate * len(text) * cfg.audio_ms_per_char / 1000)
+        per_chunk = rate * cfg.chunk_ms // 1000
+
+        slow = cfg.slow_delay if cfg.slow_ratio and random.random() < cfg.slow_ratio else 0.0
+        await asyncio.sleep(cfg.first_chunk_delay + len(text) * cfg.synth_ms_per_char / 1000 + slow)
+        idx = 0
+        for start in range(0, total_frames, per_chunk):
+            frames = min(per_chunk, total_frames - start)
+            data = base64.b64encode(wav_chunk(rate, frames, start)).decode()
+            await ws.send(json.dumps({"generationId": gid, "index": idx, "isFinished": False, "data": data}))
+            idx += 1
+            if cfg.chunk_interval:
+                await asyncio.sleep(cfg.chunk_interval)
+        await ws.send(json.dumps({"generationId": gid, "index": idx, "isFinished": True}))
+
+    async def handler(self, ws) -> None:
+        self.connections += 1
+        try:
+            async for raw in ws:
+                req = json.loads(raw)
+                if req.get("action") != "text-to-speech":
+                    await ws.send(json.dumps({"error": f"unknown action {req.get('action')!r}"}))
+                    continue
+                self.requests += 1
+                await self._synthesize(ws, req)
+        except websockets.ConnectionClosed:
+            # The client hung up mid-generation (barge-in, or a losing hedged request)
+            pass
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0):
+        """Starts serving and returns the websockets server; `port=0` picks a free port."""
+        # Clients that give up mid-handshake (cancelled hedges, shutdowns) are routine here, not errors
+        logging.getLogger("websockets.server").setLevel(logging.CRITICAL)
+        return await websockets.serve(self.handler, host, port, process_request=self._process_request, max_size=None)
+
+
+def server_url(server) -> str:
+    host, port = list(server.sockets)[0].getsockname()[:2]
+    return f"ws://{host}:{port}"
+
+
+def add_config_args(ap: argparse.ArgumentParser) -> None:
+    defaults = MockConfig()
+    ap.add_argument("--rate", type=int, default=defaults.rate)
+    ap.add_argument("--chunk-ms", type=int, default=defaults.chunk_ms)
+    ap.add_argument("--audio-ms-per-char", type=float, default=defaults.audio_ms_per_char)
+    ap.add_argument("--first-chunk-delay", type=float, default=defaults.first_chunk_delay)
+    ap.add_argument("--synth-ms-per-char", type=float, default=defaults.synth_ms_per_char)
+    ap.add_argument("--chunk-interval", type=float, default=defaults.chunk_interval)
+    ap.add_argument("--handshake-delay", type=float, default=defaults.handshake_delay)
+    ap.add_argument("--slow-ratio", type=float, default=defaults.slow_ratio)
+    ap.add_argument("--slow-delay", type=float, default=defaults.slow_delay)
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(
+        rate=args.rate,
+        chunk_ms=args.chunk_ms,
+        audio_ms_per_char=args.audio_ms_per_char,
+        first_chunk_delay=args.first_chunk_delay,
+        synth_ms_per_char=args.synth_ms_per_char,
+        chunk_interval=args.chunk_interval,
+        handshake_delay=args.handshake_delay,
+        slow_ratio=args.slow_ratio,
+        slow_delay=args.slow_delay,
+    )
+
+
+async def _main(args) -> None:
+    mock = MockDeepdub(config_from_args(args))
+    server = await mock.serve(args.host, args.port)
+    print(f"🎭 mock Deepdub listening on {server_url(server)}", flush=True)
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    add_config_args(ap)
+    asyncio.run(_main(ap.parse_args()))
@@ -0,0 +1,90 @@
+"""
+Local debugging SMTP server: accepts every message and counts it.
+
+Speaks enough SMTP (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) for
+smtplib. `--connect-delay` is charged before the greeting, standing in for
+the TCP + STARTTLS + AUTH round-trips of a real provider.
+
+    python -m benchmarks.mock_smtp --port 8025 --connect-delay 0.3
+    SMTP_HOST=127.0.0.1 SMTP_PORT=8025 SMTP_STARTTLS=0 python server.py
+"""
+import argparse
+import asyncio
+
+
+class MockSmtp:
+    def __init__(self, connect_delay: float = 0.0, print_messages: bool = False):
+        self.connect_delay = connect_delay
+        self.print_messages = print_messages
+        self.connections = 0
+        self.messages = 0
+
+    async def handler(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        if self.connect_delay:
+            await asyncio.sleep(self.connect_delay)
+
+        def reply(line: str) -> None:
+            writer.write(line.encode() + b"\r\n")
+
+        reply("220 mock-smtp ready")
+        rcpts: list[str] = []
+        try:
+            while True:
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    break
+                cmd = line.decode(errors="replace").strip()
+                verb = cmd.split(" ", 1)[0].upper()
+                if verb == "EHLO":
+                    reply("250-mock-smtp")
+                    reply("250 8BITMIME")
+                elif verb in ("HELO", "NOOP", "RSET"):
+                    rcpts = [] if verb == "RSET" else rcpts
+                    reply("250 OK")
+                elif verb == "MAIL":
+                    rcpts = []
+                    reply("250 OK")
+                elif verb == "RCPT":
+                    rcpts.append(cmd.split(":", 1)[-1].strip())
+                    reply("250 OK")
+                elif verb == "DATA":
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    await writer.drain()
+                    size = 0
+                    while (data := await reader.readline()) not in (b".\r\n", b""):
+                        size += len(data)
+                    self.messages += 1
+                    if self.print_messages:
+                        print(f"📧 message {self.messages} to {', '.join(rcpts)} ({size} bytes)", flush=True)
+                    reply("250 OK queued")
+                elif verb == "QUIT":
+                    reply("221 Bye")
+                    await writer.drain()
+                    break
+                else:
+                    reply("502 Command not implemented")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handler, host, port)
+
+
+async def _main(args) -> None:
+    mock = MockSmtp(args.connect_delay, print_messages=True)
+    server = await mock.serve(args.host, args.port)
+    host, port = server.sockets[0].getsockname()[:2]
+    print(f"🎭 mock SMTP listening on {host}:{port}", flush=True)
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8025)
+    ap.add_argument("--connect-delay", type=float, default=0.0)
+    asyncio.run(_main(ap.parse_args()))
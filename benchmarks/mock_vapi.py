@@ -0,0 +1,158 @@
+"""
+Local stand-in for the parts of the Vapi REST API the dashboard uses.
+
+  POST  /call/phone        -> 201 {"id": ...}; 429 with Retry-After above --max-calls-per-second
+  GET   /assistant/{id}    -> the stored assistant, with an ETag (304 on If-None-Match)
+  PATCH /assistant/{id}    -> merges the body into the stored assistant
+
+    python -m benchmarks.mock_vapi --port 8790 --latency 0.2
+    VAPI_BASE_URL=http://127.0.0.1:8790 streamlit run app.py
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockVapiState:
+    def __init__(self, latency: float = 0.0, max_calls_per_second: float = 0.0):
+        self.latency = latency
+        self.max_calls_per_second = max_calls_per_second
+        self.lock = threading.Lock()
+        self.calls: list[dict] = []
+        self.rejected = 0
+        self.connections = 0
+        self.requests = {"GET": 0, "PATCH": 0, "POST": 0, "not_modified": 0}
+        self._window: list[float] = []
+        self.assistants: dict[str, dict] = {}
+
+    def assistant(self, assistant_id: str) -> dict:
+        return self.assistants.setdefault(assistant_id, {
+            "id": assistant_id,
+            "firstMessage": "היי {customer_name}, כאן קטי מחברת אלטא. יש לך דקה?",
+            "model": {"model": "gpt-4o", "messages": [{"role": "system", "content": "{gender_instruction}"}]},
+        })
+
+    def admit_call(self) -> bool:
+        if not self.max_calls_per_second:
+            return True
+        now = time.monotonic()
+        self._window = [t for t in self._window if now - t < 1.0]
+        if len(self._window) >= self.max_calls_per_second:
+            self.rejected += 1
+            return False
+        self._window.append(now)
+        return True
+
+
+def _merge(base: dict, patch: dict) -> dict:
+    for k, v in patch.items():
+        base[k] = _merge(base.get(k, {}), v) if isinstance(v, dict) and isinstance(base.get(k), dict) else v
+    return base
+
+
+def make_handler(state: MockVapiState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: dict = None, headers: dict = None):
+            data = json.dumps(body).encode() if body is not None else b""
+            self.send_response(status)
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> dict:
+            n = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(n) or b"{}")
+
+        def do_POST(self):
+            body = self._body()
+            if state.latency:
+                time.sleep(state.latency)
+            if self.path != "/call/phone":
+                return self._send(404, {"error": "not found"})
+            with state.lock:
+                state.requests["POST"] += 1
+                if not state.admit_call():
+                    return self._send(429, {"error": "rate limited"}, {"Retry-After": "1"})
+                call = {"id": str(uuid.uuid4()), "customer": body.get("customer"), "firstMessage":
+                        (body.get("assistantOverrides") or {}).get("firstMessage")}
+                state.calls.append(call)
+            self._send(201, {"id": call["id"], "status": "queued"})
+
+        def _assistant_response(self, assistant: dict):
+            etag = '"' + hashlib.sha1(json.dumps(assistant, sort_keys=True).encode()).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                with state.lock:
+                    state.requests["not_modified"] += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._send(200, assistant, {"ETag": etag})
+
+        def do_GET(self):
+            if state.latency:
+                time.sleep(state.latency)
+            if not self.path.startswith("/assistant/"):
+                return self._send(404, {"error": "not found"})
+            with state.lock:
+                state.requests["GET"] += 1
+                assistant = json.loads(json.dumps(state.assistant(self.path.rsplit("/", 1)[1])))
+            self._assistant_response(assistant)
+
+        def do_PATCH(self):
+            body = self._body()
+            if state.latency:
+                time.sleep(state.latency)
+            if not self.path.startswith("/assistant/"):
+                return self._send(404, {"error": "not found"})
+            with state.lock:
+                state.requests["PATCH"] += 1
+                assistant = _merge(state.assistant(self.path.rsplit("/", 1)[1]), body)
+                assistant = json.loads(json.dumps(assistant))
+            self._assistant_response(assistant)
+
+    return Handler
+
+
+def serve(state: MockVapiState, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Starts the mock on a background thread; `port=0` picks a free port (see server.server_address)."""
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8790)
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--max-calls-per-second", type=float, default=0.0)
+    args = ap.parse_args()
+    state = MockVapiState(args.latency, args.max_calls_per_second)
+    server = serve(state, args.host, args.port)
+    print(f"🎭 mock Vapi listening on http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        while True:
+            time.sleep(5)
+            print(f"calls={len(state.calls)} rejected={state.rejected} connections={state.connections} requests={state.requests}", flush=True)
+    except KeyboardInterrupt:
+        server.shutdown()
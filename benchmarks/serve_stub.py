@@ -0,0 +1,46 @@
+"""
+Runs server.py with the Google Calendar / Gmail integrations replaced by local stand-ins,
+so the load harness can drive the tool endpoints offline.
+
+    STUB_BOOKING_LATENCY=0.4 DEEPDUB_WS_URL=ws://127.0.0.1:8765 python -m benchmarks.serve_stub
+
+WEB_CONCURRENCY runs several workers, as serve.py does; each imports this module and applies the stubs.
+"""
+import os
+import time
+
+import uvicorn
+
+import server
+import tools
+from availability import AvailabilityEngine, FakeCalendarBackend
+
+STUB_BOOKING_LATENCY = float(os.getenv("STUB_BOOKING_LATENCY", "0.3"))
+STUB_CALENDAR_LATENCY = float(os.getenv("STUB_CALENDAR_LATENCY", "0.15"))
+
+
+def fake_create_event(date_str, time_str, customer_email, customer_name="Customer", event_id=None):
+    # Same blocking shape as the real events().insert round-trip
+    time.sleep(STUB_BOOKING_LATENCY)
+    return "https://calendar.example/event"
+
+
+def fake_queue_email(to_email, name, slot, calendar_link):
+    # Queueing is a local SQLite insert; SMTP delivery happens in the outbox
+    return None
+
+
+tools._engine = AvailabilityEngine(FakeCalendarBackend(latency=STUB_CALENDAR_LATENCY))
+server.booking_service.create_event = fake_create_event
+server.booking_service.queue_email = fake_queue_email
+app = server.app
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "benchmarks.serve_stub:app",
+        host="127.0.0.1",
+        port=server.PORT,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        timeout_graceful_shutdown=30,
+        log_level="warning",
+    )
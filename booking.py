@@ -0,0 +1,209 @@
+"""
+Booking jobs: calendar insert off the event loop, confirmation handed to the outbox.
+
+A /book-meeting call becomes a BookingJob. The calendar insert runs on a
+bounded thread pool, retrying transient failures with backoff. Once the event
+exists the confirmation is queued in the email outbox (one SQLite insert) and
+the response goes back to Vapi; the outbox owns delivery and its retries. Each
+job keeps its outbox message id, so the admin endpoints report the email's
+actual delivery status next to the job's own.
+
+Job states:
+
+  queued -> booking -> booked
+                    \\-> failed
+                    \\-> email_failed   (event created, confirmation couldn't be queued)
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+log = logging.getLogger("bridge")
+
+RETRYABLE_HTTP_STATUS = {429, 500, 502, 503, 504}
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Network errors and Google 429/5xx are worth retrying; bad input isn't."""
+    status = getattr(getattr(exc, "resp", None), "status", None)
+    if status is not None:
+        return int(status) in RETRYABLE_HTTP_STATUS
+    return isinstance(exc, (OSError, TimeoutError))
+
+
+class BookingJob:
+    def __init__(self, job_id: str, date_str: str, time_str: str, email: str, name: str, owner: str = ""):
+        self.id = job_id
+        self.date_str, self.time_str, self.email, self.name = date_str, time_str, email, name
+        # The call that booked it, so a retry can re-reserve the slot on its behalf
+        self.owner = owner
+        self.status = "queued"
+        # Sent as the calendar event id, so retrying an insert that actually succeeded can't duplicate it
+        self.event_id = uuid.uuid4().hex
+        self.calendar_attempts = 0
+        self.calendar_link: Optional[str] = None
+        # The confirmation's outbox message id, once queued
+        self.email_id: Optional[int] = None
+        self.error: Optional[str] = None
+        # The exception that failed the calendar stage, for callers that tell failures apart
+        self.failure: Optional[Exception] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    def _set(self, status: str, error: Optional[str] = None) -> None:
+        self.status = status
+        self.error = error
+        self.updated_at = time.time()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("booked", "failed", "email_failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "date": self.date_str,
+            "time": self.time_str,
+            "email": self.email,
+            "owner": self.owner,
+            "calendar_attempts": self.calendar_attempts,
+            "calendar_link": self.calendar_link,
+            "email_id": self.email_id,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class BookingService:
+    def __init__(
+        self,
+        create_event: Callable[[str, str, str, str, str], Optional[str]],
+        queue_email: Callable[[str, str, str, Optional[str]], Optional[int]],
+        email_status: Optional[Callable[[int], Optional[dict]]] = None,
+        calendar_workers: int = 4,
+        max_attempts: int = 3,
+        retry_backoff: float = 1.0,
+        max_jobs: int = 1000,
+    ):
+        """
+        `create_event(date, time, email, name, event_id)` inserts the calendar event with that id and
+        returns its link (retries reuse the id, so it must treat an existing event as success);
+        `queue_email(to, name, slot, link)` queues the confirmation and returns its outbox id;
+        `email_status(id)` reports that message's delivery. All are blocking; the first two raise on failure.
+        """
+        self.create_event = create_event
+        self.queue_email = queue_email
+        self.email_status = email_status
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_jobs = max_jobs
+
+        self._calendar_pool = ThreadPoolExecutor(calendar_workers, thread_name_prefix="booking-calendar")
+        self._jobs: OrderedDict[str, BookingJob] = OrderedDict()
+
+        self.stats = {"submitted": 0, "booked": 0, "failed": 0, "email_queued": 0, "email_failed": 0, "retries": 0}
+
+    async def close(self) -> None:
+        # Queued confirmations live in the outbox, which sends them on the next start if need be
+        self._calendar_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _attempt(self, pool: ThreadPoolExecutor, fn: Callable, args: tuple, stage: str, job: BookingJob):
+        """Runs `fn(*args)` on `pool`, retrying transient errors with exponential backoff."""
+        loop = asyncio.get_running_loop()
+        counter = f"{stage}_attempts"
+        while True:
+            setattr(job, counter, getattr(job, counter) + 1)
+            try:
+                return await loop.run_in_executor(pool, fn, *args)
+            except Exception as e:
+                if getattr(job, counter) >= self.max_attempts or not is_retryable(e):
+                    raise
+                self.stats["retries"] += 1
+                delay = self.retry_backoff * 2 ** (getattr(job, counter) - 1)
+                log.warning("🔁 booking %s: %s failed (%s); retrying in %.1fs", job.id, stage, e, delay)
+                await asyncio.sleep(delay)
+
+    async def _run_calendar(self, job: BookingJob) -> None:
+        job._set("booking")
+        try:
+            job.calendar_link = await self._attempt(
+                self._calendar_pool, self.create_event,
+                (job.date_str, job.time_str, job.email, job.name, job.event_id), "calendar", job,
+            )
+        except Exception as e:
+            self.stats["failed"] += 1
+            job.failure = e
+            job._set("failed", str(e))
+            log.error("❌ booking %s failed after %d attempts: %s", job.id, job.calendar_attempts, e)
+            return
+        self.stats["booked"] += 1
+        job.failure = None
+        await self._queue_confirmation(job)
+
+    async def _queue_confirmation(self, job: BookingJob) -> None:
+        try:
+            job.email_id = await asyncio.to_thread(
+                self.queue_email, job.email, job.name, f"{job.date_str} at {job.time_str}", job.calendar_link,
+            )
+        except Exception as e:
+            self.stats["email_failed"] += 1
+            job._set("email_failed", str(e))
+            log.error("❌ booking %s: confirmation email couldn't be queued: %s", job.id, e)
+            return
+        self.stats["email_queued"] += 1
+        job._set("booked")
+
+    def _remember(self, job: BookingJob) -> None:
+        self._jobs[job.id] = job
+        # Forget the oldest finished jobs beyond the cap
+        for old_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[old_id].finished:
+                del self._jobs[old_id]
+
+    async def book(self, date_str: str, time_str: str, email: str, name: str, owner: str = "") -> BookingJob:
+        """Returns once the calendar event exists (or definitely failed) and its confirmation is queued."""
+        # Random, so ids can't be enumerated to read other leads' bookings
+        job = BookingJob(f"bk{uuid.uuid4().hex}", date_str, time_str, email, name, owner)
+        self._remember(job)
+        self.stats["submitted"] += 1
+        await self._run_calendar(job)
+        return job
+
+    async def retry(self, job_id: str) -> Optional[BookingJob]:
+        """Re-runs whichever stage failed. Returns None for unknown ids."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job.status == "failed":
+            job.calendar_attempts = 0
+            await self._run_calendar(job)
+        elif job.status == "email_failed":
+            await self._queue_confirmation(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[BookingJob]:
+        return self._jobs.get(job_id)
+
+    def describe(self, job: BookingJob) -> dict:
+        """The job plus its confirmation's delivery status from the outbox. Blocking (a SQLite read)."""
+        email = None
+        if job.email_id is not None and self.email_status is not None:
+            try:
+                email = self.email_status(job.email_id)
+            except Exception as e:
+                email = {"error": f"status unavailable: {e}"}
+        return {**job.to_dict(), "confirmation": email}
+
+    def snapshot(self) -> dict:
+        by_status: dict[str, int] = {}
+        for job in self._jobs.values():
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {**self.stats, "jobs": by_status}
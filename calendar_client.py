@@ -0,0 +1,108 @@
+"""
+Process-wide Google Calendar client.
+
+The Calendar service is built once (the discovery document is parsed once)
+and shared by every worker thread. httplib2 connections are not thread-safe,
+so each thread gets its own AuthorizedHttp through the service's
+requestBuilder and keeps reusing it. A background thread refreshes the OAuth
+token a few minutes before it expires, so requests never block on a refresh
+round-trip.
+"""
+import datetime
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
+
+log = logging.getLogger("bridge")
+
+# Socket timeout for Calendar API requests; httplib2's default is to wait forever
+HTTP_TIMEOUT = float(os.getenv("CALENDAR_HTTP_TIMEOUT", "30"))
+
+
+def timed_http() -> httplib2.Http:
+    return httplib2.Http(timeout=HTTP_TIMEOUT)
+
+
+class CalendarClient:
+    def __init__(
+        self,
+        creds: Credentials,
+        on_refresh: Optional[Callable[[Credentials], None]] = None,
+        http_factory: Callable[[], object] = timed_http,
+        refresh_margin: float = 300.0,
+    ):
+        """
+        `on_refresh(creds)` is called after every background refresh, e.g. to
+        persist token.json. `http_factory` builds the per-thread transport.
+        """
+        self.creds = creds
+        self.on_refresh = on_refresh
+        self.http_factory = http_factory
+        self.refresh_margin = refresh_margin
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self.stats = {"transports": 0, "refreshes": 0, "refresh_failures": 0}
+
+        self.service = build(
+            "calendar", "v3",
+            http=self._thread_http(),
+            requestBuilder=self._build_request,
+            cache_discovery=False,
+        )
+
+    def _thread_http(self) -> AuthorizedHttp:
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = AuthorizedHttp(self.creds, http=self.http_factory())
+            self.stats["transports"] += 1
+        return http
+
+    def _build_request(self, _http, *args, **kwargs) -> HttpRequest:
+        # Ignore the shared transport the service was built with; use this thread's own
+        return HttpRequest(self._thread_http(), *args, **kwargs)
+
+    # --- Credential refresh ---
+
+    def _seconds_until_refresh(self) -> float:
+        if self.creds.expiry is None:
+            return self.refresh_margin
+        # google-auth keeps expiry as naive UTC
+        remaining = (self.creds.expiry - datetime.datetime.utcnow()).total_seconds()
+        return max(0.0, remaining - self.refresh_margin)
+
+    def refresh(self) -> None:
+        with self._refresh_lock:
+            self.creds.refresh(Request())
+            self.stats["refreshes"] += 1
+        if self.on_refresh:
+            self.on_refresh(self.creds)
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self._seconds_until_refresh()):
+            try:
+                self.refresh()
+                log.info("🔑 calendar token refreshed | expires=%s", self.creds.expiry)
+            except Exception as e:
+                self.stats["refresh_failures"] += 1
+                log.error("❌ calendar token refresh failed: %s", e)
+                # Retry after a short pause rather than spinning on an already-expired token
+                if self._stop.wait(30):
+                    return
+
+    def start(self) -> None:
+        if self.creds.refresh_token and self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="calendar-token-refresh", daemon=True)
+            self._refresher.start()
+
+    def close(self) -> None:
+        self._stop.set()
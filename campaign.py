@@ -0,0 +1,278 @@
+"""
+Bulk campaign dialer.
+
+Reads leads from a CSV, renders each lead's prompt and first message with the
+same substitutions as the Test Lab, and places the calls through one pooled
+HTTP session, with a cap on calls in flight and a calls-per-minute rate limit.
+Results are yielded as each call is placed, so the dashboard can show progress
+live.
+
+CSV columns (header row required, case-insensitive): name, phone, email, gender.
+Gender is "Male"/"Female" (or "M"/"F"/"זכר"/"נקבה"); anything else means Male.
+"""
+import csv
+import io
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from vapi_client import VAPI_BASE_URL, pooled_session
+
+FEMALE_VALUES = {"female", "f", "נקבה", "אישה"}
+CSV_ENCODINGS = ("utf-8-sig", "cp1255")
+EXTRA_FIELDS = "_extra"
+
+
+@dataclass
+class Lead:
+    name: str
+    phone: str
+    email: str = ""
+    gender: str = "Male"
+    row: int = 0
+
+
+@dataclass
+class LeadResult:
+    lead: Lead
+    status: str  # "called", "failed" or "invalid"
+    detail: str = ""
+    call_id: Optional[str] = None
+    seconds: float = 0.0
+
+
+class LeadsFileError(ValueError):
+    """The leads file can't be read at all (encoding or CSV structure)."""
+
+
+def _decode(data: bytes) -> str:
+    # Excel saves Hebrew CSVs as UTF-8 (with BOM) or as Windows-1255
+    for encoding in CSV_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise LeadsFileError(f"can't decode the file as {' or '.join(CSV_ENCODINGS)}; save it as CSV UTF-8")
+
+
+def load_leads_csv(data) -> tuple[list[Lead], list[LeadResult]]:
+    """
+    Parses CSV text/bytes/file into leads, plus an "invalid" result for every unusable row.
+    Raises LeadsFileError if the file as a whole can't be read.
+    """
+    if hasattr(data, "read"):
+        data = data.read()
+    if isinstance(data, bytes):
+        data = _decode(data)
+    leads, invalid = [], []
+    # Fields beyond the header (e.g. a trailing comma) land under restkey and are dropped
+    reader = csv.DictReader(io.StringIO(data), restkey=EXTRA_FIELDS)
+    try:
+        for i, raw in enumerate(reader, start=2):
+            row = {
+                (k or "").strip().lower(): (v or "").strip()
+                for k, v in raw.items() if k != EXTRA_FIELDS
+            }
+            gender = "Female" if row.get("gender", "").lower() in FEMALE_VALUES else "Male"
+            lead = Lead(row.get("name", ""), row.get("phone", ""), row.get("email", ""), gender, i)
+            if len(lead.phone) < 10:
+                invalid.append(LeadResult(lead, "invalid", "missing or invalid phone number"))
+            else:
+                leads.append(lead)
+    except csv.Error as e:
+        raise LeadsFileError(f"line {reader.line_num}: {e}") from None
+    return leads, invalid
+
+
+def render_call_payload(
+    lead: Lead,
+    prompt: str,
+    first_message: str,
+    model: str,
+    assistant_id: str,
+    phone_number_id: str,
+    voice_url: str,
+) -> tuple[dict, str]:
+    """The /call/phone body for one lead, and its rendered first message."""
+    prompt_for_call = prompt or ""
+
+    # Inject Email
+    if lead.email:
+        prompt_for_call = prompt_for_call.replace("{lead_email}", lead.email)
+    else:
+        prompt_for_call = prompt_for_call.replace("{lead_email}", "המייל שלך")
+
+    # Inject Gender Instruction
+    if lead.gender == "Male":
+        gender_instruction = "אתה מדבר עם גבר. פנה אליו בלשון זכר."
+    else:
+        gender_instruction = "אתה מדבר עם אישה. פנה אליה בלשון נקבה."
+    prompt_for_call = prompt_for_call.replace("{gender_instruction}", gender_instruction)
+
+    # Inject Name
+    first_msg_for_call = first_message or ""
+    if lead.name:
+        prompt_for_call = prompt_for_call.replace("{customer_name}", lead.name)
+        first_msg_for_call = first_msg_for_call.replace("{customer_name}", lead.name)
+    else:
+        prompt_for_call = prompt_for_call.replace("{customer_name}", "לקוח יקר")
+        first_msg_for_call = first_msg_for_call.replace("{customer_name}", "")
+
+    call_payload = {
+        "assistantId": assistant_id,
+        "phoneNumberId": phone_number_id,
+        "customer": {
+            "number": lead.phone,
+            "name": lead.name,
+            "email": lead.email
+        },
+        "assistantOverrides": {
+            "firstMessage": first_msg_for_call,
+            "firstMessageMode": "assistant-speaks-first",
+            "numWordsToInterruptAssistant": 2,
+
+            "voice": {
+                "provider": "custom-voice",
+                "server": {
+                    "url": voice_url,
+                    "timeoutSeconds": 20
+                }
+            },
+            "model": {
+                "provider": "openai",
+                "model": model,
+                "systemPrompt": prompt_for_call,
+            },
+            "transcriber": {
+                "provider": "openai",
+                "model": "gpt-4o-mini-transcribe",
+                "language": "he"
+            },
+            "variableValues": {
+                "customer_name": lead.name,
+                "customer_email": lead.email,
+                "customer_gender": lead.gender,
+                "lead_email": lead.email
+            }
+        }
+    }
+    return call_payload, first_msg_for_call
+
+
+class RateLimiter:
+    """At most `per_minute` acquisitions per minute, evenly spaced; thread-safe."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class CampaignDialer:
+    def __init__(
+        self,
+        api_key: str,
+        concurrency: int = 5,
+        calls_per_minute: float = 30,
+        base_url: str = VAPI_BASE_URL,
+        prerender_url: Optional[str] = None,
+        prerender_format: Optional[dict] = None,
+        admin_token: Optional[str] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(calls_per_minute)
+        self.session = pooled_session(api_key, pool_size=concurrency)
+        # The bridge is another host and takes no bearer token, so it gets its own keep-alive session
+        self.bridge_session = requests.Session()
+        self.bridge_session.mount("https://", HTTPAdapter(pool_maxsize=concurrency))
+        self.bridge_session.mount("http://", HTTPAdapter(pool_maxsize=concurrency))
+        self.prerender_url = prerender_url
+        # {"sampleRate": ..., "encoding": ...} as Vapi will request them; empty lets the bridge decide
+        self.prerender_format = prerender_format or {}
+        self.admin_token = admin_token
+        self._cancel = threading.Event()
+
+    def cancel(self) -> None:
+        """Leads not yet dialled are skipped; calls already placed are unaffected."""
+        self._cancel.set()
+
+    def _prerender(self, first_message: str) -> None:
+        if not self.prerender_url or not first_message:
+            return
+        try:
+            self.bridge_session.post(
+                self.prerender_url,
+                json={"texts": [first_message], **self.prerender_format},
+                headers={"x-admin-token": self.admin_token} if self.admin_token else {},
+                timeout=2,
+            )
+        except requests.RequestException as e:
+            print(f"[Prerender] Skipped: {e}")
+
+    def _dial(self, lead: Lead, payload: dict, first_message: str) -> LeadResult:
+        if self._cancel.is_set():
+            return LeadResult(lead, "failed", "campaign cancelled")
+        self.limiter.acquire()
+        t = time.perf_counter()
+        self._prerender(first_message)
+        try:
+            resp = self.session.post(f"{self.base_url}/call/phone", json=payload, timeout=30)
+        except requests.RequestException as e:
+            return LeadResult(lead, "failed", str(e), seconds=time.perf_counter() - t)
+        elapsed = time.perf_counter() - t
+        if resp.status_code == 201:
+            return LeadResult(lead, "called", call_id=resp.json().get("id"), seconds=elapsed)
+        return LeadResult(lead, "failed", f"{resp.status_code}: {resp.text[:200]}", seconds=elapsed)
+
+    def run(self, leads: list[Lead], render) -> Iterator[LeadResult]:
+        """
+        Dials every lead; `render(lead)` returns (payload, first_message).
+        Yields each result as soon as that call has been placed (completion order).
+        Leads are handed to the pool only as calls in flight finish, so after cancel() (or
+        closing the generator) nothing more is dialled; cancel() yields the rest as skipped.
+        """
+        pool = ThreadPoolExecutor(self.concurrency, thread_name_prefix="campaign")
+        queued = iter(leads)
+        in_flight = set()
+        finished = False
+        try:
+            while True:
+                while len(in_flight) < self.concurrency and not self._cancel.is_set():
+                    lead = next(queued, None)
+                    if lead is None:
+                        break
+                    payload, first_message = render(lead)
+                    in_flight.add(pool.submit(self._dial, lead, payload, first_message))
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            for lead in queued:
+                yield LeadResult(lead, "failed", "campaign cancelled")
+            finished = True
+        finally:
+            if not finished:
+                # Abandoned mid-run: don't start anything else
+                self._cancel.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def close(self) -> None:
+        self.session.close()
+        self.bridge_session.close()
@@ -0,0 +1,20 @@
+"""
+.env loading, shared by every entry point.
+
+Modules read their settings with os.getenv at import time, so the file has to
+be loaded before they are imported; load_env() does it once per process,
+however many entry points ask for it.
+"""
+from pathlib import Path
+
+_loaded = False
+
+
+def load_env(path: Path = Path('.') / '.env') -> None:
+    global _loaded
+    if _loaded:
+        return
+    from dotenv import load_dotenv
+
+    load_dotenv(dotenv_path=path)
+    _loaded = True
@@ -0,0 +1,194 @@
+"""
+Pre-warmed pool of authenticated Deepdub WebSocket connections.
+
+Opening a fresh `wss://` connection costs a TCP + TLS handshake and the
+WebSocket upgrade before the first byte of text goes out. The pool opens
+connections ahead of time, keeps them alive, and hands them out one
+synthesis at a time. A background task pings idle connections, retires
+old / over-used ones and tops the pool back up.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import websockets
+from websockets.protocol import State
+
+log = logging.getLogger("bridge")
+
+
+class PooledConnection:
+    def __init__(self, ws):
+        self.ws = ws
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+        # Set by the caller once the generation finished cleanly (isFinished received).
+        # Anything else leaves unread frames on the socket, so the connection is dropped.
+        self.clean = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.ws.state is State.OPEN
+
+
+class DeepdubPool:
+    def __init__(
+        self,
+        url: str,
+        api_key: Optional[str],
+        size: int = 4,
+        max_uses: int = 200,
+        max_age: float = 600.0,
+        health_interval: float = 15.0,
+        connect_timeout: float = 10.0,
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.size = size
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.health_interval = health_interval
+        self.connect_timeout = connect_timeout
+
+        self._idle: deque[PooledConnection] = deque()
+        self._opening = 0
+        self._in_use = 0
+        self._maintenance: Optional[asyncio.Task] = None
+        self._refills: set[asyncio.Task] = set()
+        self._closed = False
+
+        self.stats = {"opened": 0, "reused": 0, "cold_acquires": 0, "retired": 0, "health_failures": 0}
+
+    async def _open(self) -> PooledConnection:
+        ws = await asyncio.wait_for(
+            websockets.connect(
+                self.url,
+                additional_headers={"x-api-key": self.api_key},
+                ping_interval=20,
+                ping_timeout=20,
+                max_size=None,
+            ),
+            timeout=self.connect_timeout,
+        )
+        self.stats["opened"] += 1
+        return PooledConnection(ws)
+
+    def _expired(self, conn: PooledConnection) -> bool:
+        return (
+            not conn.is_open
+            or conn.uses >= self.max_uses
+            or time.monotonic() - conn.created_at >= self.max_age
+        )
+
+    async def _retire(self, conn: PooledConnection) -> None:
+        self.stats["retired"] += 1
+        try:
+            await conn.ws.close()
+        except Exception:
+            pass
+
+    async def _fill(self) -> None:
+        missing = self.size - len(self._idle) - self._in_use - self._opening
+        if missing <= 0 or self._closed:
+            return
+        self._opening += missing
+        try:
+            results = await asyncio.gather(*(self._open() for _ in range(missing)), return_exceptions=True)
+        finally:
+            self._opening -= missing
+        for r in results:
+            if isinstance(r, Exception):
+                log.warning("⚠️ Deepdub pool: connect failed: %s", r)
+            elif self._closed:
+                await self._retire(r)
+            else:
+                self._idle.append(r)
+
+    def _refill_soon(self) -> None:
+        if self._closed:
+            return
+        task = asyncio.create_task(self._fill())
+        self._refills.add(task)
+        task.add_done_callback(self._refills.discard)
+
+    async def start(self) -> None:
+        await self._fill()
+        self._maintenance = asyncio.create_task(self._maintain())
+        log.info("🔌 Deepdub pool ready | idle=%d/%d", len(self._idle), self.size)
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._maintenance:
+            self._maintenance.cancel()
+        while self._idle:
+            await self._retire(self._idle.popleft())
+
+    async def _health_check(self) -> None:
+        for _ in range(len(self._idle)):
+            if not self._idle:
+                break
+            # Check from the cold end; connections in use are never touched here
+            conn = self._idle.popleft()
+            if self._expired(conn):
+                await self._retire(conn)
+                continue
+            try:
+                pong = await conn.ws.ping()
+                await asyncio.wait_for(pong, timeout=5)
+            except Exception:
+                self.stats["health_failures"] += 1
+                await self._retire(conn)
+                continue
+            self._idle.append(conn)
+
+    async def _maintain(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self._health_check()
+                await self._fill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("⚠️ Deepdub pool maintenance error: %s", e)
+
+    async def _acquire(self) -> PooledConnection:
+        while self._idle:
+            # LIFO: the most recently used connection is the least likely to have gone stale
+            conn = self._idle.pop()
+            if self._expired(conn):
+                await self._retire(conn)
+                continue
+            self.stats["reused"] += 1
+            return conn
+
+        self.stats["cold_acquires"] += 1
+        self._refill_soon()
+        return await self._open()
+
+    async def _release(self, conn: PooledConnection) -> None:
+        conn.uses += 1
+        conn.last_used = time.monotonic()
+        # Connections opened on overflow beyond `size` are closed instead of kept
+        if conn.clean and not self._closed and not self._expired(conn) and len(self._idle) + self._in_use < self.size:
+            conn.clean = False
+            self._idle.append(conn)
+        else:
+            await self._retire(conn)
+            self._refill_soon()
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[PooledConnection]:
+        """Leases a connection for one synthesis. Set `conn.clean = True` when the generation finished."""
+        conn = await self._acquire()
+        self._in_use += 1
+        try:
+            yield conn
+        finally:
+            self._in_use -= 1
+            # Shielded so a cancelled request still closes / returns its socket
+            await asyncio.shield(self._release(conn))
@@ -0,0 +1,198 @@
+"""
+FAQ fast path behind the /faq-answer tool.
+
+The canonical question/answer pairs in the product file (Alta_product_info.txt)
+are loaded into an in-memory inverted index at startup. Questions and answers
+are normalised for Hebrew first: niqqud and punctuation are dropped, final
+letter forms folded, and a word starting with a one-letter prefix (ו, ה, ב,
+ל, מ, ש, כ) is also indexed without it, so "למערכות" matches "מערכות". Each
+entry is indexed by its keywords, keyword bigrams and character trigrams (the
+last absorb STT spelling slips). A lookup scores the candidates sharing a feature with the question by
+how much of the question's IDF-weighted features they cover, so answering a
+call's question takes microseconds instead of an LLM turn.
+
+The file is re-read when its mtime changes (checked at most every
+`check_interval` seconds, on lookup); `on_rebuild(entries)` then lets the
+server pre-synthesise the new answers.
+"""
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+log = logging.getLogger("bridge")
+
+FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+HEBREW_PREFIXES = "והבלמשכ"
+# Function words that say nothing about which question was asked
+STOPWORDS = frozenset(
+    "זה זו זאת את של על עם אני אתה את אתם אתן אנחנו הוא היא הם לי לך לו לה לנו לכם יש אין מה מי גם רק כל אבל או אם כי "
+    "אז כן לא עוד כבר פה שם the a an is it to of and or you we i".split()
+)
+QUESTION_WEIGHT = 1.0
+ANSWER_WEIGHT = 0.5  # an answer's words count, but less than the question's
+
+_QA_LINE = re.compile(r'^\s*-?\s*(שאלה|תשובה)\s*:\s*"?(.*?)"?\s*$')
+_WORD = re.compile(r"[\wא-ת]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercased, niqqud- and punctuation-free text with Hebrew final letters folded."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(_WORD.findall(text.lower().translate(FINAL_LETTERS)))
+
+
+def _unprefixed(word: str) -> Optional[str]:
+    return word[1:] if len(word) > 3 and word[0] in HEBREW_PREFIXES else None
+
+
+def keywords(text: str) -> list[str]:
+    """Normalised content words."""
+    return [w for w in normalize(text).split() if w not in STOPWORDS and _unprefixed(w) not in STOPWORDS]
+
+
+def features(text: str) -> set[str]:
+    words = keywords(text)
+    found = {f"w:{w}" for w in words}
+    # A leading letter may be a prefix or part of the word; index both readings
+    found.update(f"w:{u}" for u in map(_unprefixed, words) if u)
+    found.update(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+    for w in words:
+        padded = f"_{w}_"
+        found.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return found
+
+
+@dataclass(frozen=True)
+class FaqEntry:
+    question: str
+    answer: str
+
+
+@dataclass(frozen=True)
+class FaqMatch:
+    entry: FaqEntry
+    score: float
+
+
+def parse_faq(text: str) -> list[FaqEntry]:
+    """`- שאלה: "..."` / `- תשובה: "..."` pairs; text outside them is ignored."""
+    entries, question = [], None
+    for line in text.splitlines():
+        m = _QA_LINE.match(line)
+        if not m:
+            continue
+        kind, value = m.groups()
+        if kind == "שאלה":
+            question = value
+        elif question:
+            entries.append(FaqEntry(question, value))
+            question = None
+    return entries
+
+
+class _Index:
+    def __init__(self, entries: list[FaqEntry]):
+        self.entries = entries
+        self.exact = {normalize(e.question): i for i, e in enumerate(entries)}
+        # feature -> {entry: weight}
+        self.postings: dict[str, dict[int, float]] = {}
+        for i, e in enumerate(entries):
+            for weight, text in ((ANSWER_WEIGHT, e.answer), (QUESTION_WEIGHT, e.question)):
+                for f in features(text):
+                    self.postings.setdefault(f, {})[i] = weight
+        # Smoothed IDF: a feature in every entry still counts a little
+        n = len(entries)
+        self.idf = {f: math.log(1 + (n + 1) / (len(p) + 0.5)) for f, p in self.postings.items()}
+        self.unknown_idf = math.log(1 + (n + 1) / 0.5)
+
+    def search(self, question: str) -> Optional[FaqMatch]:
+        i = self.exact.get(normalize(question))
+        if i is not None:
+            return FaqMatch(self.entries[i], 1.0)
+        query = features(question)
+        total = sum(self.idf.get(f, self.unknown_idf) for f in query)
+        if not total:
+            return None
+        scores: dict[int, float] = {}
+        for f in query:
+            postings = self.postings.get(f)
+            if postings:
+                idf = self.idf[f]
+                for i, weight in postings.items():
+                    scores[i] = scores.get(i, 0.0) + idf * weight
+        if not scores:
+            return None
+        best = max(scores, key=scores.get)
+        return FaqMatch(self.entries[best], scores[best] / total)
+
+
+class FaqIndex:
+    def __init__(self, path: str, min_score: float = 0.2, check_interval: float = 5.0,
+                 on_rebuild: Optional[Callable[[list[FaqEntry]], None]] = None):
+        self.path = path
+        self.min_score = min_score
+        self.check_interval = check_interval
+        self.on_rebuild = on_rebuild
+        self._index = _Index([])
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "rebuilds": 0, "load_errors": 0}
+
+    @property
+    def entries(self) -> list[FaqEntry]:
+        return self._index.entries
+
+    def reload_if_changed(self) -> bool:
+        """Rebuilds the index if the file's mtime changed; True if it did."""
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            if self._mtime is not None or not self.stats["load_errors"]:
+                log.warning("⚠️ FAQ file unreadable (%s); keeping %d entries", e, len(self.entries))
+            self.stats["load_errors"] += 1
+            return False
+        if mtime == self._mtime:
+            return False
+        with self._lock:
+            if mtime == self._mtime:
+                return False
+            with open(self.path, encoding="utf-8") as f:
+                entries = parse_faq(f.read())
+            # Built aside and swapped in whole, so lookups never see a half-built index
+            self._index = _Index(entries)
+            self._mtime = mtime
+            self.stats["rebuilds"] += 1
+        log.info("📚 FAQ index built | entries=%d features=%d", len(entries), len(self._index.postings))
+        if self.on_rebuild:
+            self.on_rebuild(entries)
+        return True
+
+    def lookup(self, question: str) -> Optional[FaqMatch]:
+        """The best canonical answer for `question`, or None if nothing scores `min_score`."""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload_if_changed()
+        self.stats["lookups"] += 1
+        match = self._index.search(question or "")
+        if match is None or match.score < self.min_score:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return match
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "path": self.path,
+            "entries": len(self.entries),
+            "features": len(self._index.postings),
+            "min_score": self.min_score,
+        }
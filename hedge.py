@@ -0,0 +1,132 @@
+"""
+Hedged Deepdub requests.
+
+Most generations start fast, but an occasional slow one dominates the tail
+of time-to-first-audio. With hedging on, a synthesis that hasn't produced
+audio after `delay` seconds gets a second, identical request; whichever
+yields audio first is streamed and the other is cancelled on the spot (its
+socket is dropped, not returned to the pool). Hedges are capped at
+`per_minute`, so a Deepdub-wide slowdown can't double our load.
+
+A cancelled primary's first-audio time is never known, so the improvement
+is measured against a holdout: a small random share of requests (`holdout`)
+is never hedged, and the p99 time-to-first-audio of recent hedge-eligible
+streams is compared with the holdout's.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Optional
+
+log = logging.getLogger("bridge")
+
+
+def _p99(values) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * 0.99))] if values else 0.0
+
+
+class Hedger:
+    def __init__(self, delay: float, per_minute: int, holdout: float = 0.05, window: int = 1000,
+                 on_first_audio: Optional[Callable[[float, str], None]] = None):
+        """`on_first_audio(seconds, group)` is called per stream, group being "hedging" or "holdout"."""
+        self.delay = delay
+        self.per_minute = per_minute
+        self.holdout = holdout
+        self.on_first_audio = on_first_audio
+        self._hedges: deque[float] = deque()
+        self._closing: set[asyncio.Future] = set()
+        self._ttfa = {"hedging": deque(maxlen=window), "holdout": deque(maxlen=window)}
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0, "over_budget": 0,
+                      "holdout": 0, "failed": 0}
+
+    def _take_budget(self) -> bool:
+        now = time.monotonic()
+        while self._hedges and now - self._hedges[0] >= 60:
+            self._hedges.popleft()
+        if len(self._hedges) >= self.per_minute:
+            self.stats["over_budget"] += 1
+            return False
+        self._hedges.append(now)
+        return True
+
+    async def stream(self, start: Callable[[], AsyncIterator[bytes]]) -> AsyncIterator[bytes]:
+        """Streams `start()`, racing it against a second `start()` if no audio has arrived after `delay`."""
+        self.stats["requests"] += 1
+        group = "holdout" if random.random() < self.holdout else "hedging"
+        t0 = time.perf_counter()
+        primary = start()
+        first = asyncio.ensure_future(primary.__anext__())
+        racers = {first: primary}
+        winner, chunk, error = None, None, None
+        try:
+            if group == "holdout":
+                self.stats["holdout"] += 1
+            elif not (await asyncio.wait({first}, timeout=self.delay))[0] and self._take_budget():
+                self.stats["hedged"] += 1
+                log.info("🏇 hedging Deepdub request | no audio after %.0fms", self.delay * 1000)
+                hedge = start()
+                racers[asyncio.ensure_future(hedge.__anext__())] = hedge
+
+            pending = set(racers)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # The primary first, so a tie goes to the request that was already running
+                for task in sorted(done, key=lambda t: t is not first):
+                    exc = task.exception()
+                    if winner is not None:
+                        continue
+                    if exc is None or isinstance(exc, StopAsyncIteration):
+                        # Audio, or a render that finished without any: either way this one is served
+                        winner, chunk = racers[task], (task.result() if exc is None else None)
+                    else:
+                        error = error or exc
+        finally:
+            # The loser (or, if we were cancelled, everyone) stops now; its socket is dropped
+            for task, gen in racers.items():
+                if not task.done():
+                    task.cancel()
+                elif gen is not winner and not task.cancelled() and task.exception() is None:
+                    # Produced audio in the same instant as the winner: it is parked at a yield, close it
+                    closing = asyncio.ensure_future(gen.aclose())
+                    self._closing.add(closing)
+                    closing.add_done_callback(self._closing.discard)
+
+        if winner is None:
+            self.stats["failed"] += 1
+            raise error
+        if len(racers) > 1:
+            self.stats["primary_wins" if winner is primary else "hedge_wins"] += 1
+        if chunk is not None:
+            ttfa = time.perf_counter() - t0
+            self._ttfa[group].append(ttfa)
+            if self.on_first_audio:
+                self.on_first_audio(ttfa, group)
+
+        try:
+            if chunk is None:
+                return
+            yield chunk
+            async for chunk in winner:
+                yield chunk
+        finally:
+            await winner.aclose()
+
+    def p99(self) -> dict[str, float]:
+        return {group: _p99(samples) for group, samples in self._ttfa.items()}
+
+    def snapshot(self) -> dict:
+        hedged = self.stats["hedged"]
+        p99 = self.p99()
+        return {
+            **self.stats,
+            "hedge_rate": hedged / self.stats["requests"] if self.stats["requests"] else 0.0,
+            "win_rate": self.stats["hedge_wins"] / hedged if hedged else 0.0,
+            "p99_ttfa": p99,
+            # A p99 over fewer holdout samples than this is noise
+            "p99_improvement": p99["holdout"] - p99["hedging"] if len(self._ttfa["holdout"]) >= 100 else None,
+            "budget_used": len(self._hedges),
+            "per_minute": self.per_minute,
+        }
@@ -0,0 +1,172 @@
+"""
+Minimal Prometheus-format metrics and non-blocking logging for the bridge.
+
+Metrics are plain in-process counters / histograms rendered in the text
+exposition format on GET /metrics. Logging goes through a QueueHandler, so
+the event loop only enqueues records; a background thread does the actual
+stdout writes. High-rate messages (one per WebSocket chunk) go through a
+SampledLogger that only formats one record in N.
+"""
+import bisect
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Callable, Optional
+
+log = logging.getLogger("bridge")
+
+_registry: list = []
+_lock = threading.Lock()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0, 30.0)
+FAST_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+
+def _fmt_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values: dict[tuple, float] = {}
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, v in sorted(self._values.items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._series: dict[tuple, list] = {}
+        _registry.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(self._series.items()):
+            running = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                running += c
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {running}")
+        return lines
+
+
+class CallbackMetric:
+    """Exports values owned elsewhere (pool / cache / admission stats dicts) at scrape time."""
+
+    def __init__(self, name: str, help: str, kind: str, fn: Callable[[], dict], labelname: str = ""):
+        self.name, self.help, self.kind, self.fn, self.labelname = name, help, kind, fn, labelname
+        _registry.append(self)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for label, v in self.fn().items():
+            labels = f'{{{self.labelname}="{label}"}}' if self.labelname else ""
+            lines.append(f"{self.name}{labels} {v}")
+        return lines
+
+
+def render_prometheus() -> str:
+    with _lock:
+        metrics = list(_registry)
+    lines = []
+    for m in metrics:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Bridge metrics ---
+
+STAGE_SECONDS = Histogram(
+    "bridge_tts_stage_seconds",
+    "Time from request start to each stage of a /to-speech stream (connect is the socket lease alone)",
+    ("stage",),
+)
+DECODE_SECONDS = Histogram("bridge_tts_decode_seconds", "Per-chunk WAV decode + resample time", buckets=FAST_BUCKETS)
+TTS_REQUESTS = Counter("bridge_tts_requests_total", "/to-speech requests by where the audio came from", ("source",))
+TTS_FAILURES = Counter("bridge_tts_failures_total", "Deepdub / decode failures", ("stage",))
+TTS_CHUNKS = Counter("bridge_tts_ws_chunks_total", "WebSocket messages received from Deepdub")
+TTS_PCM_BYTES = Counter("bridge_tts_pcm_bytes_total", "Audio bytes sent to clients", ("format",))
+RING_UNDERRUNS = Counter("bridge_tts_ring_underruns_total", "Times a live stream's audio ran out before the next frame was rendered")
+RING_STALL_SECONDS = Counter("bridge_tts_ring_stall_seconds_total", "Playback gaps those underruns add up to")
+RING_PEAK_SECONDS = Histogram("bridge_tts_ring_peak_seconds", "Most audio buffered ahead of the client per live stream",
+                              buckets=(0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0))
+RING_ALLOCATED_BYTES = Histogram("bridge_tts_ring_allocated_bytes", "Bytes preallocated for each live stream's ring buffer",
+                                buckets=(16384, 32768, 65536, 131072, 262144, 524288, 1048576))
+HEDGE_TTFA_SECONDS = Histogram("bridge_tts_hedge_ttfa_seconds",
+                               "First-audio time of live renders, hedge-eligible vs. never-hedged holdout", ("group",))
+TOOL_CALLS = Counter("bridge_tool_calls_total", "Vapi tool calls", ("tool",))
+TOOL_FAILURES = Counter("bridge_tool_failures_total", "Vapi tool calls that failed", ("tool",))
+TOOL_SECONDS = Histogram("bridge_tool_seconds", "Tool call handling time", ("tool",))
+FAQ_LOOKUP_SECONDS = Histogram("bridge_faq_lookup_seconds", "FAQ index lookup time", buckets=FAST_BUCKETS)
+
+
+# --- Logging ---
+
+class SampledLogger:
+    """Logs one call in `every`; the others cost a counter increment and no formatting."""
+
+    def __init__(self, logger: logging.Logger, every: int):
+        self.logger = logger
+        self.every = max(1, every)
+        self._n = 0
+
+    def info(self, msg: str, *args) -> None:
+        self._n += 1
+        if self._n % self.every == 1 or self.every == 1:
+            self.logger.info(msg, *args)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> None:
+    """Routes the `bridge` logger through a queue so stdout writes happen off the event loop."""
+    global _listener
+    if _listener is not None:
+        return
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(message)s"))
+    _listener = logging.handlers.QueueListener(q, stream)
+    _listener.start()
+    log.addHandler(logging.handlers.QueueHandler(q))
+    log.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    log.propagate = False
+
+
+def stop_logging() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
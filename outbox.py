@@ -0,0 +1,346 @@
+"""
+Persistent outbox for confirmation emails.
+
+Messages are written to a SQLite queue and delivered by background threads
+that keep a small pool of authenticated SMTP sessions alive, so a busy
+campaign day pays the connect + STARTTLS + login handshake once per session
+instead of once per booking. Each worker claims a batch of due messages and
+sends them over one session; failures are retried with exponential backoff
+and give up after `max_attempts`. Messages still queued at shutdown (or in a
+crash) are delivered on the next start.
+
+Several worker processes may share one database. A claimed message records
+the claiming pid and a lease expiry, and is only put back in the queue once
+that process is gone or the lease has run out, so a worker starting up never
+re-sends mail another live worker is still sending.
+"""
+import html
+import logging
+import os
+import smtplib
+import sqlite3
+import threading
+import time
+from collections import deque
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from string import Template
+from typing import Optional
+
+log = logging.getLogger("bridge")
+
+# Built once; per message only the substitutions run
+SUBJECT_TEMPLATE = Template("אישור פגישה: Alta AI - $name")
+BODY_TEMPLATE = Template("""
+    <div dir="rtl" style="font-family: Arial, sans-serif;">
+        <h2>היי $name,</h2>
+        <p>שמחים לאשר את פגישת הדמו שלך עם קטי מחברת Alta AI.</p>
+        <p><strong>מועד הפגישה:</strong> $slot</p>
+        <p>קישור לפגישה (זום) יישלח בסמוך למועד, וכבר מופיע בזימון ביומן המצורף.</p>
+        <br>
+        <a href="$calendar_link" style="background-color: #6c5ce7; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">צפה באירוע ביומן</a>
+        <br><br>
+        בברכה,<br>
+        צוות Alta AI
+    </div>
+    """)
+
+
+def render_confirmation(name: str, slot: str, calendar_link: Optional[str]) -> tuple[str, str]:
+    """Subject and HTML body of a booking confirmation."""
+    subject = SUBJECT_TEMPLATE.substitute(name=name)
+    body = BODY_TEMPLATE.substitute(
+        name=html.escape(name), slot=html.escape(slot), calendar_link=html.escape(calendar_link or "", quote=True),
+    )
+    return subject, body
+
+
+class SmtpPool:
+    """Idle authenticated SMTP sessions, reused while the server keeps them open."""
+
+    def __init__(self, host: str, port: int, starttls: bool, username: Optional[str], password: Optional[str],
+                 size: int = 2, max_messages: int = 90, timeout: float = 30.0):
+        """`max_messages` recycles a session before the provider's per-connection limit (Gmail: ~100)."""
+        self.host, self.port, self.starttls = host, port, starttls
+        self.username, self.password = username, password
+        self.size = size
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self._idle: deque = deque()
+        self._lock = threading.Lock()
+        self.stats = {"connects": 0, "reuses": 0, "discarded": 0}
+
+    def _connect(self) -> smtplib.SMTP:
+        session = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            session.starttls()
+        if self.username and self.password:
+            session.login(self.username, self.password)
+        session.sent = 0
+        self.stats["connects"] += 1
+        return session
+
+    def acquire(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                return self._connect()
+            try:
+                # Servers drop idle sessions; check before handing it out
+                if session.noop()[0] == 250:
+                    self.stats["reuses"] += 1
+                    return session
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.discard(session)
+
+    def release(self, session: smtplib.SMTP) -> None:
+        with self._lock:
+            if session.sent < self.max_messages and len(self._idle) < self.size:
+                self._idle.append(session)
+                return
+        self.discard(session)
+
+    def discard(self, session: smtplib.SMTP) -> None:
+        self.stats["discarded"] += 1
+        try:
+            session.quit()
+        except (smtplib.SMTPException, OSError):
+            session.close()
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._idle = list(self._idle), deque()
+        for session in sessions:
+            self.discard(session)
+
+
+class Outbox:
+    def __init__(self, db_path: str, pool: SmtpPool, sender: Optional[str], workers: int = 2,
+                 batch_size: int = 20, max_attempts: int = 6, backoff_base: float = 5.0, poll_interval: float = 5.0,
+                 lease_seconds: float = 600.0):
+        """`lease_seconds` must outlast sending one batch, SMTP timeouts included."""
+        self.pool = pool
+        self.sender = sender
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.pid = os.getpid()
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self.stats = {"queued": 0, "sent": 0, "retried": 0, "dead": 0, "batches": 0}
+
+        with self._db_lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY,
+                    to_email TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL
+                )""")
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(outbox)")}
+            if "claimed_by" not in columns:
+                self._db.execute("ALTER TABLE outbox ADD COLUMN claimed_by INTEGER")
+                self._db.execute("ALTER TABLE outbox ADD COLUMN lease_until REAL")
+            self._db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+            self._requeue_abandoned()
+            self._db.execute("DELETE FROM outbox WHERE status = 'sent' AND created_at < ?", (time.time() - 7 * 86400,))
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"outbox-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def close(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.pool.close()
+        with self._db_lock:
+            self._db.close()
+
+    def enqueue(self, to_email: str, subject: str, body: str) -> int:
+        now = time.time()
+        with self._db_lock:
+            cur = self._db.execute(
+                "INSERT INTO outbox (to_email, subject, body, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (to_email, subject, body, now, now),
+            )
+        self.stats["queued"] += 1
+        self._wake.set()
+        return cur.lastrowid
+
+    def enqueue_confirmation(self, to_email: str, name: str, slot: str, calendar_link: Optional[str]) -> int:
+        subject, body = render_confirmation(name, slot, calendar_link)
+        return self.enqueue(to_email, subject, body)
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            # Exists, but belongs to someone else
+            return True
+        return True
+
+    def _requeue_abandoned(self) -> int:
+        """Puts back messages whose claim expired or whose claiming process has died. Call with the db lock held."""
+        now = time.time()
+        claimers = [pid for (pid,) in self._db.execute(
+            "SELECT DISTINCT claimed_by FROM outbox WHERE status = 'sending'") if pid is not None]
+        dead = [pid for pid in claimers if pid != self.pid and not self._alive(pid)]
+        cur = self._db.execute(
+            "UPDATE outbox SET status = 'pending', claimed_by = NULL, lease_until = NULL WHERE status = 'sending' "
+            f"AND (claimed_by IS NULL OR lease_until IS NULL OR lease_until < ? OR claimed_by IN ({','.join('?' * len(dead)) or 'NULL'}))",
+            (now, *dead),
+        )
+        if cur.rowcount:
+            log.warning("📮 outbox: requeued %d messages abandoned mid-send", cur.rowcount)
+        return cur.rowcount
+
+    def _claim(self) -> list[tuple]:
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._requeue_abandoned()
+                rows = self._db.execute(
+                    "SELECT id, to_email, subject, body, attempts FROM outbox "
+                    "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                    (time.time(), self.batch_size),
+                ).fetchall()
+                if rows:
+                    lease_until = time.time() + self.lease_seconds
+                    self._db.executemany(
+                        "UPDATE outbox SET status = 'sending', claimed_by = ?, lease_until = ? WHERE id = ?",
+                        [(self.pid, lease_until, r[0]) for r in rows],
+                    )
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        return rows
+
+    def _mark_sent(self, msg_id: int) -> None:
+        with self._db_lock:
+            self._db.execute("UPDATE outbox SET status = 'sent', attempts = attempts + 1 WHERE id = ?", (msg_id,))
+        self.stats["sent"] += 1
+
+    def _mark_failed(self, msg_id: int, attempts: int, error: str) -> None:
+        attempts += 1
+        if attempts >= self.max_attempts:
+            status, next_at = "dead", time.time()
+            self.stats["dead"] += 1
+            log.error("❌ outbox message %d gave up after %d attempts: %s", msg_id, attempts, error)
+        else:
+            status, next_at = "pending", time.time() + self.backoff_base * 2 ** (attempts - 1)
+            self.stats["retried"] += 1
+        with self._db_lock:
+            self._db.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (status, attempts, next_at, error, msg_id),
+            )
+
+    def _build(self, to_email: str, subject: str, body: str) -> str:
+        msg = MIMEMultipart()
+        msg['From'] = self.sender or ""
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'html'))
+        return msg.as_string()
+
+    def _send_batch(self, rows: list[tuple]) -> None:
+        self.stats["batches"] += 1
+        remaining = list(rows)
+        try:
+            session = self.pool.acquire()
+        except (smtplib.SMTPException, OSError) as e:
+            log.warning("⚠️ outbox: SMTP connect failed: %s", e)
+            for msg_id, _, _, _, attempts in remaining:
+                self._mark_failed(msg_id, attempts, str(e))
+            return
+
+        while remaining:
+            msg_id, to_email, subject, body, attempts = remaining[0]
+            try:
+                session.sendmail(self.sender or "", to_email, self._build(to_email, subject, body))
+            except smtplib.SMTPRecipientsRefused as e:
+                # The address is the problem, not the session
+                self._mark_failed(msg_id, self.max_attempts - 1, str(e))
+            except (smtplib.SMTPException, OSError) as e:
+                # The session is unusable; requeue this and everything after it
+                self.pool.discard(session)
+                for m_id, _, _, _, m_attempts in remaining:
+                    self._mark_failed(m_id, m_attempts, str(e))
+                return
+            except Exception as e:
+                # Something about this message can't be sent at all (e.g. a non-ASCII address): retrying won't help
+                self._mark_failed(msg_id, self.max_attempts - 1, repr(e))
+                remaining.pop(0)
+                try:
+                    # The failure may have left a transaction open on the session
+                    session.rset()
+                except (smtplib.SMTPException, OSError) as e:
+                    self.pool.discard(session)
+                    for m_id, _, _, _, m_attempts in remaining:
+                        self._mark_failed(m_id, m_attempts, str(e))
+                    return
+                continue
+            else:
+                session.sent += 1
+                self._mark_sent(msg_id)
+                log.info("📧 confirmation sent | to=%s", to_email)
+            remaining.pop(0)
+        self.pool.release(session)
+
+    def _worker(self) -> None:
+        errors = 0
+        while not self._stop.is_set():
+            try:
+                rows = self._claim()
+                errors = 0
+                if rows:
+                    self._send_batch(rows)
+                    continue
+            except Exception as e:
+                # Whatever went wrong (e.g. the database), this thread must keep delivering
+                errors += 1
+                log.exception("❌ outbox worker error: %s", e)
+                self._stop.wait(min(60.0, self.backoff_base * 2 ** (errors - 1)))
+                continue
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def message(self, msg_id: int) -> Optional[dict]:
+        """Delivery status of one message (None once it's been purged, a week after sending)."""
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT status, attempts, last_error, next_attempt_at FROM outbox WHERE id = ?", (msg_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, attempts, last_error, next_at = row
+        return {"id": msg_id, "status": status, "attempts": attempts, "last_error": last_error,
+                "next_attempt_at": next_at if status == "pending" else None}
+
+    def snapshot(self) -> dict:
+        with self._db_lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        return {**self.stats, "by_status": counts, "smtp": dict(self.pool.stats)}
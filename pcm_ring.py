@@ -0,0 +1,120 @@
+"""
+Fixed-frame ring buffer between a live render and its HTTP stream.
+
+Decoded audio arrives in pieces of whatever size Deepdub's chunks happen to
+decode to. The producer copies each piece into one preallocated buffer; the
+stream reads it back as memoryview slices of whole frames (e.g. 20 ms), so
+every HTTP chunk is a multiple of the frame size and nothing is allocated per
+chunk. Before the first read the stream waits for `jitter_frames` frames, a
+small cushion against uneven arrival. An underrun is counted when a frame
+arrives later than a real-time player that started at the first read would
+have needed it.
+
+Frames are handed out without copying, so a slice must stay valid while the
+server's transport may still hold it: the `guard` bytes just behind the read
+position are never written to, and the writer waits for space instead.
+"""
+import asyncio
+import time
+from typing import Optional
+
+
+class ReaderGone(Exception):
+    """The reader didn't drain the ring within the write timeout."""
+
+
+class PcmRing:
+    def __init__(self, frame_bytes: int, frame_seconds: float, capacity_frames: int, guard_frames: int = 0,
+                 jitter_frames: int = 1, max_frames_per_read: int = 10):
+        self.frame_bytes = frame_bytes
+        self.frame_seconds = frame_seconds
+        self.size = frame_bytes * (capacity_frames + guard_frames)
+        self.guard = frame_bytes * guard_frames
+        self.jitter_frames = min(max(1, jitter_frames), capacity_frames)
+        self.max_frames_per_read = max(1, max_frames_per_read)
+
+        self._view = memoryview(bytearray(self.size))
+        # Read offset is always frame-aligned and the size is a whole number of frames, so reads never wrap
+        self._read = 0
+        self._count = 0
+        # When the audio handed out so far runs out at the far end (None until the first read)
+        self._playhead: Optional[float] = None
+        self._closed = False
+        self._data = asyncio.Event()
+        self._space = asyncio.Event()
+
+        self.stats = {"writes": 0, "reads": 0, "frames": 0, "underruns": 0, "stalled_seconds": 0.0,
+                      "peak_bytes": 0, "allocated_bytes": self._view.nbytes}
+
+    @property
+    def buffered(self) -> int:
+        return self._count
+
+    async def write(self, data, timeout: Optional[float] = None) -> None:
+        """Copies `data` in, waiting for space; raises ReaderGone if nobody reads for `timeout` seconds."""
+        src = memoryview(data)
+        self.stats["writes"] += 1
+        while len(src) and not self._closed:
+            free = self.size - self.guard - self._count
+            if free <= 0:
+                self._space.clear()
+                try:
+                    await asyncio.wait_for(self._space.wait(), timeout)
+                except asyncio.TimeoutError:
+                    raise ReaderGone(f"no read for {timeout:g}s") from None
+                continue
+            n = min(free, len(src))
+            pos = (self._read + self._count) % self.size
+            first = min(n, self.size - pos)
+            self._view[pos:pos + first] = src[:first]
+            if n > first:
+                self._view[:n - first] = src[first:n]
+            src = src[n:]
+            self._count += n
+            if self._count > self.stats["peak_bytes"]:
+                self.stats["peak_bytes"] = self._count
+            self._data.set()
+
+    def close(self) -> None:
+        """End of stream: the reader drains what's left, then gets None."""
+        self._closed = True
+        self._data.set()
+        self._space.set()
+
+    def abort(self) -> None:
+        """Ends the stream early, dropping whatever the reader hasn't taken."""
+        self._count = 0
+        self.close()
+
+    async def read(self) -> Optional[memoryview]:
+        """
+        The next run of whole frames (at most `max_frames_per_read`), a shorter final piece
+        at the end of the stream, or None once it's over. The slice is valid until the writer
+        laps the guard region, i.e. well after the next read.
+        """
+        need = self.frame_bytes * (self.jitter_frames if self._playhead is None else 1)
+        while self._count < need and not self._closed:
+            self._data.clear()
+            await self._data.wait()
+        if not self._count:
+            return None
+
+        now = time.monotonic()
+        if self._playhead is None:
+            self._playhead = now
+        elif now > self._playhead:
+            # Everything sent so far has already played out: the listener hears a gap
+            self.stats["underruns"] += 1
+            self.stats["stalled_seconds"] += now - self._playhead
+            self._playhead = now
+
+        frames = min(self._count, self.size - self._read) // self.frame_bytes
+        n = min(frames, self.max_frames_per_read) * self.frame_bytes if frames else self._count
+        chunk = self._view[self._read:self._read + n]
+        self._read = (self._read + n) % self.size
+        self._count -= n
+        self._playhead += n / self.frame_bytes * self.frame_seconds
+        self.stats["reads"] += 1
+        self.stats["frames"] += -(-n // self.frame_bytes)
+        self._space.set()
+        return chunk
@@ -0,0 +1,164 @@
+"""
+Speculative pre-rendering of utterances we already know are coming.
+
+When a dialer starts a call it knows the first message word for word, long
+before Vapi asks /to-speech for it. The dialer posts that text to /prerender,
+synthesis starts in the background, and when /to-speech later receives the
+same text it streams the rendered (or still-rendering) audio straight away.
+
+Entries expire after a TTL and the store has a byte cap, so abandoned calls
+don't pile up.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Optional
+
+log = logging.getLogger("bridge")
+
+
+class PrerenderEntry:
+    def __init__(self, text_len: int):
+        self.text_len = text_len
+        self.created_at = time.monotonic()
+        self.chunks: list[bytes] = []
+        self.nbytes = 0
+        self.done = False
+        self.failed = False
+        self.task: Optional[asyncio.Task] = None
+        self.readers = 0
+        self._changed = asyncio.Condition()
+
+    async def _append(self, pcm: bytes) -> None:
+        async with self._changed:
+            self.chunks.append(pcm)
+            self.nbytes += len(pcm)
+            self._changed.notify_all()
+
+    async def _finish(self, failed: bool = False) -> None:
+        async with self._changed:
+            self.done = True
+            self.failed = failed
+            self._changed.notify_all()
+
+    @property
+    def usable(self) -> bool:
+        # A render that failed or was cancelled is truncated audio; one still in flight is fine
+        return not self.failed
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """
+        Yields everything rendered so far, then follows the render until it's done.
+        Raises if the render fails part-way, so the response is cut off rather than ending cleanly.
+        """
+        i = 0
+        self.readers += 1
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: i < len(self.chunks) or self.done)
+                    pending = self.chunks[i:]
+                    finished = self.done
+                for chunk in pending:
+                    yield chunk
+                i += len(pending)
+                if finished and i >= len(self.chunks):
+                    if self.failed:
+                        raise RuntimeError("prerender failed mid-stream")
+                    return
+        finally:
+            self.readers -= 1
+
+
+class PrerenderStore:
+    def __init__(self, render: Callable[[dict], AsyncIterator[bytes]], ttl: float, max_bytes: int, concurrency: int,
+                 on_done: Optional[Callable[[str, dict, bytes], None]] = None):
+        """
+        `render(req)` is the synthesis coroutine, e.g. `lambda req: synthesize(pool, req)`.
+        `on_done(key, req, pcm)` runs in a thread after a complete render, e.g. to store it in the PCM cache.
+        """
+        self.render = render
+        self.on_done = on_done
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sem = asyncio.Semaphore(concurrency)
+        self._entries: OrderedDict[str, PrerenderEntry] = OrderedDict()
+
+        self.stats = {"queued": 0, "hits": 0, "expired": 0, "evicted": 0, "failed": 0}
+
+    def _total_bytes(self) -> int:
+        return sum(e.nbytes for e in self._entries.values())
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        if entry.task and not entry.task.done():
+            entry.task.cancel()
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        # Oldest first, so stop at the first entry that is still fresh. Entries someone is
+        # streaming from stay until the last reader is done (their render too).
+        for key, entry in list(self._entries.items()):
+            if now - entry.created_at < self.ttl:
+                break
+            if entry.readers:
+                continue
+            self._drop(key)
+            self.stats["expired"] += 1
+        for key in [k for k, e in self._entries.items() if not e.readers]:
+            if self._total_bytes() <= self.max_bytes:
+                break
+            self._drop(key)
+            self.stats["evicted"] += 1
+
+    async def _run(self, key: str, req: dict, entry: PrerenderEntry) -> None:
+        try:
+            async with self._sem:
+                async for pcm in self.render(req):
+                    await entry._append(pcm)
+            await entry._finish()
+            log.info("🔮 prerender done | text_len=%d pcm=%d", entry.text_len, entry.nbytes)
+            if self.on_done and entry.chunks:
+                await asyncio.to_thread(self.on_done, key, req, b"".join(entry.chunks))
+        except asyncio.CancelledError:
+            await entry._finish(failed=True)
+            raise
+        except Exception as e:
+            self.stats["failed"] += 1
+            log.error("❌ prerender error: %s", e)
+            await entry._finish(failed=True)
+        finally:
+            self._purge()
+
+    def submit(self, key: str, req: dict) -> bool:
+        """Queues a background render. Returns False if the text is already rendered or rendering."""
+        self._purge()
+        if key in self._entries and self._entries[key].usable:
+            return False
+        entry = PrerenderEntry(len(req["targetText"]))
+        entry.task = asyncio.create_task(self._run(key, req, entry))
+        self._entries[key] = entry
+        self.stats["queued"] += 1
+        return True
+
+    def get(self, key: str) -> Optional[PrerenderEntry]:
+        self._purge()
+        entry = self._entries.get(key)
+        if entry is None or not entry.usable:
+            return None
+        self.stats["hits"] += 1
+        return entry
+
+    async def close(self) -> None:
+        for key in list(self._entries):
+            self._drop(key)
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "in_flight": sum(1 for e in self._entries.values() if not e.done),
+            "bytes": self._total_bytes(),
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,35 @@
+"""
+Production entry point: several uvicorn worker processes sharing one port.
+
+Each worker imports server.py on its own, so it has its own warm Deepdub
+connection pool, in-memory caches and admission budget; the disk tier of the
+PCM cache and the email outbox are shared through the filesystem. The
+environment (.env included) is loaded here, before the workers start, so they
+all run with the same configuration.
+
+On SIGTERM / Ctrl+C uvicorn stops accepting connections and lets open
+/to-speech streams finish for up to GRACEFUL_SHUTDOWN_TIMEOUT seconds before
+the workers exit.
+
+    WEB_CONCURRENCY=4 python serve.py
+"""
+import os
+
+import uvicorn
+
+from config import load_env
+
+load_env()
+
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+GRACEFUL_SHUTDOWN_TIMEOUT = float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT,
+    )
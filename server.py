@@ -1,57 +1,403 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse, Response
 import os
-from dotenv import load_dotenv
-import threading
-import queue
-from deepdub import DeepdubClient
-import uvicorn
-import subprocess
 import json
-import logging
 import asyncio
+import secrets
 import time
-import base64
-import binascii
+from collections import OrderedDict
 from typing import Optional
-import websockets
 from pathlib import Path
+from contextlib import asynccontextmanager
 
+from config import load_env
 
-from tools import get_available_slots, book_meeting
+# Before the imports below: tools, tts, availability and friends read their settings at import time
+load_env()
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse, Response
 
-env_path = Path('.') / '.env'
-load_dotenv(dotenv_path=env_path)
+from tools import (
+    get_available_slots, create_meeting_event, send_confirmation_email, confirmation_status, get_outbox, close_outbox,
+    meeting_interval, parse_date, prefetch_availability, slot_holds, warm_calendar, SlotTaken,
+)
+import audio
+from audio import ENCODING_ALIASES, OutputFormat
+from booking import BookingService
+from deepdub_pool import DeepdubPool
+from faq import FaqEntry, FaqIndex
+from hedge import Hedger
+from tts import build_tts_request, native_rate, synthesize
+from tts_cache import PcmCache, cache_key
+from pcm_ring import PcmRing, ReaderGone
+from prerender import PrerenderStore
+from segmenter import split_sentences, synthesize_segments
+from sessions import AdmissionController
+from metrics import (
+    HEDGE_TTFA_SECONDS, RING_ALLOCATED_BYTES, RING_PEAK_SECONDS, RING_STALL_SECONDS, RING_UNDERRUNS, STAGE_SECONDS, TTS_FAILURES, TTS_PCM_BYTES, TTS_REQUESTS,
+    FAQ_LOOKUP_SECONDS, TOOL_CALLS, TOOL_FAILURES, TOOL_SECONDS,
+    CallbackMetric, log, render_prometheus, setup_logging, stop_logging,
+)
+
+setup_logging()
 
 deepdub_api_key = os.getenv("DEEPDUB_API_KEY")
-DEEPDUB_WS_URL = "wss://wsapi.deepdub.ai/open"
-
-PORT = 8000  
-
-app = FastAPI()
-
-print(f"🚀 Server Starting on Port {PORT}...")
-
-def ffmpeg_wav_or_mp3_to_pcm16k(blob: bytes) -> bytes:
-    cmd = [
-        "ffmpeg",
-        "-hide_banner",
-        "-loglevel", "error",
-        "-i", "pipe:0",
-        "-f", "s16le",
-        "-acodec", "pcm_s16le",
-        "-ac", "1",
-        "-ar", "16000",
-        "pipe:1",
-    ]
-    p = subprocess.run(cmd, input=blob, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
-    if p.returncode != 0 or not p.stdout:
-        err = p.stderr.decode("utf-8", errors="ignore")
-        raise RuntimeError(f"ffmpeg failed: {err[:400]}")
-    return p.stdout
-
-def looks_like_wav(b: bytes) -> bool:
-    return len(b) >= 12 and b[0:4] == b"RIFF" and b[8:12] == b"WAVE"
+DEEPDUB_WS_URL = os.getenv("DEEPDUB_WS_URL", "wss://wsapi.deepdub.ai/open")
+
+# Pre-warmed WebSocket pool (0 = open a fresh connection per utterance)
+DEEPDUB_POOL_SIZE = int(os.getenv("DEEPDUB_POOL_SIZE", "4"))
+DEEPDUB_POOL_MAX_USES = int(os.getenv("DEEPDUB_POOL_MAX_USES", "200"))
+DEEPDUB_POOL_MAX_AGE = float(os.getenv("DEEPDUB_POOL_MAX_AGE", "600"))
+
+# PCM cache for repeated utterances
+TTS_CACHE_MEMORY_MB = int(os.getenv("TTS_CACHE_MEMORY_MB", "64"))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", ".tts_cache")
+TTS_CACHE_DISK_MB = int(os.getenv("TTS_CACHE_DISK_MB", "512"))
+CACHE_STREAM_SECONDS = 0.25  # cached audio is streamed in 250 ms pieces
+
+# Output format when the request doesn't name one (Vapi sends message.sampleRate; encoding is optional)
+TTS_SAMPLE_RATE = int(os.getenv("TTS_SAMPLE_RATE", "16000"))
+TTS_ENCODING = ENCODING_ALIASES.get(os.getenv("TTS_ENCODING", "linear16").lower(), "linear16")
+DEFAULT_OUTPUT_FORMAT = OutputFormat(TTS_SAMPLE_RATE, TTS_ENCODING)
+# Formats Vapi has actually asked /to-speech for, latest last: FAQ answers are pre-rendered in
+# each, and a /prerender that names no format uses the latest
+MAX_REQUESTED_FORMATS = 4
+requested_formats: "OrderedDict[OutputFormat, None]" = OrderedDict()
+
+# Speculative renders of known upcoming utterances (see /prerender)
+PRERENDER_TTL = float(os.getenv("PRERENDER_TTL", "180"))
+PRERENDER_MAX_MB = int(os.getenv("PRERENDER_MAX_MB", "32"))
+PRERENDER_CONCURRENCY = int(os.getenv("PRERENDER_CONCURRENCY", "4"))
+
+# Sentence-level pipelining: long replies are split and rendered concurrently, streamed in order
+TTS_PIPELINE = os.getenv("TTS_PIPELINE", "1") == "1"
+TTS_PIPELINE_MIN_CHARS = int(os.getenv("TTS_PIPELINE_MIN_CHARS", "60"))
+TTS_PIPELINE_PARALLELISM = int(os.getenv("TTS_PIPELINE_PARALLELISM", "3"))
+
+# Hedged requests: a live render with no audio after this long gets a second, racing request (0 = off)
+HEDGE_DELAY_MS = int(os.getenv("HEDGE_DELAY_MS", "0"))
+HEDGE_BUDGET_PER_MINUTE = int(os.getenv("HEDGE_BUDGET_PER_MINUTE", "30"))
+HEDGE_HOLDOUT = float(os.getenv("HEDGE_HOLDOUT", "0.05"))  # share never hedged, to measure the p99 gain against
+
+# Admission control for live syntheses (cache / prerender hits don't count)
+MAX_INFLIGHT_SYNTHESES = int(os.getenv("MAX_INFLIGHT_SYNTHESES", "64"))
+ADMISSION_TIMEOUT = float(os.getenv("ADMISSION_TIMEOUT", "2"))
+# A producer whose queue nobody drains for this long is treated as orphaned and cancelled
+ORPHAN_TIMEOUT = float(os.getenv("ORPHAN_TIMEOUT", "15"))
+
+# Live renders are re-framed through a per-stream ring buffer (see pcm_ring.py)
+TTS_FRAME_MS = int(os.getenv("TTS_FRAME_MS", "20"))
+TTS_JITTER_MS = int(os.getenv("TTS_JITTER_MS", "0"))          # buffered before the first frame goes out
+TTS_RING_SECONDS = float(os.getenv("TTS_RING_SECONDS", "1"))  # how far a render may run ahead of the client
+TTS_MAX_FRAMES_PER_WRITE = int(os.getenv("TTS_MAX_FRAMES_PER_WRITE", "10"))
+# Sent frames the transport may still be holding; writes never land there
+RING_GUARD_BYTES = 64 * 1024
+
+# Booking jobs: calendar inserts on a bounded thread pool, confirmation emails in the background
+BOOKING_WORKERS = int(os.getenv("BOOKING_WORKERS", "4"))
+BOOKING_MAX_ATTEMPTS = int(os.getenv("BOOKING_MAX_ATTEMPTS", "3"))
+
+# On shutdown, how long live renders may take to finish before the Deepdub pool is closed
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "20"))
+# A warm-up step still running after this long is reported as timed out and /ready goes up anyway
+WARMUP_STEP_TIMEOUT = float(os.getenv("WARMUP_STEP_TIMEOUT", "30"))
+
+# FAQ fast path: canonical answers from the product file, their audio rendered ahead of time
+FAQ_FILE = os.getenv("FAQ_FILE", "Alta_product_info.txt")
+FAQ_MIN_SCORE = float(os.getenv("FAQ_MIN_SCORE", "0.2"))
+FAQ_CHECK_INTERVAL = float(os.getenv("FAQ_CHECK_INTERVAL", "5"))  # seconds between mtime checks
+FAQ_PRESYNTH = os.getenv("FAQ_PRESYNTH", "1") == "1"
+
+# Shared secret for /admin/* and /prerender (unset = those endpoints are disabled)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+PORT = int(os.getenv("PORT", "8000"))
+
+deepdub_pool = DeepdubPool(
+    DEEPDUB_WS_URL,
+    deepdub_api_key,
+    size=DEEPDUB_POOL_SIZE,
+    max_uses=DEEPDUB_POOL_MAX_USES,
+    max_age=DEEPDUB_POOL_MAX_AGE,
+)
+
+pcm_cache = PcmCache(
+    TTS_CACHE_MEMORY_MB * 1024 * 1024,
+    disk_dir=Path(TTS_CACHE_DIR) if TTS_CACHE_DIR else None,
+    disk_budget=TTS_CACHE_DISK_MB * 1024 * 1024,
+)
+
+admission = AdmissionController(MAX_INFLIGHT_SYNTHESES, ADMISSION_TIMEOUT)
+
+booking_service = BookingService(
+    create_meeting_event,
+    send_confirmation_email,
+    confirmation_status,
+    calendar_workers=BOOKING_WORKERS,
+    max_attempts=BOOKING_MAX_ATTEMPTS,
+)
+
+
+hedger = Hedger(
+    HEDGE_DELAY_MS / 1000,
+    HEDGE_BUDGET_PER_MINUTE,
+    holdout=HEDGE_HOLDOUT,
+    on_first_audio=lambda seconds, group: HEDGE_TTFA_SECONDS.observe(seconds, group=group),
+) if HEDGE_DELAY_MS > 0 else None
+
+
+def synth(req: dict, t0: Optional[float], hedge: bool):
+    if hedge and hedger:
+        return hedger.stream(lambda: synthesize(deepdub_pool, req, t0))
+    return synthesize(deepdub_pool, req, t0)
+
+
+def render(req: dict, t0: Optional[float] = None, hedge: bool = False):
+    """
+    PCM for one utterance; multi-sentence texts go through the sentence pipeline.
+    `hedge` (live requests only) races a slow first request; in the pipeline only the first segment's.
+    """
+    text = req["targetText"]
+    segments = split_sentences(text) if TTS_PIPELINE and len(text) >= TTS_PIPELINE_MIN_CHARS else [text]
+    if len(segments) == 1:
+        return synth(req, t0, hedge)
+    log.info("✂️ pipelined synthesis | segments=%d parallelism=%d", len(segments), TTS_PIPELINE_PARALLELISM)
+    reqs = [{**req, "targetText": s} for s in segments]
+    return synthesize_segments(lambda r: synth(r, t0, hedge and r is reqs[0]), reqs, TTS_PIPELINE_PARALLELISM)
+
+
+prerender_store = PrerenderStore(
+    render,
+    ttl=PRERENDER_TTL,
+    max_bytes=PRERENDER_MAX_MB * 1024 * 1024,
+    concurrency=PRERENDER_CONCURRENCY,
+    # Finished renders also land in the PCM cache, whose disk tier every worker process shares
+    on_done=lambda key, req, pcm: pcm_cache.put(key, pcm, req["voicePromptId"], req["model"]),
+)
+
+
+def faq_answer_request(entry: FaqEntry, fmt: OutputFormat) -> dict:
+    return build_tts_request(entry.answer, fmt)
+
+
+def faq_formats() -> list[OutputFormat]:
+    return list(dict.fromkeys([DEFAULT_OUTPUT_FORMAT, *requested_formats]))
+
+
+def presynthesize_faq(entries: list[FaqEntry], formats: Optional[list[OutputFormat]] = None) -> None:
+    """
+    Renders every FAQ answer into the PCM cache, in the default format and every format
+    requested so far, unless it's already there (e.g. from another worker).
+    """
+    if not FAQ_PRESYNTH:
+        return
+    for fmt in formats or faq_formats():
+        queued = 0
+        for entry in entries:
+            req = faq_answer_request(entry, fmt)
+            key = cache_key(req)
+            if not pcm_cache.contains(key, req["voicePromptId"], req["model"]):
+                queued += prerender_store.submit(key, req)
+        log.info("📚 FAQ answers | entries=%d pre-rendering=%d format=%s", len(entries), queued, fmt)
+
+
+def note_requested_format(fmt: OutputFormat) -> None:
+    """Remembers a format /to-speech was asked for; the first time, its FAQ answers are pre-rendered."""
+    if fmt in requested_formats:
+        requested_formats.move_to_end(fmt)
+        return
+    requested_formats[fmt] = None
+    while len(requested_formats) > MAX_REQUESTED_FORMATS:
+        requested_formats.popitem(last=False)
+    if fmt != DEFAULT_OUTPUT_FORMAT:
+        log.info("🎚 new /to-speech format %s (default %s)", fmt, DEFAULT_OUTPUT_FORMAT)
+        presynthesize_faq(faq_index.entries, [fmt])
+
+
+faq_index = FaqIndex(FAQ_FILE, min_score=FAQ_MIN_SCORE, check_interval=FAQ_CHECK_INTERVAL,
+                     on_rebuild=presynthesize_faq)
+
+
+async def drain(timeout: float) -> None:
+    """Waits for live renders (and their cache writes) to finish before the Deepdub pool is closed."""
+    deadline = time.monotonic() + timeout
+    if admission.in_flight:
+        log.info("🛑 draining | live_renders=%d timeout=%.0fs", admission.in_flight, timeout)
+    while admission.in_flight and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    if admission.in_flight:
+        log.warning("⚠️ drain timed out | live_renders=%d cut off", admission.in_flight)
+
+
+# /ready answers 503 until warm_up() has run every step
+warmup_state = {"ready": False, "seconds": None, "steps": {}}
+
+
+async def warm_step(name: str, run) -> None:
+    t = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(run(), WARMUP_STEP_TIMEOUT)
+        status = "skipped" if result is False else "ok"
+    except asyncio.TimeoutError:
+        # A thread-backed step keeps running in the background; it just stops holding up /ready
+        log.warning("⚠️ warm-up step %s timed out after %.0fs", name, WARMUP_STEP_TIMEOUT)
+        status = "timeout"
+    except Exception as e:
+        # A failed step doesn't keep the instance out of rotation: everything it warms also works cold
+        log.warning("⚠️ warm-up step %s failed: %s", name, e)
+        status = "failed"
+    warmup_state["steps"][name] = {"status": status, "seconds": round(time.perf_counter() - t, 4)}
+
+
+async def warm_up() -> None:
+    """Readies what the first call would otherwise pay for, then flips /ready."""
+    t = time.perf_counter()
+    fmt = DEFAULT_OUTPUT_FORMAT
+    await asyncio.gather(
+        warm_step("deepdub_pool", deepdub_pool.start),
+        warm_step("audio_decoder", lambda: asyncio.to_thread(audio.warm_up, fmt, native_rate(fmt.sample_rate) or 48000)),
+        warm_step("outbox", lambda: asyncio.to_thread(get_outbox)),
+        warm_step("calendar", lambda: asyncio.to_thread(warm_calendar)),
+    )
+    async def load_faq():
+        # On the loop: a rebuild queues the answers' pre-renders
+        return faq_index.reload_if_changed()
+
+    # After the pool is up, so the FAQ answers are pre-rendered over warm connections
+    await warm_step("faq", load_faq)
+    warmup_state["seconds"] = round(time.perf_counter() - t, 4)
+    warmup_state["ready"] = True
+    log.info("✅ ready | warm-up %.0fms | %s", warmup_state["seconds"] * 1000,
+             " ".join(f"{name}={step['status']}" for name, step in warmup_state["steps"].items()))
+
+
+async def watch_faq() -> None:
+    """
+    Polls the FAQ file so an edit is indexed, and its answers pre-rendered, before the next
+    /faq-answer call rather than by it. On the loop: a rebuild queues the pre-renders.
+    """
+    while True:
+        await asyncio.sleep(FAQ_CHECK_INTERVAL)
+        try:
+            faq_index.reload_if_changed()
+        except Exception as e:
+            log.warning("⚠️ FAQ reload failed: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-up runs while the server already accepts connections; /ready tells the load balancer when it's done
+    warming = asyncio.create_task(warm_up())
+    faq_watcher = asyncio.create_task(watch_faq())
+    yield
+    faq_watcher.cancel()
+    if not warming.done():
+        warming.cancel()
+    await asyncio.gather(warming, faq_watcher, return_exceptions=True)
+    # uvicorn has already stopped accepting and let open responses finish (timeout_graceful_shutdown)
+    await drain(DRAIN_TIMEOUT)
+    await booking_service.close()
+    await asyncio.to_thread(close_outbox)
+    await prerender_store.close()
+    await deepdub_pool.close()
+    stop_logging()
+
+
+app = FastAPI(lifespan=lifespan)
+
+log.info("🚀 Server Starting on Port %d...", PORT)
+
+CallbackMetric("bridge_ready", "1 once start-up warm-up has finished", "gauge",
+               lambda: {"": int(warmup_state["ready"])})
+CallbackMetric("bridge_warmup_step_seconds", "Time each start-up warm-up step took", "gauge",
+               lambda: {name: step["seconds"] for name, step in warmup_state["steps"].items()}, "step")
+CallbackMetric("bridge_tts_sessions_total", "Live synthesis admissions and session outcomes", "counter",
+               lambda: dict(admission.stats), "event")
+CallbackMetric("bridge_tts_in_flight", "Live syntheses currently holding a slot", "gauge",
+               lambda: {"": admission.in_flight})
+CallbackMetric("bridge_deepdub_pool_events_total", "Deepdub connection pool events", "counter",
+               lambda: dict(deepdub_pool.stats), "event")
+CallbackMetric("bridge_tts_cache_events_total", "PCM cache events", "counter",
+               lambda: dict(pcm_cache.stats), "event")
+CallbackMetric("bridge_tts_cache_bytes", "PCM cache size per tier", "gauge",
+               lambda: {"memory": pcm_cache.snapshot()["memory_bytes"], "disk": pcm_cache.snapshot()["disk_bytes"]}, "tier")
+CallbackMetric("bridge_booking_events_total", "Booking job events", "counter",
+               lambda: dict(booking_service.stats), "event")
+CallbackMetric("bridge_faq_events_total", "FAQ index lookups and rebuilds", "counter",
+               lambda: dict(faq_index.stats), "event")
+CallbackMetric("bridge_prerender_events_total", "Speculative render events", "counter",
+               lambda: dict(prerender_store.stats), "event")
+if hedger:
+    CallbackMetric("bridge_tts_hedge_events_total", "Hedged Deepdub request events", "counter",
+                   lambda: dict(hedger.stats), "event")
+    CallbackMetric("bridge_tts_hedge_ratio", "Share of live renders hedged, and share of hedges that won", "gauge",
+                   lambda: {k: v for k, v in hedger.snapshot().items() if k in ("hedge_rate", "win_rate")}, "kind")
+    CallbackMetric("bridge_tts_hedge_p99_seconds", "p99 first-audio time of recent hedge-eligible vs. holdout renders",
+                   "gauge", lambda: hedger.p99(), "group")
+
+def check_admin(request: Request) -> Optional[Response]:
+    # Fails closed: the bridge sits on a public URL, and these endpoints expose leads and spend quota
+    if not ADMIN_TOKEN:
+        return Response(status_code=404)
+    if not secrets.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        return Response(status_code=401)
+    return None
+
+
+def output_format(payload: dict, default: OutputFormat = DEFAULT_OUTPUT_FORMAT) -> OutputFormat:
+    """The sample rate / encoding the caller asked for, falling back to `default`."""
+    msg = payload.get("message") or {}
+    rate = msg.get("sampleRate") or payload.get("sampleRate")
+    encoding = msg.get("encoding") or payload.get("encoding")
+    try:
+        rate = int(rate) if rate else default.sample_rate
+    except (TypeError, ValueError):
+        rate = default.sample_rate
+    if not 8000 <= rate <= 48000:
+        log.warning("⚠️ unsupported sampleRate=%s; using %d", rate, default.sample_rate)
+        rate = default.sample_rate
+    encoding = ENCODING_ALIASES.get(str(encoding).lower()) if encoding else None
+    return OutputFormat(rate, encoding or default.encoding)
+
+
+def new_ring(fmt: OutputFormat) -> PcmRing:
+    frame = max(1, fmt.bytes_per_second * TTS_FRAME_MS // 1000)
+    return PcmRing(
+        frame,
+        TTS_FRAME_MS / 1000,
+        capacity_frames=max(1, int(TTS_RING_SECONDS * 1000 / TTS_FRAME_MS)),
+        guard_frames=-(-RING_GUARD_BYTES // frame) + TTS_MAX_FRAMES_PER_WRITE,
+        jitter_frames=-(-TTS_JITTER_MS // TTS_FRAME_MS),
+        max_frames_per_read=TTS_MAX_FRAMES_PER_WRITE,
+    )
+
+
+async def stream_cached(pcm, fmt: OutputFormat):
+    step = int(fmt.bytes_per_second * CACHE_STREAM_SECONDS)
+    if isinstance(pcm, bytes):
+        view = memoryview(pcm)
+        for i in range(0, len(view), step):
+            yield view[i:i + step]
+        return
+    # A disk hit's mmap: each piece is copied out (the transport may still hold it after
+    # the map is closed), and the map is closed however the stream ends
+    try:
+        for i in range(0, len(pcm), step):
+            yield pcm[i:i + step]
+    finally:
+        pcm.close()
+
+
+async def timed(stream, t0: float, fmt: OutputFormat):
+    """Records first-byte / end-of-stream stages for streams that don't come from a live producer."""
+    sent = 0
+    async for chunk in stream:
+        if not sent:
+            STAGE_SECONDS.observe(time.perf_counter() - t0, stage="first_byte")
+        sent += len(chunk)
+        yield chunk
+    TTS_PCM_BYTES.inc(sent, format=fmt)
+    STAGE_SECONDS.observe(time.perf_counter() - t0, stage="stream_end")
+
 
 @app.post("/to-speech")
 async def to_speech(request: Request):
@@ -62,88 +408,109 @@ async def to_speech(request: Request):
     text = payload.get("text") or msg.get("text") or msg.get("content")
     if not text:
         return Response(status_code=200)
-
-    q: asyncio.Queue[Optional[bytes]] = asyncio.Queue(maxsize=400)
+    fmt = output_format(payload)
+    note_requested_format(fmt)
+    STAGE_SECONDS.observe(time.perf_counter() - t0, stage="parse")
+
+    req = build_tts_request(text, fmt)
+    key = cache_key(req)
+    cached = pcm_cache.get_memory(key)
+    if cached is None:
+        # The disk tier opens and maps a file: blocking I/O, so off the loop
+        lookup = (lambda: pcm_cache.get(key, req["voicePromptId"], req["model"]))
+        cached = await asyncio.to_thread(lookup) if pcm_cache.disk_dir else lookup()
+    if cached is not None:
+        log.info("💾 /to-speech cache hit | text_len=%d pcm=%d format=%s", len(text), len(cached), fmt)
+        TTS_REQUESTS.inc(source="cache")
+        return StreamingResponse(
+            timed(stream_cached(cached, fmt), t0, fmt),
+            media_type="application/octet-stream",
+            headers={"Cache-Control": "no-store"},
+        )
+
+    entry = prerender_store.get(key)
+    if entry is not None:
+        state = "ready" if entry.done else "in flight"
+        log.info("🔮 /to-speech prerender hit (%s) | text_len=%d pcm_so_far=%d", state, len(text), entry.nbytes)
+        TTS_REQUESTS.inc(source="prerender")
+        return StreamingResponse(
+            timed(entry.stream(), t0, fmt),
+            media_type="application/octet-stream",
+            headers={"Cache-Control": "no-store"},
+        )
+
+    session = await admission.admit()
+    if session is None:
+        log.warning("🚦 /to-speech rejected | in_flight=%d/%d", admission.in_flight, admission.max_in_flight)
+        TTS_REQUESTS.inc(source="rejected")
+        return Response(status_code=503, headers={"Retry-After": "1"})
+
+    TTS_REQUESTS.inc(source="live")
+    ring = new_ring(fmt)
 
     async def producer():
-        ws_chunks = 0
-        total_decoded = 0
-        total_pcm = 0
-        first = True
-
+        rendered = []
         try:
-            async with websockets.connect(
-                DEEPDUB_WS_URL,
-                additional_headers={"x-api-key": deepdub_api_key},
-                ping_interval=20,
-                ping_timeout=20,
-                max_size=None,
-            ) as ws:
-                req = {
-                    "action": "text-to-speech",
-                    "locale": "he-IL",
-                    "voicePromptId": "cd91dbf2-7265-420b-b8fd-9b90f2555d02_prompt-reading-neutral",
-                    "model": "dd-etts-3.0-preview",
-                    "targetText": text,
-                    "cleanAudio": True,
-                    "realTime": True
-                }
-
-                print(f"\n📨 /to-speech | text_len={len(text)}")
-                await ws.send(json.dumps(req))
-
-                while True:
-                    raw_msg = await ws.recv()
-                    msgj = json.loads(raw_msg)
-
-                    ws_chunks += 1
-                    idx = msgj.get("index")
-                    gid = msgj.get("generationId")
-                    is_finished = bool(msgj.get("isFinished"))
-                    b64 = msgj.get("data")
-
-                    print(f"📦 WS chunk | gid={gid} idx={idx} finished={is_finished} has_data={bool(b64)}")
-
-                    if b64:
-                        audio_bytes = base64.b64decode(b64)
-                        total_decoded += len(audio_bytes)
-
-                        if first:
-                            ttfa = (time.perf_counter() - t0) * 1000
-                            print(f"⚡ TTFA={ttfa:.1f}ms | first_size={len(audio_bytes)} bytes")
-                            print("🔎 ascii4:", audio_bytes[:4])
-                            print("🔎 first16(hex):", binascii.hexlify(audio_bytes[:16]).decode())
-                            first = False
-
-                        if looks_like_wav(audio_bytes):
-                            pcm = await asyncio.to_thread(ffmpeg_wav_or_mp3_to_pcm16k, audio_bytes)
-                            total_pcm += len(pcm)
-                            await q.put(pcm)
-                        else:
-                            print("⚠️ chunk not WAV; skipping (or handle separately)")
-
-                    if is_finished:
-                        break
-
-            t_total = (time.perf_counter() - t0) * 1000
-            print(f"🏁 WS done | chunks={ws_chunks} decoded={total_decoded} pcm={total_pcm} total_time={t_total:.1f}ms")
-
+            async for pcm in render(req, t0, hedge=True):
+                if not rendered:
+                    STAGE_SECONDS.observe(time.perf_counter() - t0, stage="first_chunk")
+                rendered.append(pcm)
+                # Backpressure: wait for the client, but not forever — a reader that never drains is gone
+                await ring.write(pcm, ORPHAN_TIMEOUT)
+        except ReaderGone:
+            # Only a stalled reader; render and pool timeouts are failures, below
+            log.warning("👻 producer orphaned | nobody read the stream for %.0fs", ORPHAN_TIMEOUT)
+            session.finish("orphaned")
+            ring.abort()
+            return
+        except asyncio.CancelledError:
+            session.finish("cancelled")
+            raise
         except Exception as e:
-            print(f"❌ producer error: {e}")
-        finally:
-            await q.put(None)
-
-    asyncio.create_task(producer())
+            log.error("❌ producer error: %s", e)
+            TTS_FAILURES.inc(stage="producer")
+            session.finish("failed")
+            ring.abort()
+            return
+        ring.close()
+        session.finish("completed")
+        # Only complete renders are cached; a cut-off stream would replay truncated audio.
+        # The stream is finished by now: a failed cache write mustn't touch it.
+        if rendered:
+            try:
+                await asyncio.to_thread(pcm_cache.put, key, b"".join(rendered), req["voicePromptId"], req["model"])
+            except Exception as e:
+                log.warning("⚠️ TTS cache write failed: %s", e)
+
+    task = asyncio.create_task(producer())
 
     async def stream_pcm():
         sent = 0
-        while True:
-            chunk = await q.get()
-            if chunk is None:
-                print(f"🏁 stream done | total_sent_pcm={sent}")
-                break
-            sent += len(chunk)
-            yield chunk
+        ended = False
+        try:
+            while True:
+                chunk = await ring.read()
+                if chunk is None:
+                    ended = True
+                    STAGE_SECONDS.observe(time.perf_counter() - t0, stage="stream_end")
+                    log.info("🏁 stream done | total_sent_pcm=%d frames=%d underruns=%d stalled=%.0fms peak=%.0fms ring=%dKiB",
+                             sent, ring.stats["frames"], ring.stats["underruns"], ring.stats["stalled_seconds"] * 1000,
+                             ring.stats["peak_bytes"] * 1000 / fmt.bytes_per_second, ring.stats["allocated_bytes"] // 1024)
+                    break
+                if not sent:
+                    STAGE_SECONDS.observe(time.perf_counter() - t0, stage="first_byte")
+                sent += len(chunk)
+                yield chunk
+        finally:
+            if not ended and not task.done():
+                # Client hung up or barged in: stop Deepdub and free the socket and buffers now
+                log.info("✋ stream cancelled | sent_pcm=%d", sent)
+                task.cancel()
+            TTS_PCM_BYTES.inc(sent, format=fmt)
+            RING_UNDERRUNS.inc(ring.stats["underruns"])
+            RING_STALL_SECONDS.inc(ring.stats["stalled_seconds"])
+            RING_PEAK_SECONDS.observe(ring.stats["peak_bytes"] / fmt.bytes_per_second)
+            RING_ALLOCATED_BYTES.observe(ring.stats["allocated_bytes"])
 
     return StreamingResponse(
         stream_pcm(),
@@ -152,63 +519,352 @@ async def to_speech(request: Request):
     )
 
 
+@app.post("/prerender")
+async def prerender(request: Request):
+    """
+    Called by the dialer when it starts a call, with utterances it already knows
+    (e.g. the personalised first message): {"texts": ["...", ...]}, optionally with the
+    "sampleRate" / "encoding" the call's /to-speech requests will use. Without them the
+    format Vapi last asked /to-speech for is used, or the default before any request.
+    """
+    denied = check_admin(request)
+    if denied:
+        return denied
+    payload = await request.json()
+    texts = payload.get("texts") or ([payload["text"]] if payload.get("text") else [])
+    fmt = output_format(payload, next(reversed(requested_formats), DEFAULT_OUTPUT_FORMAT))
+
+    queued = 0
+    for text in texts:
+        req = build_tts_request(text, fmt)
+        key = cache_key(req)
+        if pcm_cache.contains(key, req["voicePromptId"], req["model"]):
+            continue
+        queued += prerender_store.submit(key, req)
+
+    log.info("🔮 /prerender | texts=%d queued=%d format=%s", len(texts), queued, fmt)
+    return {"queued": queued, **prerender_store.snapshot()}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until warm-up has finished, so new instances get traffic only once they're warm."""
+    return Response(
+        json.dumps(warmup_state),
+        status_code=200 if warmup_state["ready"] else 503,
+        media_type="application/json",
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/admin/tts-cache")
+async def tts_cache_stats(request: Request):
+    denied = check_admin(request)
+    if denied:
+        return denied
+    return pcm_cache.snapshot()
+
+
+@app.get("/admin/sessions")
+async def sessions_stats(request: Request):
+    denied = check_admin(request)
+    if denied:
+        return denied
+    return {
+        "admission": admission.snapshot(),
+        "deepdub_pool": deepdub_pool.stats,
+        "prerender": prerender_store.snapshot(),
+        "hedging": hedger.snapshot() if hedger else None,
+    }
+
+
+@app.post("/admin/tts-cache/invalidate")
+async def tts_cache_invalidate(request: Request):
+    """Body: {"voicePromptId": ..., "model": ...} — both optional; an empty body clears everything."""
+    denied = check_admin(request)
+    if denied:
+        return denied
+    body = await request.json() if await request.body() else {}
+    removed = await asyncio.to_thread(pcm_cache.invalidate, body.get("voicePromptId"), body.get("model"))
+    log.info("🧹 TTS cache invalidated | voice=%s model=%s removed=%d", body.get("voicePromptId"), body.get("model"), removed)
+    return {"removed": removed}
+
+
+def vapi_call_id(data: dict) -> Optional[str]:
+    """The Vapi call a tool request belongs to; slot holds are keyed by it."""
+    call = (data.get('message') or {}).get('call') or {}
+    return call.get('id')
+
+
+ToolCall = tuple[Optional[str], Optional[dict]]
+
+
+def parse_tool_calls(data: dict) -> Optional[list[ToolCall]]:
+    """(toolCallId, arguments) for every call in a Vapi tool-calls message; arguments is None for a malformed call."""
+    try:
+        raw = data['message']['toolCalls']
+    except (KeyError, TypeError):
+        return None
+    if not isinstance(raw, list) or not raw:
+        return None
+    calls = []
+    for call in raw:
+        try:
+            args = call['function']['arguments']
+            calls.append((call['id'], args if isinstance(args, dict) else None))
+        except (KeyError, TypeError):
+            calls.append((call.get('id') if isinstance(call, dict) else None, None))
+    return calls
+
+
+async def run_tool_calls(tool: str, calls: list[ToolCall], handle, key) -> list[dict]:
+    """
+    Runs `handle(args)` (a coroutine returning the result text) for all calls concurrently.
+    Calls with the same `key(args)` share one run. One result per toolCallId, in the order the calls came in.
+    """
+    runs: dict = {}
+    jobs = []
+    for call_id, args in calls:
+        if args is None:
+            jobs.append((call_id, None))
+            continue
+        try:
+            k = key(args)
+            hash(k)
+        except Exception:
+            # Arguments too odd to compare (e.g. a list where a string belongs): a run of its own
+            k = ("call", call_id)
+        if k not in runs:
+            runs[k] = asyncio.ensure_future(handle(args))
+        jobs.append((call_id, runs[k]))
+    if runs:
+        await asyncio.wait(runs.values())
+    if len(calls) > 1:
+        log.info("🧰 %s batch | calls=%d runs=%d", tool, len(calls), len(runs))
+
+    results = []
+    for call_id, run in jobs:
+        if run is None:
+            log.error("❌ Error parsing tool arguments")
+            TOOL_FAILURES.inc(tool=tool)
+            result_text = "Error parsing input"
+        elif run.exception() is not None:
+            # One failing call doesn't take the rest of the batch down with it
+            log.error("❌ %s error: %s", tool, run.exception())
+            TOOL_FAILURES.inc(tool=tool)
+            result_text = "Error processing request"
+        else:
+            result_text = run.result()
+        results.append({"toolCallId": call_id, "result": result_text} if call_id else {"result": result_text})
+    return results
+
+
 @app.post("/check-availability")
 async def check_availability_tool(request: Request):
+    t_start = time.perf_counter()
     data = await request.json()
-    print(f"\n📅 Tool Call: Check Availability | Payload: {data}") 
-    
-    try:
-        tool_call = data['message']['toolCalls'][0]
-        args = tool_call['function']['arguments']
-    except (KeyError, IndexError, TypeError):
-        print("❌ Error parsing tool arguments")
-        return {"results": [{"result": "Error parsing input"}]}
+    log.info("📅 Tool Call: Check Availability | Payload: %s", data)
 
-    requested_date = args.get('date')
-    slots = get_available_slots(requested_date)
-    
-    result_text = f"השעות הפנויות ב-{requested_date} הן: {', '.join(slots)}"
-    print(f"✅ Result: {result_text}")
+    calls = parse_tool_calls(data)
+    if calls is None:
+        log.error("❌ Error parsing tool arguments")
+        TOOL_FAILURES.inc(tool="check_availability")
+        return {"results": [{"result": "Error parsing input"}]}
+    TOOL_CALLS.inc(len(calls), tool="check_availability")
+    owner = vapi_call_id(data)
+
+    async def check(args: dict) -> str:
+        requested_date = args.get('date')
+        if parse_date(requested_date) is None:
+            # Not "no free slots": the model re-asks (or resends the date in the right format)
+            log.info("❓ Unparseable date | %r", requested_date)
+            TOOL_FAILURES.inc(tool="check_availability")
+            return "לא הצלחתי להבין את התאריך. אפשר לחזור עליו? (פורמט: YYYY-MM-DD)"
+        # Served from the in-memory index; only a cold day or a due sync touches the calendar API
+        slots = await asyncio.to_thread(get_available_slots, requested_date, owner)
+        if slots:
+            result_text = f"השעות הפנויות ב-{requested_date} הן: {', '.join(slots)}"
+        else:
+            result_text = f"אין שעות פנויות ב-{requested_date}."
+        log.info("✅ Result: %s", result_text)
+        return result_text
+
+    # Keyed by parsed day, or the raw value as text: the model may send anything, even a list
+    day_key = lambda a: parse_date(a.get('date')) or str(a.get('date'))
+    dates = {str(args.get('date')) for _, args in calls if args}
+    if len(dates) > 1:
+        # Several dates in one message: one calendar query for all of them, not one per cold day
+        try:
+            await asyncio.to_thread(prefetch_availability, dates)
+        except Exception as e:
+            # Each check still loads its own day below
+            log.warning("⚠️ availability prefetch failed, checking day by day: %s", e)
+    # The same date asked twice is one lookup (and one set of held slots)
+    results = await run_tool_calls("check_availability", calls, check, key=day_key)
+    TOOL_SECONDS.observe(time.perf_counter() - t_start, tool="check_availability")
 
-    return {
-        "results": [
-            {
-                "toolCallId": tool_call['id'],
-                "result": result_text
-            }
-        ]
-    }
+    return {"results": results}
 
 
 @app.post("/book-meeting")
 async def book_meeting_tool(request: Request):
+    t_start = time.perf_counter()
     data = await request.json()
-    print(f"\n📝 Tool Call: Book Meeting | Payload: {data}")
-    
-    try:
-        tool_call = data['message']['toolCalls'][0]
-        args = tool_call['function']['arguments']
-    except (KeyError, IndexError, TypeError):
-        print("❌ Error parsing tool arguments")
-        return {"results": [{"result": "Error parsing input"}]}
+    log.info("📝 Tool Call: Book Meeting | Payload: %s", data)
 
-    result = book_meeting(
-        date_str=args.get('date'),
-        time_str=args.get('time'),
-        customer_email=args.get('email'), 
-        customer_name=args.get('name', "Customer") 
-    )
-    
-    print(f"✅ Booking Result: {result}")
+    calls = parse_tool_calls(data)
+    if calls is None:
+        log.error("❌ Error parsing tool arguments")
+        TOOL_FAILURES.inc(tool="book_meeting")
+        return {"results": [{"result": "Error parsing input"}]}
+    TOOL_CALLS.inc(len(calls), tool="book_meeting")
+    owner = vapi_call_id(data) or "anonymous"
+
+    async def book(args: dict) -> str:
+        interval = meeting_interval(args.get('date'), args.get('time'))
+        if interval is None:
+            TOOL_FAILURES.inc(tool="book_meeting")
+            return "לא הצלחתי להבין את המועד. אפשר לחזור על התאריך והשעה?"
+        if not slot_holds.commit(owner, *interval):
+            # Another call booked (or is holding) this slot in the meantime
+            log.info("⛔ Slot taken | %s %s", args.get('date'), args.get('time'))
+            TOOL_FAILURES.inc(tool="book_meeting")
+            return "המועד הזה נתפס הרגע. אפשר לבדוק שוב את השעות הפנויות ולבחור מועד אחר?"
+        job = await booking_service.book(
+            date_str=args.get('date'),
+            time_str=args.get('time'),
+            email=args.get('email'),
+            name=args.get('name', "Customer"),
+            owner=owner,
+        )
+
+        log.info("✅ Booking Result: %s | job=%s attempts=%d", job.status, job.id, job.calendar_attempts)
+        if job.status == "failed":
+            slot_holds.rollback(*interval)
+            TOOL_FAILURES.inc(tool="book_meeting")
+            if isinstance(job.failure, SlotTaken):
+                # Booked through another worker (or straight in the calendar) since it was offered
+                log.info("⛔ Slot busy in calendar | %s %s", args.get('date'), args.get('time'))
+                return "המועד הזה נתפס הרגע. אפשר לבדוק שוב את השעות הפנויות ולבחור מועד אחר?"
+            return "מצטערת, לא הצלחתי לקבוע את הפגישה ביומן כרגע. נציג יחזור אליך לתיאום."
+        return "הפגישה נקבעה בהצלחה ביומן, ושלחתי לך מייל אישור עם הפרטים."
+
+    # A repeated call for the same meeting books it once
+    results = await run_tool_calls("book_meeting", calls, book,
+                                   key=lambda a: (meeting_interval(a.get('date'), a.get('time')), a.get('email')))
+    TOOL_SECONDS.observe(time.perf_counter() - t_start, tool="book_meeting")
+
+    return {"results": results}
+
+
+@app.post("/faq-answer")
+async def faq_answer_tool(request: Request):
+    t_start = time.perf_counter()
+    data = await request.json()
+    log.info("📚 Tool Call: FAQ Answer | Payload: %s", data)
 
-    return {
-        "results": [
-            {
-                "toolCallId": tool_call['id'],
-                "result": "הפגישה נקבעה בהצלחה ביומן, ושלחתי לך מייל אישור עם הפרטים."
-            }
-        ]
-    }
+    calls = parse_tool_calls(data)
+    if calls is None:
+        log.error("❌ Error parsing tool arguments")
+        TOOL_FAILURES.inc(tool="faq_answer")
+        return {"results": [{"result": "Error parsing input"}]}
+    TOOL_CALLS.inc(len(calls), tool="faq_answer")
+
+    async def answer(args: dict) -> str:
+        t_lookup = time.perf_counter()
+        match = faq_index.lookup(args.get('question') or "")
+        FAQ_LOOKUP_SECONDS.observe(time.perf_counter() - t_lookup)
+        if match is None:
+            # Not a known question: the model answers it from the prompt as before
+            result_text = "אין תשובה מוכנה לשאלה הזו."
+        else:
+            # Returned word for word, so the spoken answer is the one already rendered into the TTS cache
+            result_text = match.entry.answer
+        log.info("✅ FAQ Result: score=%s | %s", f"{match.score:.2f}" if match else None, result_text)
+        return result_text
+
+    results = await run_tool_calls("faq_answer", calls, answer, key=lambda a: a.get('question'))
+    TOOL_SECONDS.observe(time.perf_counter() - t_start, tool="faq_answer")
+
+    return {"results": results}
+
+
+@app.get("/admin/faq")
+async def faq_stats(request: Request):
+    denied = check_admin(request)
+    if denied:
+        return denied
+    entries = faq_index.entries
+    cached = await asyncio.to_thread(lambda: {
+        str(fmt): sum(pcm_cache.contains(cache_key(r), r["voicePromptId"], r["model"])
+                      for r in (faq_answer_request(e, fmt) for e in entries))
+        for fmt in faq_formats()
+    })
+    return {**faq_index.snapshot(), "answers_cached": cached}
+
+
+@app.get("/admin/bookings")
+async def bookings_stats(request: Request):
+    denied = check_admin(request)
+    if denied:
+        return denied
+    return booking_service.snapshot()
+
+
+@app.get("/admin/slot-holds")
+async def slot_holds_stats(request: Request):
+    denied = check_admin(request)
+    if denied:
+        return denied
+    return slot_holds.snapshot()
+
+
+@app.get("/admin/outbox")
+async def outbox_stats(request: Request):
+    denied = check_admin(request)
+    if denied:
+        return denied
+    return await asyncio.to_thread(lambda: get_outbox().snapshot())
+
+
+@app.get("/admin/bookings/{job_id}")
+async def booking_status(job_id: str, request: Request):
+    denied = check_admin(request)
+    if denied:
+        return denied
+    job = booking_service.get(job_id)
+    if job is None:
+        return Response(status_code=404)
+    return await asyncio.to_thread(booking_service.describe, job)
+
+
+@app.post("/admin/bookings/{job_id}/retry")
+async def booking_retry(job_id: str, request: Request):
+    denied = check_admin(request)
+    if denied:
+        return denied
+    job = booking_service.get(job_id)
+    if job is None:
+        return Response(status_code=404)
+    interval = meeting_interval(job.date_str, job.time_str) if job.status == "failed" else None
+    # The failed booking's commit was rolled back; take the slot again before re-inserting
+    if interval and not slot_holds.commit(job.owner, *interval):
+        log.info("⛔ Retry of %s refused: slot taken by another call | %s %s", job.id, job.date_str, job.time_str)
+        return Response(json.dumps({**job.to_dict(), "error": "slot taken"}), status_code=409,
+                        media_type="application/json")
+    await booking_service.retry(job_id)
+    if interval and job.status == "failed":
+        slot_holds.rollback(*interval)
+        if isinstance(job.failure, SlotTaken):
+            return Response(json.dumps({**job.to_dict(), "error": "slot taken"}), status_code=409,
+                            media_type="application/json")
+    return await asyncio.to_thread(booking_service.describe, job)
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=PORT)
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""
+Admission control and lifecycle accounting for live Deepdub syntheses.
+
+Every live render holds a slot from a global budget until its producer
+finishes, so a burst of calls (or a pile of abandoned streams) can't open an
+unbounded number of Deepdub sockets. Each session ends with exactly one
+outcome, which feeds the counters:
+
+  completed  the render finished and was handed to the client
+  cancelled  the client went away mid-stream (hang-up / barge-in)
+  orphaned   nobody was reading the stream and the producer gave up
+  failed     Deepdub / decoding error
+"""
+import asyncio
+from typing import Optional
+
+OUTCOMES = ("completed", "cancelled", "orphaned", "failed")
+
+
+class SynthesisSession:
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self.outcome: Optional[str] = None
+
+    def finish(self, outcome: str) -> None:
+        """Releases the slot; only the first call counts."""
+        if self.outcome is not None:
+            return
+        self.outcome = outcome
+        self._controller._release(outcome)
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight: int, wait_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.wait_timeout = wait_timeout
+        self._sem = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.stats = {"admitted": 0, "rejected": 0, **{o: 0 for o in OUTCOMES}}
+
+    async def admit(self) -> Optional[SynthesisSession]:
+        """Waits up to `wait_timeout` for a slot. Returns None when the budget is exhausted."""
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            self.stats["rejected"] += 1
+            return None
+        self.in_flight += 1
+        self.stats["admitted"] += 1
+        return SynthesisSession(self)
+
+    def _release(self, outcome: str) -> None:
+        self.in_flight -= 1
+        self.stats[outcome] += 1
+        self._sem.release()
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "in_flight": self.in_flight, "max_in_flight": self.max_in_flight}
@@ -0,0 +1,138 @@
+"""
+In-process slot reservations, so simultaneous calls don't double-book.
+
+When availability is read out to a lead, the offered slots are held for that
+call for `ttl` seconds; other calls are offered different slots until the
+hold expires or the call books. Booking commits the slot atomically: it fails
+if another call already committed an overlapping slot or still holds one.
+
+State is kept per day, each day with its own lock, so callers looking at
+different days never wait on each other.
+"""
+import bisect
+import datetime
+import threading
+import time
+from typing import Callable, Optional
+
+Interval = tuple[datetime.datetime, datetime.datetime]
+
+
+class _Hold:
+    __slots__ = ("owner", "start", "end", "expires_at")
+
+    def __init__(self, owner: str, start: datetime.datetime, end: datetime.datetime, expires_at: float):
+        self.owner, self.start, self.end, self.expires_at = owner, start, end, expires_at
+
+
+class _DayBook:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.holds: list[_Hold] = []
+        # Sorted by start; committed slots don't overlap each other
+        self.committed: list[Interval] = []
+
+    def purge(self, now: float) -> int:
+        before = len(self.holds)
+        self.holds = [h for h in self.holds if h.expires_at > now]
+        return before - len(self.holds)
+
+    def committed_overlap(self, start: datetime.datetime, end: datetime.datetime) -> bool:
+        i = bisect.bisect_left(self.committed, (end,))
+        return i > 0 and self.committed[i - 1][1] > start
+
+    def held_by_other(self, owner: str, start: datetime.datetime, end: datetime.datetime) -> bool:
+        return any(h.owner != owner and h.start < end and h.end > start for h in self.holds)
+
+
+class SlotHolds:
+    def __init__(self, ttl: float = 120.0):
+        self.ttl = ttl
+        self._days: dict[datetime.date, _DayBook] = {}
+        self._days_lock = threading.Lock()
+        self.stats = {"offered": 0, "held": 0, "expired": 0, "committed": 0, "conflicts": 0, "released": 0}
+
+    def _book(self, day: datetime.date) -> _DayBook:
+        book = self._days.get(day)
+        if book is None:
+            with self._days_lock:
+                book = self._days.setdefault(day, _DayBook())
+        return book
+
+    def offer(
+        self,
+        owner: str,
+        candidates: list[datetime.datetime],
+        duration: datetime.timedelta,
+        select: Callable[[list[datetime.datetime]], list[datetime.datetime]] = lambda free: free,
+    ) -> list[datetime.datetime]:
+        """
+        Filters `candidates` (slot starts on one day) down to those nobody else holds or
+        booked, lets `select` choose which to offer, and holds those for `owner`.
+        The owner's earlier holds on that day are replaced.
+        """
+        if not candidates:
+            return []
+        book = self._book(candidates[0].date())
+        now = time.monotonic()
+        with book.lock:
+            self.stats["expired"] += book.purge(now)
+            book.holds = [h for h in book.holds if h.owner != owner]
+            free = [
+                s for s in candidates
+                if not book.committed_overlap(s, s + duration) and not book.held_by_other(owner, s, s + duration)
+            ]
+            chosen = select(free)
+            book.holds.extend(_Hold(owner, s, s + duration, now + self.ttl) for s in chosen)
+        self.stats["offered"] += 1
+        self.stats["held"] += len(chosen)
+        return chosen
+
+    def commit(self, owner: str, start: datetime.datetime, end: datetime.datetime) -> bool:
+        """Atomically books [start, end) for `owner`. False if it overlaps another call's hold or booking."""
+        book = self._book(start.date())
+        with book.lock:
+            self.stats["expired"] += book.purge(time.monotonic())
+            if book.committed_overlap(start, end) or book.held_by_other(owner, start, end):
+                self.stats["conflicts"] += 1
+                return False
+            bisect.insort(book.committed, (start, end))
+            # The call picked its slot; its other holds on that day are no longer needed
+            book.holds = [h for h in book.holds if h.owner != owner]
+        self.stats["committed"] += 1
+        return True
+
+    def rollback(self, start: datetime.datetime, end: datetime.datetime) -> None:
+        """Undoes a commit whose calendar insert failed."""
+        book = self._book(start.date())
+        with book.lock:
+            if (start, end) in book.committed:
+                book.committed.remove((start, end))
+
+    def release(self, owner: str) -> None:
+        """Drops every hold of a call (e.g. when it ends without booking)."""
+        with self._days_lock:
+            books = list(self._days.values())
+        for book in books:
+            with book.lock:
+                before = len(book.holds)
+                book.holds = [h for h in book.holds if h.owner != owner]
+                self.stats["released"] += before - len(book.holds)
+
+    def prune(self, today: Optional[datetime.date] = None) -> None:
+        """Forgets days that are over."""
+        today = today or datetime.date.today()
+        with self._days_lock:
+            for day in [d for d in self._days if d < today]:
+                del self._days[day]
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._days_lock:
+            books = list(self._days.values())
+        return {
+            **self.stats,
+            "days": len(books),
+            "active_holds": sum(1 for b in books for h in b.holds if h.expires_at > now),
+            "committed_slots": sum(len(b.committed) for b in books),
+        }
@@ -1,28 +1,55 @@
 import os.path
 import datetime
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import os
-from dotenv import load_dotenv
-from pathlib import Path
+import threading
 
-# Google APIs
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from config import load_env
 
 # --- Configuration ---
-env_path = Path('.') / '.env'
-load_dotenv(dotenv_path=env_path)
+# Loaded before availability is imported, which reads its settings at import time
+load_env()
+
+# The Google API client, OAuth flow and SMTP libraries are imported on first use,
+# so importing this module (and the server) stays cheap
+from availability import SLOT_MINUTES, WORK_TZ, AvailabilityEngine, GoogleCalendarBackend
+from slot_holds import SlotHolds
 
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")  
 EMAIL_APP_PASSWORD = os.getenv("EMAIL_APP_PASSWORD")
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
-def get_calendar_service():
-    """Handles Google authentication and returns the Calendar service."""
+# Confirmation emails go through a persistent outbox with pooled SMTP sessions
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+OUTBOX_DB = os.getenv("OUTBOX_DB", "outbox.sqlite3")
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+# How many free slots the agent reads out per availability check
+MAX_OFFERED_SLOTS = int(os.getenv("MAX_OFFERED_SLOTS", "3"))
+# Offered slots are held for the call this long, so parallel calls are offered other times
+SLOT_HOLD_TTL = float(os.getenv("SLOT_HOLD_TTL", "120"))
+SLOT_DURATION = datetime.timedelta(minutes=SLOT_MINUTES)
+
+slot_holds = SlotHolds(SLOT_HOLD_TTL)
+
+_engine = None
+_engine_lock = threading.Lock()
+_calendar = None
+_calendar_lock = threading.Lock()
+_outbox = None
+_outbox_lock = threading.Lock()
+
+def save_token(creds):
+    with open('token.json', 'w') as token:
+        token.write(creds.to_json())
+
+def load_credentials():
+    """Handles Google authentication and returns valid credentials."""
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
     creds = None
     # The file token.json stores the user's access and refresh tokens
     if os.path.exists('token.json'):
@@ -39,106 +66,228 @@ def get_calendar_service():
             creds = flow.run_local_server(port=0)
         
         # Save the credentials for the next run
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
+        save_token(creds)
+
+    return creds
+
+def get_calendar_client():
+    """The process-wide Calendar client, built on first use; its token is refreshed in the background."""
+    global _calendar
+    if _calendar is None:
+        with _calendar_lock:
+            if _calendar is None:
+                from calendar_client import CalendarClient
+
+                client = CalendarClient(load_credentials(), on_refresh=save_token)
+                client.start()
+                _calendar = client
+    return _calendar
+
+def get_calendar_service():
+    """Returns the shared Calendar service (safe to use from any thread)."""
+    return get_calendar_client().service
+
+def get_availability_engine():
+    """The process-wide availability index, built on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AvailabilityEngine(GoogleCalendarBackend(get_calendar_service))
+    return _engine
+
+def parse_date(date_str):
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.datetime.strptime(date_str, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def meeting_interval(date_str, time_str):
+    """Start and end of a meeting as timezone-aware datetimes, or None if unparseable."""
+    day = parse_date(date_str)
+    try:
+        start_time = datetime.datetime.strptime(time_str, "%H:%M").time()
+    except (TypeError, ValueError):
+        return None
+    if day is None:
+        return None
+    start = datetime.datetime.combine(day, start_time, WORK_TZ)
+    return start, start + SLOT_DURATION
 
-    return build('calendar', 'v3', credentials=creds)
+def spread_slots(slots):
+    """Picks up to MAX_OFFERED_SLOTS slots spread across the day."""
+    if len(slots) > MAX_OFFERED_SLOTS > 1:
+        step = (len(slots) - 1) / (MAX_OFFERED_SLOTS - 1)
+        return [slots[round(i * step)] for i in range(MAX_OFFERED_SLOTS)]
+    return slots[:MAX_OFFERED_SLOTS]
 
-def get_available_slots(date_str):
+def get_available_slots(date_str, owner=None):
     """
-    Checks availability (Currently static, can be upgraded to real logic).
+    Returns up to MAX_OFFERED_SLOTS free 45-minute slots ("HH:MM") on the given date,
+    spread across the day, and holds them for `owner` (the Vapi call id).
     """
     print(f"[Tool] Checking availability for: {date_str}")
-    # Future upgrade: Use service.events().list to check for conflicts
-    return ["10:00", "14:00", "16:30"]
+    day = parse_date(date_str)
+    if day is None:
+        print(f"[Tool] Unrecognised date: {date_str!r}")
+        return []
 
-def book_meeting(date_str, time_str, customer_email, customer_name="Customer"):
+    slot_holds.prune()
+    free = get_availability_engine().free_slots(day)
+    slots = slot_holds.offer(owner or "anonymous", free, SLOT_DURATION, select=spread_slots)
+    return [s.strftime("%H:%M") for s in slots]
+
+def prefetch_availability(date_strs):
+    """Loads the calendar for several dates with one query, so a batch of checks doesn't fetch day by day."""
+    days = {day for day in map(parse_date, date_strs) if day is not None}
+    if days:
+        get_availability_engine().prefetch(days)
+
+def warm_calendar():
+    """
+    Builds the Calendar client and loads the next two weeks of availability.
+    Returns False (doing nothing) unless token.json holds credentials usable without a
+    login: the login is interactive and would block warm-up forever.
     """
-    Creates a Google Calendar event and sends a confirmation email.
+    if not os.path.exists('token.json'):
+        return False
+    from google.oauth2.credentials import Credentials
+
+    creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+    if not (creds.valid or (creds.expired and creds.refresh_token)):
+        print("[Calendar] token.json can't be refreshed; log in interactively once to recreate it")
+        return False
+    get_availability_engine().prefetch([datetime.date.today()])
+    return True
+
+class SlotTaken(Exception):
+    """The calendar already has something in the requested slot."""
+
+def _existing_event_link(service, event_id):
+    """The link of our own event `event_id` if a previous attempt already created it, else None."""
+    try:
+        return service.events().get(calendarId='primary', eventId=event_id).execute().get('htmlLink')
+    except Exception as e:
+        if getattr(getattr(e, "resp", None), "status", None) in (404, 410):
+            return None
+        raise
+
+
+def create_meeting_event(date_str, time_str, customer_email, customer_name="Customer", event_id=None):
+    """
+    Creates the Google Calendar event and returns its link. Raises on failure,
+    SlotTaken if the calendar is no longer free at that time.
+
+    With `event_id` (lowercase a-v and digits, 5-1024 chars) the insert is idempotent: a retry
+    after an attempt that timed out but went through finds that event instead of creating a
+    second one and sending a second invite.
     """
     print(f"[Tool] Booking meeting for {customer_name} at {date_str} {time_str}")
-    
+    service = get_calendar_service()
+
+    # Calculate end time (assuming 45 minutes duration)
     try:
-        # 1. Create Google Calendar Event
-        service = get_calendar_service()
-        
-        # Format date and time for Google (ISO format)
-        # Assuming input is YYYY-MM-DD and HH:MM
-        start_datetime_str = f"{date_str}T{time_str}:00"
-        
-        # Calculate end time (assuming 45 minutes duration)
-        try:
-            start_dt = datetime.datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
-        except ValueError:
-            # Fallback for different date formats if necessary
-             start_dt = datetime.datetime.strptime(f"{date_str} {time_str}", "%d/%m/%Y %H:%M")
-
-        end_dt = start_dt + datetime.timedelta(minutes=45)
-        end_datetime_str = end_dt.strftime("%Y-%m-%dT%H:%M:%00")
-
-        # Event details (Hebrew content as requested)
-        event = {
-            'summary': f'פגישת היכרות - Alta AI עם {customer_name}',
-            'location': 'Zoom Meeting',
-            'description': f'פגישת דמו עם קטי.\nפרטי לקוח: {customer_name} ({customer_email})',
-            'start': {
-                'dateTime': start_datetime_str,
-                'timeZone': 'Asia/Jerusalem',
-            },
-            'end': {
-                'dateTime': end_datetime_str,
-                'timeZone': 'Asia/Jerusalem',
-            },
-            'attendees': [
-                {'email': customer_email},
-                {'email': SENDER_EMAIL},
-            ],
-        }
+        start_dt = datetime.datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+    except ValueError:
+        # Fallback for different date formats if necessary
+         start_dt = datetime.datetime.strptime(f"{date_str} {time_str}", "%d/%m/%Y %H:%M")
 
-        created_event = service.events().insert(calendarId='primary', body=event).execute()
-        calendar_link = created_event.get('htmlLink')
-        print(f"[Google Calendar] Event created: {calendar_link}")
+    end_dt = start_dt + datetime.timedelta(minutes=45)
 
-        # 2. Send Confirmation Email
-        send_confirmation_email(customer_email, customer_name, f"{date_str} at {time_str}", calendar_link)
+    # Slot holds are per process: a call whose tool requests reach another worker is only
+    # kept from double-booking by asking the calendar itself, right before the insert
+    engine = get_availability_engine()
+    if engine.backend.freebusy(start_dt.replace(tzinfo=WORK_TZ), end_dt.replace(tzinfo=WORK_TZ)):
+        # Busy may be our own event, from an earlier attempt whose response was lost
+        calendar_link = event_id and _existing_event_link(service, event_id)
+        if calendar_link:
+            print(f"[Google Calendar] Event already created: {calendar_link}")
+            return calendar_link
+        print(f"[Tool] Slot {date_str} {time_str} is already busy in the calendar")
+        raise SlotTaken(f"{date_str} {time_str} is no longer free")
 
-        return {"status": "success", "message": "Meeting booked and email sent."}
+    # Event details (Hebrew content as requested)
+    event = {
+        'summary': f'פגישת היכרות - Alta AI עם {customer_name}',
+        'location': 'Zoom Meeting',
+        'description': f'פגישת דמו עם קטי.\nפרטי לקוח: {customer_name} ({customer_email})',
+        'start': {
+            'dateTime': start_dt.strftime("%Y-%m-%dT%H:%M:%S"),
+            'timeZone': 'Asia/Jerusalem',
+        },
+        'end': {
+            'dateTime': end_dt.strftime("%Y-%m-%dT%H:%M:%S"),
+            'timeZone': 'Asia/Jerusalem',
+        },
+        'attendees': [
+            {'email': customer_email},
+            {'email': SENDER_EMAIL},
+        ],
+    }
+    if event_id:
+        event['id'] = event_id
 
+    try:
+        created_event = service.events().insert(calendarId='primary', body=event).execute()
+    except Exception as e:
+        # 409: the id exists, i.e. an earlier attempt's insert went through
+        if not event_id or getattr(getattr(e, "resp", None), "status", None) != 409:
+            raise
+        created_event = service.events().get(calendarId='primary', eventId=event_id).execute()
+    calendar_link = created_event.get('htmlLink')
+    print(f"[Google Calendar] Event created: {calendar_link}")
+    engine.mark_busy(start_dt.replace(tzinfo=WORK_TZ), end_dt.replace(tzinfo=WORK_TZ))
+    return calendar_link
+
+def book_meeting(date_str, time_str, customer_email, customer_name="Customer"):
+    """
+    Creates a Google Calendar event and sends a confirmation email, blocking until both are done.
+    The server goes through booking.BookingService instead, which runs these stages off the event loop.
+    """
+    try:
+        calendar_link = create_meeting_event(date_str, time_str, customer_email, customer_name)
     except Exception as e:
         print(f"[Error] Failed to book meeting: {e}")
         return {"status": "error", "message": f"Failed to book meeting: {str(e)}"}
 
+    try:
+        send_confirmation_email(customer_email, customer_name, f"{date_str} at {time_str}", calendar_link)
+    except Exception:
+        return {"status": "success", "message": "Meeting booked; confirmation email failed."}
+    return {"status": "success", "message": "Meeting booked and email sent."}
+
+def get_outbox():
+    """The process-wide email outbox, started on first use (delivers anything left from a previous run)."""
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                from outbox import Outbox, SmtpPool
+
+                pool = SmtpPool(SMTP_HOST, SMTP_PORT, SMTP_STARTTLS, SENDER_EMAIL, EMAIL_APP_PASSWORD, size=SMTP_POOL_SIZE)
+                outbox = Outbox(OUTBOX_DB, pool, SENDER_EMAIL, workers=SMTP_POOL_SIZE, batch_size=OUTBOX_BATCH_SIZE)
+                outbox.start()
+                _outbox = outbox
+    return _outbox
+
+def close_outbox():
+    global _outbox
+    with _outbox_lock:
+        if _outbox is not None:
+            _outbox.close()
+            _outbox = None
+
 def send_confirmation_email(to_email, name, slot, calendar_link):
-    """Sends an email via Gmail SMTP."""
-    msg = MIMEMultipart()
-    msg['From'] = SENDER_EMAIL
-    msg['To'] = to_email
-    msg['Subject'] = f"אישור פגישה: Alta AI - {name}"
-
-    # Email Body (Hebrew content as requested)
-    body = f"""
-    <div dir="rtl" style="font-family: Arial, sans-serif;">
-        <h2>היי {name},</h2>
-        <p>שמחים לאשר את פגישת הדמו שלך עם קטי מחברת Alta AI.</p>
-        <p><strong>מועד הפגישה:</strong> {slot}</p>
-        <p>קישור לפגישה (זום) יישלח בסמוך למועד, וכבר מופיע בזימון ביומן המצורף.</p>
-        <br>
-        <a href="{calendar_link}" style="background-color: #6c5ce7; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">צפה באירוע ביומן</a>
-        <br><br>
-        בברכה,<br>
-        צוות Alta AI
-    </div>
     """
-    
-    msg.attach(MIMEText(body, 'html'))
+    Queues the confirmation email and returns its outbox id; the outbox delivers it over
+    pooled SMTP sessions and retries failures.
+    """
+    msg_id = get_outbox().enqueue_confirmation(to_email, name, slot, calendar_link)
+    print(f"[Email] Confirmation queued for {to_email}")
+    return msg_id
 
-    try:
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(SENDER_EMAIL, EMAIL_APP_PASSWORD)
-        text = msg.as_string()
-        server.sendmail(SENDER_EMAIL, to_email, text)
-        server.quit()
-        print(f"[Email] Confirmation sent to {to_email}")
-    except Exception as e:
-        print(f"[Email Error] Could not send email: {e}")
\ No newline at end of file
+def confirmation_status(msg_id):
+    """Delivery status of a queued confirmation (pending / sending / sent / dead)."""
+    return get_outbox().message(msg_id)
@@ -0,0 +1,130 @@
+"""
+Deepdub text-to-speech over WebSocket, decoded to the caller's output format.
+
+Each request asks Deepdub for the native sample rate closest to the output
+rate, so an 8 kHz or 16 kHz phone leg gets audio that needs no resampling
+and only an in-process mu-law encode, when asked for.
+"""
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator, Optional
+
+from audio import OutputFormat, PcmDecoder, UnsupportedAudioFormat, ffmpeg_decode, looks_like_wav
+from deepdub_pool import DeepdubPool
+from metrics import DECODE_SECONDS, STAGE_SECONDS, TTS_CHUNKS, TTS_FAILURES, SampledLogger, log
+
+DEEPDUB_LOCALE = os.getenv("DEEPDUB_LOCALE", "he-IL")
+DEEPDUB_VOICE_PROMPT_ID = os.getenv("DEEPDUB_VOICE_PROMPT_ID", "cd91dbf2-7265-420b-b8fd-9b90f2555d02_prompt-reading-neutral")
+DEEPDUB_MODEL = os.getenv("DEEPDUB_MODEL", "dd-etts-3.0-preview")
+# Sample rates Deepdub renders natively; empty = don't ask for one and resample whatever arrives
+DEEPDUB_SAMPLE_RATES = sorted(int(r) for r in os.getenv("DEEPDUB_SAMPLE_RATES", "8000,16000,22050,24000,44100,48000").split(",") if r.strip())
+
+# One in N per-chunk log lines is actually written
+LOG_CHUNK_SAMPLE = int(os.getenv("LOG_CHUNK_SAMPLE", "50"))
+chunk_log = SampledLogger(log, LOG_CHUNK_SAMPLE)
+
+
+def native_rate(rate: int) -> Optional[int]:
+    """The Deepdub rate to render at for `rate` output: exact if native, else the nearest one above (downsampling only)."""
+    if not DEEPDUB_SAMPLE_RATES:
+        return None
+    if rate in DEEPDUB_SAMPLE_RATES:
+        return rate
+    return next((r for r in DEEPDUB_SAMPLE_RATES if r > rate), DEEPDUB_SAMPLE_RATES[-1])
+
+
+def build_tts_request(text: str, fmt: OutputFormat = OutputFormat()) -> dict:
+    """
+    The Deepdub request for `text`. "outputFormat" is ours (what the decoder produces);
+    it travels with the request so pipelined and prerendered segments keep it, and is not sent.
+    """
+    req = {
+        "action": "text-to-speech",
+        "locale": DEEPDUB_LOCALE,
+        "voicePromptId": DEEPDUB_VOICE_PROMPT_ID,
+        "model": DEEPDUB_MODEL,
+        "targetText": text,
+        "cleanAudio": True,
+        "realTime": True,
+        "outputFormat": fmt,
+    }
+    rate = native_rate(fmt.sample_rate)
+    if rate:
+        req["sampleRate"] = rate
+    return req
+
+
+async def synthesize(pool: DeepdubPool, req: dict, t0: Optional[float] = None) -> AsyncIterator[bytes]:
+    """
+    Streams audio for one Deepdub request, in the request's output format. Returns normally
+    only once Deepdub reported `isFinished`, so callers can tell a complete render from a cut one.
+    """
+    t0 = t0 or time.perf_counter()
+    ws_chunks = 0
+    total_decoded = 0
+    total_pcm = 0
+    first = True
+    fmt = req.get("outputFormat") or OutputFormat()
+    decoder = PcmDecoder(fmt)
+
+    t_lease = time.perf_counter()
+    async with pool.connection() as conn:
+        STAGE_SECONDS.observe(time.perf_counter() - t_lease, stage="connect")
+        ws = conn.ws
+        log.info("📨 deepdub request | text_len=%d rate=%s out=%s", len(req["targetText"]), req.get("sampleRate"), fmt)
+        await ws.send(json.dumps({k: v for k, v in req.items() if k != "outputFormat"}))
+
+        while True:
+            raw_msg = await ws.recv()
+            msgj = json.loads(raw_msg)
+
+            ws_chunks += 1
+            TTS_CHUNKS.inc()
+            is_finished = bool(msgj.get("isFinished"))
+            b64 = msgj.get("data")
+
+            chunk_log.info("📦 WS chunk | gid=%s idx=%s finished=%s has_data=%s",
+                           msgj.get("generationId"), msgj.get("index"), is_finished, bool(b64))
+
+            if b64:
+                audio_bytes = base64.b64decode(b64)
+                total_decoded += len(audio_bytes)
+
+                if first:
+                    ttfa = time.perf_counter() - t0
+                    log.info("⚡ TTFA=%.1fms | first_size=%d bytes", ttfa * 1000, len(audio_bytes))
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug("🔎 ascii4: %r first16(hex): %s", audio_bytes[:4], binascii.hexlify(audio_bytes[:16]).decode())
+                    first = False
+
+                if looks_like_wav(audio_bytes):
+                    t_dec = time.perf_counter()
+                    try:
+                        pcm = decoder.decode(audio_bytes)
+                    except UnsupportedAudioFormat as e:
+                        log.warning("⚠️ in-process decode unsupported (%s); falling back to ffmpeg", e)
+                        TTS_FAILURES.inc(stage="decode_fallback")
+                        pcm = await asyncio.to_thread(ffmpeg_decode, audio_bytes, fmt)
+                    DECODE_SECONDS.observe(time.perf_counter() - t_dec)
+                    if pcm:
+                        total_pcm += len(pcm)
+                        yield pcm
+                else:
+                    log.warning("⚠️ chunk not WAV; skipping (or handle separately)")
+
+            if is_finished:
+                conn.clean = True
+                break
+
+    tail = decoder.flush()
+    if tail:
+        total_pcm += len(tail)
+        yield tail
+
+    t_total = (time.perf_counter() - t0) * 1000
+    log.info("🏁 WS done | chunks=%d decoded=%d pcm=%d total_time=%.1fms", ws_chunks, total_decoded, total_pcm, t_total)
@@ -0,0 +1,187 @@
+"""
+Content-addressed cache of final renders, in the format they were streamed in.
+
+Keys are a hash of (text, locale, voicePromptId, model, output format), so a repeated
+utterance — the greeting, the booking confirmation, FAQ answers — is served
+without opening a Deepdub WebSocket at all.
+
+Two tiers:
+  * memory: LRU of `bytes`, bounded by a byte budget
+  * disk:   one raw PCM file per entry, read back through mmap (shared through
+            the OS page cache with every other worker on the box). A disk hit hands
+            out the mmap itself; whoever streams it closes it.
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Union
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+def cache_key(req: dict) -> str:
+    parts = [req["targetText"].strip(), req["locale"], req["voicePromptId"], req["model"], str(req.get("outputFormat", ""))]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _safe_name(s: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", s)
+
+
+class PcmCache:
+    def __init__(self, memory_budget: int, disk_dir: Optional[Path] = None, disk_budget: int = 0):
+        self.memory_budget = memory_budget
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_budget = disk_budget
+
+        self._lock = threading.Lock()
+        self._mem: OrderedDict[str, bytes] = OrderedDict()
+        self._mem_bytes = 0
+        # key -> (voicePromptId, model), so invalidation can target one voice
+        self._meta: dict[str, tuple[str, str]] = {}
+        self._disk_bytes = 0
+
+        self.stats = {"hits_memory": 0, "hits_disk": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(p.stat().st_size for p in self.disk_dir.glob("*/*/*.pcm"))
+
+    def _disk_path(self, key: str, voice: str, model: str) -> Path:
+        return self.disk_dir / _safe_name(model) / _safe_name(voice) / f"{key}.pcm"
+
+    def _remember(self, key: str, pcm: bytes) -> None:
+        """Inserts into the memory LRU. Caller holds the lock."""
+        if len(pcm) > self.memory_budget // 4:
+            return
+        if key in self._mem:
+            self._mem_bytes -= len(self._mem.pop(key))
+        self._mem[key] = pcm
+        self._mem_bytes += len(pcm)
+        while self._mem_bytes > self.memory_budget:
+            old_key, old = self._mem.popitem(last=False)
+            self._mem_bytes -= len(old)
+            self._meta.pop(old_key, None)
+            self.stats["evictions"] += 1
+
+    def get_memory(self, key: str) -> Optional[bytes]:
+        """Memory tier only: never blocks, so it's safe on the event loop. A miss isn't counted."""
+        with self._lock:
+            pcm = self._mem.get(key)
+            if pcm is not None:
+                self._mem.move_to_end(key)
+                self.stats["hits_memory"] += 1
+            return pcm
+
+    def get(self, key: str, voice: str, model: str) -> Optional[Buffer]:
+        """Memory, then disk. The disk tier opens and maps a file, so call it off the event loop."""
+        pcm = self.get_memory(key)
+        if pcm is not None:
+            return pcm
+
+        if self.disk_dir:
+            path = self._disk_path(key, voice, model)
+            try:
+                with open(path, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                os.utime(path)
+            except (FileNotFoundError, ValueError):
+                mm = None
+            if mm is not None:
+                with self._lock:
+                    self.stats["hits_disk"] += 1
+                    self._meta[key] = (voice, model)
+                return mm
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def contains(self, key: str, voice: str, model: str) -> bool:
+        """Presence check that doesn't touch LRU order or hit/miss counters."""
+        with self._lock:
+            if key in self._mem:
+                return True
+        return bool(self.disk_dir) and self._disk_path(key, voice, model).exists()
+
+    def put(self, key: str, pcm: bytes, voice: str, model: str) -> None:
+        """Stores a complete render. Disk I/O happens here, so call it off the event loop."""
+        with self._lock:
+            self._meta[key] = (voice, model)
+            self._remember(key, pcm)
+            self.stats["stores"] += 1
+
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key, voice, model)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename so a concurrent reader (or another worker) never maps a partial file
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(pcm)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp, path)
+        with self._lock:
+            self._disk_bytes += len(pcm) - replaced
+            over = self.disk_budget and self._disk_bytes > self.disk_budget
+        if over:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Drops least-recently-hit files (by mtime) until the disk tier is back under 90% of budget."""
+        files = sorted(self.disk_dir.glob("*/*/*.pcm"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        target = self.disk_budget * 0.9
+        for p in files:
+            if total <= target:
+                break
+            size = p.stat().st_size
+            p.unlink(missing_ok=True)
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    def invalidate(self, voice: Optional[str] = None, model: Optional[str] = None) -> int:
+        """Drops entries for a voice and/or model (everything if neither is given). Returns entries removed."""
+        def matches(v: str, m: str) -> bool:
+            return (voice is None or v == voice) and (model is None or m == model)
+
+        removed: set[str] = set()
+        with self._lock:
+            for key in [k for k, (v, m) in self._meta.items() if matches(v, m)]:
+                self._meta.pop(key)
+                pcm = self._mem.pop(key, None)
+                if pcm is not None:
+                    self._mem_bytes -= len(pcm)
+                    removed.add(key)
+
+        if self.disk_dir:
+            model_glob = _safe_name(model) if model is not None else "*"
+            voice_glob = _safe_name(voice) if voice is not None else "*"
+            for p in self.disk_dir.glob(f"{model_glob}/{voice_glob}/*.pcm"):
+                p.unlink(missing_ok=True)
+                removed.add(p.stem)
+
+        with self._lock:
+            self.stats["invalidations"] += 1
+            if self.disk_dir:
+                self._disk_bytes = sum(p.stat().st_size for p in self.disk_dir.glob("*/*/*.pcm"))
+        return len(removed)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "memory_entries": len(self._mem),
+                "memory_bytes": self._mem_bytes,
+                "memory_budget": self.memory_budget,
+                "disk_bytes": self._disk_bytes,
+                "disk_budget": self.disk_budget,
+            }
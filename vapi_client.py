@@ -0,0 +1,118 @@
+"""
+Shared Vapi API client for the dashboard.
+
+One keep-alive session per process, plus a TTL cache for assistant configs:
+within `ttl` seconds of a fetch the cached config is returned without a
+request; after that it is still returned immediately while a background
+conditional GET (If-None-Match) revalidates it, so a Streamlit rerun never
+waits on the network once the config has been loaded. A PATCH primes the
+cache with the updated assistant Vapi sends back.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+VAPI_BASE_URL = os.getenv("VAPI_BASE_URL", "https://api.vapi.ai").rstrip("/")
+VAPI_CACHE_TTL = float(os.getenv("VAPI_CACHE_TTL", "30"))
+
+
+def pooled_session(api_key: str, pool_size: int = 10) -> requests.Session:
+    """Keep-alive session for the Vapi API. 429s are retried honouring Retry-After (the request wasn't processed)."""
+    session = requests.Session()
+    session.headers.update({"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+    # Never retry a read error: Vapi may already have acted on the request (e.g. placed the call)
+    retry = Retry(total=3, read=0, status_forcelist=[429], allowed_methods=None, respect_retry_after_header=True,
+                  backoff_factor=1.0, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class _Cached:
+    __slots__ = ("data", "etag", "fetched_at", "refreshing")
+
+    def __init__(self, data: dict, etag: Optional[str]):
+        self.data, self.etag = data, etag
+        self.fetched_at = time.monotonic()
+        self.refreshing = False
+
+
+class VapiClient:
+    def __init__(self, api_key: str, base_url: str = VAPI_BASE_URL, ttl: float = VAPI_CACHE_TTL, timeout: float = 10.0):
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.timeout = timeout
+        self.session = pooled_session(api_key)
+        self._assistants: dict[str, _Cached] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "stale_hits": 0, "fetches": 0, "not_modified": 0, "patches": 0}
+
+    def _fetch_assistant(self, assistant_id: str, cached: Optional[_Cached]) -> dict:
+        headers = {"If-None-Match": cached.etag} if cached and cached.etag else {}
+        resp = self.session.get(f"{self.base_url}/assistant/{assistant_id}", headers=headers, timeout=self.timeout)
+        self.stats["fetches"] += 1
+        with self._lock:
+            if resp.status_code == 304 and cached is not None:
+                self.stats["not_modified"] += 1
+                cached.fetched_at = time.monotonic()
+                return cached.data
+            resp.raise_for_status()
+            data = resp.json()
+            self._assistants[assistant_id] = _Cached(data, resp.headers.get("ETag"))
+            return data
+
+    def _revalidate(self, assistant_id: str, cached: _Cached) -> None:
+        try:
+            self._fetch_assistant(assistant_id, cached)
+        except requests.RequestException as e:
+            print(f"[Vapi] Background refresh failed: {e}")
+        finally:
+            cached.refreshing = False
+
+    def get_assistant(self, assistant_id: str) -> dict:
+        """The assistant config; only the very first call for an id waits on the network."""
+        with self._lock:
+            cached = self._assistants.get(assistant_id)
+            if cached is not None:
+                if time.monotonic() - cached.fetched_at < self.ttl:
+                    self.stats["hits"] += 1
+                    return cached.data
+                self.stats["stale_hits"] += 1
+                if not cached.refreshing:
+                    cached.refreshing = True
+                    threading.Thread(target=self._revalidate, args=(assistant_id, cached), daemon=True).start()
+                return cached.data
+        return self._fetch_assistant(assistant_id, None)
+
+    def update_assistant(self, assistant_id: str, payload: dict) -> dict:
+        resp = self.session.patch(f"{self.base_url}/assistant/{assistant_id}", json=payload, timeout=self.timeout)
+        self.stats["patches"] += 1
+        resp.raise_for_status()
+        try:
+            data = resp.json()
+        except ValueError:
+            self.invalidate(assistant_id)
+            return {}
+        with self._lock:
+            # Vapi returns the updated assistant; cache it so the rerun renders without a GET
+            self._assistants[assistant_id] = _Cached(data, resp.headers.get("ETag"))
+        return data
+
+    def invalidate(self, assistant_id: Optional[str] = None) -> None:
+        with self._lock:
+            if assistant_id is None:
+                self._assistants.clear()
+            else:
+                self._assistants.pop(assistant_id, None)
+
+    def create_call(self, payload: dict) -> requests.Response:
+        return self.session.post(f"{self.base_url}/call/phone", json=payload, timeout=30)
+
+    def close(self) -> None:
+        self.session.close()